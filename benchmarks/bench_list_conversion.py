@@ -0,0 +1,63 @@
+"""
+Compare the conversion of a large list argument through the list[int] /
+list[float] loop with the bulk IntArray / FloatArray, through NumPy when it is
+installed and through the json fallback used without it, and the peak memory
+of the conversions.
+
+    python benchmarks/bench_list_conversion.py [elements]
+"""
+import sys
+import timeit
+import tracemalloc
+
+import mustiolo.bulk
+from mustiolo.bulk import FloatArray, IntArray
+from mustiolo.models.parameters import ParameterModel
+
+
+def bench(label: str, ptype, value: str, repeat: int = 5) -> float:
+    param = ParameterModel(name="values", ptype=ptype, default=None)
+    best = min(timeit.repeat(lambda: param.convert_to_type(value), number=1, repeat=repeat))
+    tracemalloc.start()
+    param.convert_to_type(value)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<28}{best * 1000:>10.1f} ms{peak / 2 ** 20:>10.1f} MiB peak")
+    return best
+
+
+def main(elements: int) -> None:
+    ints = ",".join(str(i * 7919) for i in range(elements))
+    floats = ",".join(str(i * 0.25) for i in range(elements))
+    print(f"{elements} elements")
+
+    loop = bench("list[int]", list[int], ints)
+    fast = bench("IntArray", IntArray, ints)
+    print(f"{'speedup':<28}{loop / fast:>10.2f} x")
+    loop = bench("list[float]", list[float], floats)
+    fast = bench("FloatArray", FloatArray, floats)
+    print(f"{'speedup':<28}{loop / fast:>10.2f} x")
+
+    # the json fallback, used without NumPy and for the short values
+    threshold = mustiolo.bulk.NUMPY_MIN_LENGTH
+    mustiolo.bulk.NUMPY_MIN_LENGTH = sys.maxsize
+    loop = bench("list[int]", list[int], ints)
+    fast = bench("IntArray (without NumPy)", IntArray, ints)
+    print(f"{'speedup':<28}{loop / fast:>10.2f} x")
+    loop = bench("list[float]", list[float], floats)
+    fast = bench("FloatArray (without NumPy)", FloatArray, floats)
+    print(f"{'speedup':<28}{loop / fast:>10.2f} x")
+    mustiolo.bulk.NUMPY_MIN_LENGTH = threshold
+
+    try:
+        import numpy
+        import numpy.typing as npt
+    except ImportError:
+        print("NumPy not installed, skipping the ndarray fast path")
+        return
+    bench("NDArray[int64]", npt.NDArray[numpy.int64], ints)
+    bench("NDArray[float64]", npt.NDArray[numpy.float64], floats)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,41 @@
+"""
+Cost of the one-shot execution: importing mustiolo.cli in a fresh interpreter
+and calling CLI.main on a registered command.
+
+    python benchmarks/bench_main.py [calls]
+"""
+import os
+import subprocess
+import sys
+import time
+
+from mustiolo.cli import CLI
+
+IMPORT = "import time; start = time.perf_counter(); import mustiolo.cli; print(time.perf_counter() - start)"
+
+
+def import_time(repeat: int = 5) -> float:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    return min(float(subprocess.run([sys.executable, "-c", IMPORT], env=env, capture_output=True, text=True,
+                                    check=True).stdout) for _ in range(repeat))
+
+
+def main(calls: int) -> None:
+    print(f"{'import mustiolo.cli':<40}{import_time() * 1000:>10.1f} ms")
+
+    cli = CLI()
+
+    @cli.command()
+    def add(a: int, b: int):
+        """<menu>Add two numbers.</menu>"""
+        return a + b
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        cli.main(["add", "1", "2"])
+    elapsed = time.perf_counter() - start
+    print(f"{f'{calls} x CLI.main':<40}{elapsed * 1000:>10.1f} ms ({elapsed / calls * 1e6:.1f} us per call)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,79 @@
+"""
+Compare the startup cost of registering many generated commands one by one
+through register_command with the bulk register_commands. Like timeit every
+case runs with the cyclic collector disabled, the best of a few runs: the
+collections triggered by the many objects allocated would otherwise dominate.
+
+    python benchmarks/bench_registration.py [commands]
+"""
+import gc
+import sys
+import time
+from typing import Callable, List
+
+from mustiolo.cli import CLI
+from mustiolo.models.command import SubCommandGroup
+
+
+def make_commands(count: int) -> List[Callable]:
+    def make(index: int) -> Callable:
+        def command(value: int = 0):
+            return value
+        command.__name__ = f"command_{index}"
+        command.__doc__ = f"<menu>Generated command {index}.</menu>"
+        return command
+    return [make(index) for index in range(count)]
+
+
+def bench(label: str, fn: Callable[[], None], repeat: int = 3) -> float:
+    elapsed = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            elapsed = min(elapsed, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    print(f"{label:<40}{elapsed * 1000:>10.1f} ms")
+    return elapsed
+
+
+def loop(group: SubCommandGroup, functions: List[Callable]) -> None:
+    for fn in functions:
+        group.register_command(fn)
+
+
+def main(count: int) -> None:
+    functions = make_commands(count)
+    print(f"{count} commands")
+
+    slow = bench("register_command loop", lambda: loop(SubCommandGroup("bench"), functions))
+    fast = bench("register_commands", lambda: SubCommandGroup("bench").register_commands(functions))
+    print(f"{'loop / bulk':<40}{slow / fast:>10.2f} x")
+
+    # the root menu of a CLI also feeds the search index
+    def decorate(cli: CLI) -> None:
+        for fn in functions:
+            cli.command()(fn)
+
+    slow = bench("CLI decorator loop", lambda: decorate(CLI()))
+    fast = bench("CLI.register_commands", lambda: CLI().register_commands(functions))
+    print(f"{'loop / bulk':<40}{slow / fast:>10.2f} x")
+
+    groups = [SubCommandGroup(f"group_{index}", f"Group {index}") for index in range(count // 100)]
+    for group, start in zip(groups, range(0, count, 100)):
+        group.register_commands(functions[start:start + 100])
+
+    def include(root: SubCommandGroup) -> None:
+        for group in groups:
+            root.include_commands(group)
+
+    slow = bench("include_commands loop", lambda: include(SubCommandGroup("bench")))
+    fast = bench("register_commands of the groups", lambda: SubCommandGroup("bench").register_commands(groups))
+    print(f"{'loop / bulk':<40}{slow / fast:>10.2f} x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
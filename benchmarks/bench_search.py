@@ -0,0 +1,52 @@
+"""
+Latency of CommandIndex.search on a large generated command tree: common
+single terms, short prefixes and queries made of several common terms.
+
+    python benchmarks/bench_search.py [commands]
+"""
+import random
+import sys
+import time
+from typing import List
+
+from mustiolo.models.command import CommandModel
+from mustiolo.search import CommandIndex
+
+WORDS = ["add", "list", "show", "delete", "user", "group", "file", "report", "export", "import", "sync",
+         "status", "config", "database", "query", "cache", "network", "server", "client", "metric"]
+
+QUERIES = ["user", "list", "u", "de", "list user", "show user file", "command", "generated command",
+           "exp rep", "command_123"]
+
+
+def make_index(count: int) -> CommandIndex:
+    rng = random.Random(42)
+    index = CommandIndex()
+    for number in range(count):
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{number}"
+        menu = f"Generated command {number}: {' '.join(rng.choices(WORDS, k=4))}."
+        usage = f"{menu} {' '.join(rng.choices(WORDS, k=12))}"
+        path = (f"group_{number % 100}", f"sub_{number % 7}", name) if number % 3 else (f"group_{number % 100}", name)
+        index.add(path, CommandModel(name=name, menu=menu, usage=usage))
+    return index
+
+
+def bench(index: CommandIndex, queries: List[str], repeat: int) -> None:
+    for query in queries:
+        index.search(query)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            index.search(query)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"{repr(query):<40}{elapsed * 1000:>10.2f} ms")
+
+
+def main(count: int) -> None:
+    start = time.perf_counter()
+    index = make_index(count)
+    print(f"{count} commands indexed in {(time.perf_counter() - start) * 1000:.1f} ms")
+    bench(index, QUERIES, 20)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
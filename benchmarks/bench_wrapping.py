@@ -0,0 +1,53 @@
+"""
+Compare the wrapping of large panels by mustiolo.message_box.wrap with
+textwrap.wrap padded to the same width (which counts code points, so its CJK
+panels are misaligned anyway).
+
+    python benchmarks/bench_wrapping.py [lines]
+"""
+import random
+import sys
+import textwrap
+import time
+from typing import Callable, List
+
+from mustiolo.message_box import draw_message_box, wrap
+
+WIDTH = 76
+
+
+def make_lines(count: int, alphabet: List[str]) -> List[str]:
+    rng = random.Random(42)
+    return [" ".join("".join(rng.choices(alphabet, k=rng.randint(1, 12))) for _ in range(rng.randint(0, 40)))
+            for _ in range(count)]
+
+
+def textwrap_padded(line: str, width: int) -> List[str]:
+    chunks = textwrap.wrap(line.expandtabs(4), width) or [""]
+    return [chunk + " " * (width - len(chunk)) for chunk in chunks]
+
+
+def bench(label: str, fn: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40}{elapsed * 1000:>10.1f} ms")
+    return elapsed
+
+
+def main(count: int) -> None:
+    ascii_lines = make_lines(count, list("abcdefghijklmnopqrstuvwxyz"))
+    cjk_lines = make_lines(count, [chr(c) for c in range(0x4E00, 0x4E80)] + list("abcdef"))
+    print(f"{count} lines, {WIDTH} columns")
+    for name, lines in (("ascii", ascii_lines), ("cjk", cjk_lines)):
+        # the widths of the characters are cached the first time they are seen
+        wrap(" ".join(set("".join(lines))), WIDTH)
+        ours = bench(f"{name}: message_box.wrap", lambda lines=lines: [wrap(line, WIDTH) for line in lines])
+        theirs = bench(f"{name}: textwrap.wrap", lambda lines=lines: [textwrap_padded(line, WIDTH) for line in lines])
+        print(f"{name}: {theirs / ours:.1f}x faster")
+    content = "\n".join(ascii_lines)
+    bench("draw_message_box (ascii)", lambda: draw_message_box("Panel", content, columns=WIDTH + 4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,195 @@
+"""
+Bulk conversion of large numeric list arguments.
+
+A parameter annotated with IntArray or FloatArray receives an array.array
+instead of a list. Large values are parsed by numpy.fromstring straight into
+the array memory when NumPy is installed, which is where the speed comes
+from. Without NumPy (and for short values) the json C decoder parses slices
+of the value which are copied in the array one after the other: it costs
+about as much as a list[int] but the objects of a whole list are never alive
+at once and the array takes 8 bytes per element. If NumPy is installed a
+parameter annotated with numpy.ndarray or numpy.typing.NDArray[dtype]
+receives a NumPy array.
+"""
+import json
+import warnings
+from array import array
+from typing import Any, Callable, Iterable, List, Union, get_args, get_origin
+
+from mustiolo.exception import ParameterWrongElement
+
+
+class IntArray(array):
+    """Array of signed 64 bit integers."""
+    def __new__(cls, values: Iterable[int] = ()):
+        return super().__new__(cls, "q", values)
+
+
+class FloatArray(array):
+    """Array of double precision floats."""
+    def __new__(cls, values: Iterable[float] = ()):
+        return super().__new__(cls, "d", values)
+
+
+# characters admitted in the bulk path, anything else goes through the element by element one
+_INT_CHARACTERS = b"0123456789-, \t"
+_FLOAT_CHARACTERS = b"0123456789-+.eE, \t"
+
+# shorter values do not pay the import of NumPy
+NUMPY_MIN_LENGTH = 64 * 1024
+# characters decoded at once by the json path, bounds the Python objects alive while converting
+JSON_CHUNK_LENGTH = 64 * 1024
+_numpy: Any = None
+
+
+def _convert_elements(values: List[str], convert: Callable[[str], Any], append: Callable[[Any], None],
+                      expected_type: str) -> None:
+    """Element by element conversion, raises an error pointing at the wrong element."""
+    for index, element in enumerate(values):
+        try:
+            append(convert(element))
+        except (ValueError, TypeError, OverflowError):
+            raise ParameterWrongElement(element, index, expected_type)
+
+
+def _only_characters(value: str, admitted: bytes) -> bool:
+    try:
+        return len(value.encode("ascii").translate(None, admitted)) == 0
+    except UnicodeEncodeError:
+        return False
+
+
+def _json_extend(result: array, value: str) -> None:
+    """Decode the value as a JSON list a slice at a time, the slices end at a comma."""
+    start = 0
+    while True:
+        end = value.find(",", start + JSON_CHUNK_LENGTH)
+        if end == -1:
+            end = len(value)
+        chunk = value[start:end]
+        if start > 0 and chunk.strip() == "":
+            # an empty element after the last comma, '[1,]' is not valid JSON either
+            raise ValueError("empty element")
+        result.extend(json.loads(f"[{chunk}]"))
+        if end == len(value):
+            return
+        start = end + 1
+
+
+def _optional_numpy() -> Any:
+    """NumPy if it is installed, False otherwise."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def _fromstring(numpy: Any, value: str, dtype: Any) -> Any:
+    """Parse the whole value with NumPy, None if any element is not valid."""
+    try:
+        with warnings.catch_warnings():
+            # numpy warns, instead of failing, when it cannot parse the whole string
+            warnings.simplefilter("error")
+            result = numpy.fromstring(value, dtype=dtype, sep=",")
+    except (ValueError, DeprecationWarning):
+        return None
+    if len(result) != value.count(",") + 1:
+        return None
+    if numpy.issubdtype(dtype, numpy.integer) and len(result) > 0:
+        # out of range integers are clamped instead of failing
+        limits = numpy.iinfo(dtype)
+        if result.max() == limits.max or result.min() == limits.min:
+            return None
+    return result
+
+
+def to_array(value: str, array_type: type) -> array:
+    """
+    Convert a comma separated string into an IntArray or FloatArray.
+    The whole string is parsed at once by NumPy or decoded as a JSON list a
+    slice at a time, if it is not valid (e.g. '1,,2' or '.5') the elements
+    are converted one by one to find the wrong one.
+    """
+    if array_type is IntArray:
+        admitted, convert, expected_type = _INT_CHARACTERS, int, "INTEGER"
+    else:
+        admitted, convert, expected_type = _FLOAT_CHARACTERS, float, "NUMBER"
+
+    numpy = _optional_numpy() if len(value) >= NUMPY_MIN_LENGTH else False
+    if numpy:
+        parsed = _fromstring(numpy, value, numpy.int64 if array_type is IntArray else numpy.float64)
+        if parsed is not None:
+            # no Python object per element: the parsed memory is copied in the array
+            result = array_type()
+            result.frombytes(parsed.tobytes())
+            return result
+    elif _only_characters(value, admitted):
+        result = array_type()
+        try:
+            _json_extend(result, value)
+            return result
+        except (ValueError, TypeError, OverflowError):
+            pass
+
+    result = array_type()
+    _convert_elements(value.split(","), convert, result.append, expected_type)
+    return result
+
+
+def is_ndarray(ptype: Any) -> bool:
+    """True for numpy.ndarray and numpy.typing.NDArray[...] annotations."""
+    tp = get_origin(ptype) or ptype
+    return getattr(tp, "__module__", "") == "numpy" and getattr(tp, "__name__", "") == "ndarray"
+
+
+def _ndarray_dtype(ptype: Any) -> Union[Any, None]:
+    """dtype in a NDArray[dtype] annotation, None for a plain numpy.ndarray (float64)."""
+    args = get_args(ptype)
+    if len(args) < 2:
+        return None
+    dtype_args = get_args(args[1])
+    if len(dtype_args) == 0 or dtype_args[0] is Any:
+        return None
+    return dtype_args[0]
+
+
+def to_ndarray(value: str, ptype: Any) -> Any:
+    """Convert a comma separated string into a NumPy array with the annotated dtype."""
+    try:
+        import numpy
+    except ImportError:
+        raise TypeError("NumPy is required for numpy.ndarray parameters")
+
+    dtype = numpy.dtype(_ndarray_dtype(ptype) or numpy.float64)
+    result = _fromstring(numpy, value, dtype)
+    if result is not None:
+        return result
+
+    values = value.split(",")
+    expected_type = "INTEGER" if numpy.issubdtype(dtype, numpy.integer) else "NUMBER"
+    _convert_elements(values, dtype.type, lambda _: None, expected_type)
+    return numpy.array(values, dtype=dtype)
+
+
+def iterable_to_ndarray(values: Iterable[str], ptype: Any) -> Any:
+    """Build a NumPy array with the annotated dtype consuming an iterable of strings."""
+    try:
+        import numpy
+    except ImportError:
+        raise TypeError("NumPy is required for numpy.ndarray parameters")
+
+    dtype = numpy.dtype(_ndarray_dtype(ptype) or numpy.float64)
+    expected_type = "INTEGER" if numpy.issubdtype(dtype, numpy.integer) else "NUMBER"
+
+    def convert() -> Iterable[Any]:
+        for index, element in enumerate(values):
+            try:
+                yield dtype.type(element)
+            except (ValueError, TypeError, OverflowError):
+                raise ParameterWrongElement(element, index, expected_type)
+
+    return numpy.fromiter(convert(), dtype=dtype)
@@ -1,25 +1,36 @@
 
+import inspect
+import io
 import os
-
-# used to have history and arrow handling
-import readline
 import sys
+import time
 from collections.abc import Callable
-from typing import Union
+from contextlib import redirect_stdout
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Tuple, Union
 
-from mustiolo.exception import CommandNotFound
+from mustiolo import middleware
 from mustiolo.message_box import BorderStyle, draw_message_box
-from mustiolo.models.command import CommandGroup, SubCommandGroup
-from mustiolo.models.parameters import ParsedCommand
+from mustiolo.models.command import (CommandAlias, CommandGroup, SubCommandGroup, failure_exit_code, prepare_call,
+                                     resolve_command)
+from mustiolo.models.result import CommandResult
+from mustiolo.output import JsonLinesWriter, OutputMode
+from mustiolo.results import ResultStore, split_assignment
+from mustiolo.search import CommandIndex, SearchResult
+from mustiolo.utils import source_stamp
+
+if TYPE_CHECKING:
+    # the subsystems are imported by the methods using them, so main() does not pay for them
+    from mustiolo import headless, history, hotreload, plugins, replay, script, session
 
 class CommandCollection:
     """This class is used to collect all the commands and command groups."""
     def __init__(self):
         self._group = CommandGroup()
 
-    def command(self, name: Union[str, None] = None, alias: str = "", menu: str = "", usage: str = "") -> Callable:
+    def command(self, name: Union[str, None] = None, alias: str = "", menu: str = "", usage: str = "",
+                completers: Union[Dict[str, Any], None] = None) -> Callable:
         def decorator(f):
-            self._group.register_command(f, name, alias, menu, usage)
+            self._group.register_command(f, name, alias, menu, usage, completers)
             return f
 
         return decorator
@@ -27,6 +38,10 @@ class CommandCollection:
     def add_commands(self, group: 'CommandCollection') -> None:
         self._group.include_commands(group.get_group())
 
+    def register_commands(self, entries: Iterable[Any]) -> None:
+        """Register many functions, command dictionaries or groups at once, see CLI.register_commands."""
+        self._group.register_commands(_unwrap_groups(entries))
+
     def get_group(self) -> CommandGroup:
         return self._group
 
@@ -36,15 +51,24 @@ class MenuGroup:
     def __init__(self, name: str = "", menu: str = "", usage: str = ""):
         self._group = SubCommandGroup(name, menu, usage)
 
-    def command(self, name: Union[str, None] = None, alias: str = "", menu: str = "", usage: str = "") -> Callable:
+    def command(self, name: Union[str, None] = None, alias: str = "", menu: str = "", usage: str = "",
+                completers: Union[Dict[str, Any], None] = None) -> Callable:
         def decorator(f):
-            self._group.register_command(f, name, alias, menu, usage)
+            self._group.register_command(f, name, alias, menu, usage, completers)
             return f
         return decorator
 
     def add_commands(self, commands: Union[CommandCollection, 'MenuGroup']) -> None:
         self._group.include_commands(commands.get_group())
 
+    def register_commands(self, entries: Iterable[Any]) -> None:
+        """Register many functions, command dictionaries or groups at once, see CLI.register_commands."""
+        self._group.register_commands(_unwrap_groups(entries))
+
+    def use(self, fn: middleware.Middleware) -> None:
+        """Add a middleware for the commands of this menu and of its sub menus."""
+        self._group.use(fn)
+
     '''def add_subgroup(self, subgroup: 'MenuGroup') -> None:
         """Add a subgroup to the current group."""
         self._group.add_command_group(subgroup.get_group())
@@ -59,121 +83,109 @@ class MenuGroup:
         return self._group
 
 
+def _unwrap_groups(entries: Iterable[Any]) -> Iterator[Any]:
+    for entry in entries:
+        yield entry.get_group() if isinstance(entry, (CommandCollection, MenuGroup)) else entry
+
+
 class CLI:
 
-    def __init__(self, hello_message: str = "", prompt: str = ">", autocomplete: bool = True) -> None:
+    def __init__(self, hello_message: str = "", prompt: str = ">", autocomplete: bool = True,
+                 output_mode: OutputMode = OutputMode.BOX) -> None:
         self._hello_message = hello_message
         self._prompt = prompt
         self._autocomplete = autocomplete
         self._exit = False
-        self._reserved_commands = ["?", "exit"] 
-        self._columns = os.get_terminal_size().columns
+        self._reserved_commands = ["?", "exit", "history", "profile", "reload", "search", "watch"]
+        self._completion_cache: List[str] = []
+        self._output_mode = OutputMode(output_mode)
+        self._jsonl_writer = JsonLinesWriter()
+        # probed only when a panel is drawn, one-shot execution never needs it
+        self._columns: Union[int, None] = None
         # contains all the menus by name
         self._menu : Union[CommandGroup, SubCommandGroup] = None
+        # full-text index over all the commands in the tree, updated on registration
+        self._index = CommandIndex()
+        # menus discovered through the entry points, see load_plugins
+        self._plugins: List['plugins.PluginGroup'] = []
+        self._plugins_discovery = (0.0, False)
+        # command path -> (command, command composed with its middlewares), only the
+        # commands with middlewares, composed when the command or a middleware is added
+        self._chains: Dict[Tuple[str, ...], Tuple[Callable, Callable]] = {}
+        # objects returned by the commands, referenced as '$1', '$last' or '$name'
+        self._results = ResultStore()
+        # command lines typed in run(), in memory until enable_history is called
+        self._history: Union['history.History', None] = None
+        # log of the executed command lines, see record
+        self._recorder: Union['replay.Recorder', None] = None
+        # module name -> source file and its stamp when the commands were added, see reload
+        self._module_stamps: Dict[str, Tuple[str, Tuple[int, int]]] = {}
+        self._reloader: Union['hotreload.Reloader', None] = None
+        self._reloading = False
         self._istantiate_root_menu()
 
-    def _completer(self, text, state):
+    def _completion_candidates(self, line_buffer: str, text: str) -> List[str]:
         """
-        Autocomplete for nested CommandGroups.
+        Returns the candidates for the word under the cursor ('text').
+        The words before it are a command path, optionally preceded by the help
+        command ('?'): while the path reaches a SubCommandGroup the candidates are
+        its commands, once a command is reached they come from the completion
+        provider of the argument under the cursor.
         """
-        # TODO: Implement a better autocomplete function, this code is just a starting point
-        #       full of duplicated logic.
+        words = line_buffer.split()
+        if len(words) > 0 and not line_buffer.endswith(" "):
+            # the last word is the one under completion
+            words.pop()
 
-        current_group = self._menu
-        cmd = None
-        options = None
-        is_help_command = False
-
-        # Get the current input line and cursor position
-        line_buffer = readline.get_line_buffer()
-        split_line = line_buffer.strip().split()
-
-        # in case of help command ('?') as first command we need to remove it
-        # in order to have the correct command path and autocomplete
-        if len(split_line) > 0 and split_line[0] == "?":
-            split_line.pop(0)
-            is_help_command = True
-
-        # we have this cases
-        # 1. no split_line, so we are at the root menu
-        # 2. split_line and the last element is a command, so we need to autocomplete the command
-        # 3. split_line and the last element is a group, so we need to shows all its commands
-        # 4. split_line and the last element is a partial string so we need to autocomplete the command
-
-        # []
-        # [partial_command]
-        # [command]
-        # [command, ...,  partial_command]
-        if len(split_line) == 0:
-            options = [name for name in current_group.commands.keys()]
-            if is_help_command:
-                options.remove("?")
-            options.sort()
-            return options[state] + " "
-
-        elif len(split_line) == 1:
-            # we can have a full command, a partial command or a group
-            if current_group.has_command(split_line[0]):
-                # is a complete command.
-                # get it and check if it is a SubCommandGroup
-                cmd = current_group.get_command(split_line[0])
-                if isinstance(cmd, SubCommandGroup):
-                    # get all the subcommands for this group
-                    options = [name for name in cmd.commands.keys()]
-                else:
-                    # get only the command that starts with the partial command
-                    options = [name for name in current_group.commands.keys() if name.startswith(split_line[-1])]
+        is_help_command = len(words) > 0 and words[0] == "?"
+        if is_help_command:
+            words.pop(0)
 
-            else:
-                # is not a complete command, so we need to check if a subcommand starts with it
-                # in the current group
-                options = [name for name in current_group.commands.keys() if name.startswith(split_line[-1])]
+        current_group = self._menu
+        for index, word in enumerate(words):
+            if not current_group.has_command(word):
+                return []
+            entry = current_group.get_command(word)
+            if isinstance(entry, SubCommandGroup):
+                current_group = entry
+                continue
+            if is_help_command or entry.raw_arguments:
+                return []
+            # all the words after the command are its arguments
+            position = len(words) - index - 1
+            if position >= len(entry.parameters):
+                return []
+            provider = entry.parameters[position].completer
+            if provider is None:
+                return []
+            return [value if value.endswith(os.sep) else value + " " for value in sorted(provider(text))]
+
+        options = [name for name in current_group.commands.keys() if name.startswith(text)]
+        if is_help_command and "?" in options:
+            options.remove("?")
+        return [name + " " for name in sorted(options)]
+
+    def _completer(self, text: str, state: int) -> Union[str, None]:
+        """
+        Readline completer, the candidates are computed on the first call of a
+        completion (state 0) and returned one by one on the following calls.
+        """
+        import readline
 
-        else:
-            # Traverse the command path to the deepest CommandGroup
-            for part in split_line[:-1]:
-                if current_group.has_command(part.strip()):
-                    cmd = current_group.get_command(part.strip())
-                    if isinstance(cmd, SubCommandGroup):
-                        current_group = cmd
-                        continue
-                    else:
-                        # we have a command but we need a group
-                        return None
-                else:
-                    # we are in the middle of the path but there is no command
-                    return None
-        
-            # we've traversed the path and arrived at the last CommandGroup
-            check_cmd = split_line[-1].strip()
-
-            # so we need to check if it is a complete command or a partial command
-            if current_group.has_command(check_cmd):
-                # is a complete command
-                cmd = current_group.get_command(check_cmd)
-                if isinstance(cmd, SubCommandGroup):
-                    # get all the subcommands for this group
-                    options = [name for name in current_group.commands.keys()]
-                else:
-                    # get only the command that starts with the partial command
-                    options = [name for name in current_group.commands.keys() if name.startswith(split_line[-1])]
-            else:
-                # is a partial command
-                options = [name for name in current_group.commands.keys() if name.startswith(split_line[-1])]
-                
-        options.sort()
-
-        if len(split_line) == 0:
-            return options
-
-        if state < len(options):
-            if options[state] == split_line[-1]:
-                return None
-            return options[state] + " "
+        if state == 0:
+            self._completion_cache = self._completion_candidates(readline.get_line_buffer(), text)
+        if state < len(self._completion_cache):
+            return self._completion_cache[state]
         return None
 
     def _set_autocomplete(self) -> None:
+        # imported here because importing readline has a cost that one-shot
+        # execution does not need to pay
+        import readline
+
         if self._autocomplete:
+            # only whitespaces split the words, so paths are completed as a whole
+            readline.set_completer_delims(" \t\n")
             match sys.platform:
                 case 'linux':
                     readline.parse_and_bind("tab: complete")
@@ -190,44 +202,264 @@ class CLI:
         """Instantiate the root menu and register it in the menues list.
         """
         self._menu = SubCommandGroup(name="__root__", menu="",  usage="")
+        self._menu.subscribe(self._index, self._index.batch)
+        self._menu.subscribe(self._track_module, self._track_modules)
+        self._menu.subscribe(self._compose_chain, self._compose_chains)
         self._menu.add_help_command()
         # register the exit command
         self._menu.register_command(self._exit_cmd, name="exit", menu="Exit the program",
                                                   usage="Exit the program")
+        self._menu.register_command(self._search_cmd, name="search", menu="Search a command.",
+                                    usage="Search the commands by name, alias, menu and usage.")
+        self._menu.get_command("search").raw_arguments = True
+        self._menu.register_command(self._watch_cmd, name="watch", menu="Execute a command periodically.",
+                                    usage="watch [-n SECONDS] COMMAND... executes the command every SECONDS "
+                                          "(default 2) showing its output, until Ctrl-C.")
+        self._menu.get_command("watch").raw_arguments = True
+        self._menu.register_command(self._profile_cmd, name="profile", menu="Profile a command.",
+                                    usage="profile [--mem] [--top N] [--dump FILE] COMMAND... executes the command "
+                                          "under cProfile (and tracemalloc with --mem) and shows the slowest "
+                                          "functions and the biggest allocations, --dump writes the .pstats file.")
+        self._menu.get_command("profile").raw_arguments = True
+        self._menu.register_command(self._history_cmd, name="history", menu="Show the history.",
+                                    usage="history [N] shows the last N command lines (20 by default), "
+                                          "'history top [N]' the most used commands and 'history search TEXT' "
+                                          "the last lines of the commands starting with TEXT or containing it.")
+        self._menu.get_command("history").raw_arguments = True
+        self._menu.register_command(self._reload_cmd, name="reload", menu="Reload the changed command modules.",
+                                    usage="reload imports again the modules of the commands whose source changed "
+                                          "and updates their commands, without restarting.")
+        self._menu.get_command("reload").raw_arguments = True
+
+    @property
+    def columns(self) -> int:
+        """Terminal width, probed the first time it is needed."""
+        if self._columns is None:
+            self._columns = os.get_terminal_size().columns
+        return self._columns
+
+    @columns.setter
+    def columns(self, columns: int) -> None:
+        """Fixed width for the panels, the terminal is not probed anymore."""
+        self._columns = columns
 
     def _draw_panel(self, title: str , content: str, border_style: BorderStyle = BorderStyle.SINGLE_ROUNDED, columns: int = None) -> str:
         """Draw panel with a title and content.
         """
-        cols = self._columns
+        cols = self.columns
         if columns is not None:
             cols = columns
         return draw_message_box(title, content, border_style, cols)
 
-    def command(self, name: Union[str, None] = None, alias: str = "", menu: str = "", usage: str = "") -> None:
+    def command(self, name: Union[str, None] = None, alias: str = "", menu: str = "", usage: str = "",
+                completers: Union[Dict[str, Any], None] = None) -> None:
         """Decorator to register a command in the __root_ CLI menu."""
 
         if name in self._reserved_commands:
             raise Exception(f"'{name}' is a reserved command name")
 
         def decorator(funct: Callable) -> Callable:
-            def wrapper(*args, **kwargs):
-                funct(*args, **kwargs)
-
-            self._menu.register_command(funct, name, alias, menu, usage)
-            return wrapper
+            # a reloaded module registers its commands again, reload updates them instead
+            if not self._reloading:
+                self._menu.register_command(funct, name, alias, menu, usage, completers)
+            return funct
         return decorator
 
+    def use(self, fn: middleware.Middleware) -> None:
+        """Add a middleware for all the commands, see mustiolo.middleware."""
+        self._menu.use(fn)
+
+    def _compose_chain(self, event: str, path: Tuple[str, ...], cmd: Any) -> None:
+        """
+        Listener composing the command with the middlewares of the menus in its
+        path, when the command is added and every time a middleware is added.
+        """
+        if event == "remove" or (len(path) == 1 and len(self._menu.middlewares) == 0):
+            self._chains.pop(path, None)
+            return
+        self._set_chain(path, cmd, self._path_middlewares(path[:-1]))
+
+    def _compose_chains(self, event: str, entries: List[Tuple[Tuple[str, ...], Any]]) -> None:
+        """Batch version of _compose_chain, the middlewares are collected once per menu."""
+        if event == "remove" or (len(self._chains) == 0 and not self._has_middlewares()):
+            # nothing composed and nothing to compose
+            for path, _ in entries:
+                self._chains.pop(path, None)
+            return
+        by_menu: Dict[Tuple[str, ...], List[middleware.Middleware]] = {}
+        for path, cmd in entries:
+            middlewares = by_menu.get(path[:-1])
+            if middlewares is None:
+                middlewares = by_menu[path[:-1]] = self._path_middlewares(path[:-1])
+            self._set_chain(path, cmd, middlewares)
+
+    def _has_middlewares(self) -> bool:
+        """True if any menu of the tree has a middleware."""
+        stack = [self._menu]
+        while stack:
+            group = stack.pop()
+            if len(group.middlewares) > 0:
+                return True
+            stack.extend(entry for entry in group.commands.values() if isinstance(entry, SubCommandGroup))
+        return False
+
+    def _path_middlewares(self, menu_path: Tuple[str, ...]) -> List[middleware.Middleware]:
+        """The middlewares of the root menu and of the menus in the path, the outermost first."""
+        middlewares = list(self._menu.middlewares)
+        group = self._menu
+        for name in menu_path:
+            group = group.get_command(name)
+            middlewares.extend(group.middlewares)
+        return middlewares
+
+    def _set_chain(self, path: Tuple[str, ...], cmd: Any, middlewares: List[middleware.Middleware]) -> None:
+        if len(middlewares) == 0:
+            self._chains.pop(path, None)
+            return
+        self._chains[path] = (cmd, middleware.compose(cmd, middlewares, list(path)))
+
+
+    def _chain(self, path: List[str], cmd_descriptor: Any) -> Callable:
+        """The composed chain of the command, the chains are keyed by the command name, not by the alias."""
+        cmd = cmd_descriptor.command if isinstance(cmd_descriptor, CommandAlias) else cmd_descriptor
+        chain = self._chains.get(tuple(path[:-1]) + (cmd.name,))
+        return chain[1] if chain is not None and chain[0] is cmd else cmd_descriptor
 
     def add_commands(self, commands: Union[CommandCollection, MenuGroup]) -> None:
         """Add a collection of commands to the root menu."""
         if not isinstance(commands, (CommandCollection, MenuGroup)):
             raise TypeError("commands must be an instance of CommandCollection or MenuGroup")
-
+        if self._reloading:
+            return
         self._menu.include_commands(commands.get_group())
 
     def add_group(self, group: MenuGroup) -> None:
+        if self._reloading:
+            return
         self._menu.include_commands(group.get_group())
 
+    def register_commands(self, entries: Iterable[Any]) -> None:
+        """
+        Register many commands in the root menu at once, the listeners (search
+        index, middlewares, reload) are notified once for the whole batch. An entry
+        is a function, a dictionary with the decorator arguments plus the function
+        ('fn') or a MenuGroup/CommandCollection.
+        Every name or alias collision is reported together by CommandConflicts and
+        in that case no command is registered.
+        """
+        if self._reloading:
+            return
+        self._menu.register_commands(_unwrap_groups(entries))
+
+
+    def load_plugins(self, group: Union[str, None] = None, cache_path: Union[str, None] = None,
+                     lazy: bool = True) -> None:
+        """
+        Add to the root menu a menu for every MenuGroup or CommandCollection exposed
+        by the installed distributions in the entry point group ('mustiolo.plugins'
+        by default).
+        The discovered entry points are cached in 'cache_path' (by default in the
+        user cache directory), each plugin is imported the first time its menu is
+        used unless 'lazy' is False.
+        """
+        from mustiolo import plugins
+
+        start = time.perf_counter()
+        specs, cached = plugins.discover(group or plugins.ENTRY_POINT_GROUP, cache_path)
+        self._plugins_discovery = (time.perf_counter() - start, cached)
+        for spec in specs:
+            plugin = plugins.PluginGroup(spec)
+            self._menu.include_commands(plugin)
+            self._plugins.append(plugin)
+            if not lazy:
+                plugin.load()
+
+    @property
+    def plugins(self) -> List['plugins.PluginGroup']:
+        return self._plugins
+
+    def plugins_report(self) -> str:
+        """Time spent discovering the plugins and loading each of them."""
+        discovery_time, cached = self._plugins_discovery
+        lines = [f"discovery\t{discovery_time * 1000:.2f} ms ({'cache' if cached else 'scan'})"]
+        for plugin in self._plugins:
+            spec = plugin.spec
+            state = f"{plugin.load_time * 1000:.2f} ms" if plugin.loaded else "not loaded"
+            lines.append(f"{spec.name}\t{spec.distribution} {spec.version}\t{state}")
+        return "\n".join(lines)
+
+    def freeze(self) -> 'session.FrozenCommandTree':
+        """
+        Returns an immutable copy of the command tree shared by any number of
+        concurrent sessions, see mustiolo.session.
+        Commands registered afterwards are not in it, nor are the builtins acting
+        on this CLI (exit, history, profile, reload, search, watch).
+        """
+        from mustiolo.session import FrozenCommandTree
+
+        return FrozenCommandTree(self._menu, exclude=self._cli_builtins())
+
+    def _cli_builtins(self) -> List[str]:
+        """The builtins acting on this CLI, not available to sessions and scripts."""
+        return [name for name in self._reserved_commands if name != "?"]
+
+    def record(self, path: Union[str, None]) -> None:
+        """
+        Append every command line executed by run() and main() to the log in
+        'path', with its timestamp, command path and duration. None stops recording.
+        """
+        from mustiolo.replay import Recorder
+
+        if self._recorder is not None:
+            self._recorder.close()
+        self._recorder = Recorder(path) if path is not None else None
+
+    def replay(self, path: str, speed: Union[float, None] = 1.0, workers: int = 1,
+               quiet: bool = True) -> 'replay.ReplayReport':
+        """
+        Execute the command lines recorded in 'path' again and returns the throughput
+        and the latency percentiles per command. 'speed' 1.0 keeps the recorded pace,
+        2.0 is twice as fast and None as fast as possible with 'workers' concurrent lines.
+        The lines run on a frozen copy of the command tree, see freeze.
+        """
+        from mustiolo.replay import load_log, replay
+
+        return replay(load_log(path), self.freeze().execute, speed, workers, quiet)
+
+    def run_script(self, path: str, workers: int = 4) -> 'script.ScriptReport':
+        """
+        Execute the script in 'path' running up to 'workers' independent steps
+        at the same time, see mustiolo.script for the format. Returns the timing
+        of every step and the critical path. The steps run on a frozen copy of
+        the command tree, see freeze.
+        """
+        from mustiolo.script import parse_script, run_script
+
+        with open(path, "r", encoding="utf-8") as fp:
+            steps = parse_script(fp.read(), builtins=self._cli_builtins())
+        return run_script(steps, self.freeze().execute, workers)
+
+    @property
+    def results(self) -> ResultStore:
+        """Objects returned by the commands, see mustiolo.results."""
+        return self._results
+
+    def _execute_line(self, tokens: List[str]) -> CommandResult:
+        """Execute a command line typed by the user, storing what the command returns."""
+        ts = time.time()
+        name, command = split_assignment(tokens)
+        result = self._execute(command)
+        if result.ok and (result.result is not None or name is not None):
+            result.handle = self._results.put(result.result, name)
+        if self._recorder is not None:
+            self._recorder.write(ts, " ".join(tokens), result)
+        return result
+
+    def headless(self, columns: int = 80) -> 'headless.HeadlessDriver':
+        """Returns a driver executing command lines in process, see mustiolo.headless."""
+        from mustiolo.headless import HeadlessDriver
+
+        return HeadlessDriver(self, columns)
 
     def change_prompt(self, prompt: str) -> None:
         self._prompt = prompt
@@ -238,84 +470,322 @@ class CLI:
         self._exit = True
 
 
-    def _handle_exception(self, ex: Exception) -> None:
-        print(self._draw_panel("Error", str(ex)))
+    def search(self, query: str, limit: int = 20) -> List[SearchResult]:
+        """Returns the commands matching the query, best first."""
+        return self._index.search(query, limit)
+
+    def _search_cmd(self, terms: List[str] = []) -> None:
+        """Search a command."""
+        if len(terms) == 0:
+            raise ValueError("search needs at least a term")
+        results = self.search(" ".join(terms))
+        if len(results) == 0:
+            print(f"No command matches '{' '.join(terms)}'")
+            return
+        padding = max(len(result.full_path) for result in results)
+        print("\n".join([f"{result.full_path.ljust(padding)}\t\t{result.command.menu}" for result in results]))
+
+    def _watch_cmd(self, arguments: List[str] = []) -> None:
+        """Execute a command periodically."""
+        from mustiolo import watch
+
+        interval, tokens = watch.parse_arguments(arguments)
+        if tokens[0] in ("watch", "exit"):
+            raise ValueError(f"'{tokens[0]}' cannot be watched")
+        # a wrong command path fails now and not at every tick
+        resolve_command(self._menu, tokens)
+
+        def run() -> str:
+            with redirect_stdout(io.StringIO()) as output:
+                result = self._execute(tokens)
+            if result.error is not None:
+                return output.getvalue() + f"Error: {result.error}"
+            return output.getvalue()
 
+        try:
+            columns: Union[int, None] = self.columns
+            lines: Union[int, None] = os.get_terminal_size().lines
+        except OSError:
+            # not a terminal, nothing wraps and the output is not cut
+            columns = lines = None
+        watch.watch(run, interval, sys.stdout, " ".join(tokens), columns=columns, lines=lines)
+
+    def enable_history(self, path: Union[str, None] = None, max_entries: Union[int, None] = None,
+                       max_bytes: Union[int, None] = None) -> None:
+        """
+        Keep the history of the command lines in a file ('~/.local/state/mustiolo/mustiolo.history'
+        by default) so it survives the restarts. The file is loaded and written in
+        background and compacted to the last 'max_entries' lines (10000 by default)
+        within 'max_bytes' (1 MiB by default).
+        """
+        from mustiolo.history import DEFAULT_MAX_BYTES, DEFAULT_MAX_ENTRIES, History, default_history_path
 
-    def _parse_command_line(self, command_line: str) -> ParsedCommand:
-        """"
-        Parse the command line and return a ParsedCommand object."""
-        components = command_line.split()
-        if len(components) == 0:
-            return ParsedCommand(name="", parameters=[])
-        command_name = components.pop(0)
-        return ParsedCommand(name=command_name, parameters=components)
+        if self._history is not None:
+            self._history.close()
+        self._history = History(path or default_history_path(), max_entries or DEFAULT_MAX_ENTRIES,
+                                max_bytes or DEFAULT_MAX_BYTES)
 
+    @property
+    def history(self) -> 'history.History':
+        """The command lines typed in run(), created on first use."""
+        if self._history is None:
+            from mustiolo.history import History
 
-    def _execute_command(self, current_menu: SubCommandGroup, command: ParsedCommand) -> None:
+            self._history = History()
+        return self._history
 
+    def _sync_readline(self, readline: Any, synced: bool) -> bool:
+        """
+        Fill the readline history once the history file has been loaded, and
+        keep it bounded. Returns whether readline is in sync.
+        """
+        if not self.history.loaded:
+            return False
+        if synced and readline.get_current_history_length() <= self.history.max_entries * 2:
+            return True
+        readline.clear_history()
+        for line in self.history.lines():
+            readline.add_history(line)
+        return True
+
+    def _history_cmd(self, arguments: List[str] = []) -> None:
+        """Show the history."""
+        if len(arguments) > 0 and arguments[0] == "top":
+            top = self.history.most_used(int(arguments[1]) if len(arguments) > 1 else 10)
+            if len(top) > 0:
+                padding = max(len(str(count)) for _, count in top)
+                print("\n".join(f"{str(count).rjust(padding)}  {path}" for path, count in top))
+            return
+        if len(arguments) > 0 and arguments[0] == "search":
+            if len(arguments) == 1:
+                raise ValueError("history search needs the text to search")
+            print("\n".join(self.history.search(" ".join(arguments[1:]))))
+            return
+        if len(arguments) > 1:
+            raise ValueError("history accepts the number of lines, 'top [N]' or 'search TEXT'")
+        lines = self.history.lines(int(arguments[0]) if len(arguments) > 0 else 20)
+        print("\n".join(lines))
+
+    def _profile_cmd(self, arguments: List[str] = []) -> None:
+        """Profile a command."""
+        from mustiolo import profiling
+
+        options, tokens = profiling.parse_arguments(arguments)
+        if tokens[0] in ("profile", "watch", "exit"):
+            raise ValueError(f"'{tokens[0]}' cannot be profiled")
+        # the same path of the command lines, so resolution, cast and middlewares are measured too
+        result, report = profiling.profile(lambda: self._execute(tokens), options)
+        self._report(result)
+        print(self._draw_panel(f"Profile: {' '.join(tokens)}", report))
+
+    def _track_module(self, event: str, path: Tuple[str, ...], cmd: Any) -> None:
+        """Listener stamping the source files of the modules defining commands, for reload."""
+        if event == "add" and inspect.isfunction(cmd.f) and cmd.f.__module__ not in self._module_stamps:
+            stamp = source_stamp(cmd.f.__module__)
+            if stamp is not None:
+                self._module_stamps[cmd.f.__module__] = stamp
+
+    def _track_modules(self, event: str, entries: List[Tuple[Tuple[str, ...], Any]]) -> None:
+        """Batch version of _track_module, every module is looked at once."""
+        if event != "add":
+            return
+        modules = {cmd.f.__module__ for _, cmd in entries if inspect.isfunction(cmd.f)}
+        for module in modules - self._module_stamps.keys():
+            stamp = source_stamp(module)
+            if stamp is not None:
+                self._module_stamps[module] = stamp
+
+    @property
+    def reloader(self) -> 'hotreload.Reloader':
+        """Reloads the changed command modules, see mustiolo.hotreload."""
+        if self._reloader is None:
+            from mustiolo.hotreload import Reloader
+
+            self._reloader = Reloader(self._module_stamps)
+        return self._reloader
+
+    def reload(self) -> 'hotreload.ReloadReport':
+        """
+        Import again the modules of the commands whose source file changed and
+        replace their commands, see mustiolo.hotreload.
+        """
+        self._reloading = True
         try:
-            # split the command line into components
-            #  - command name
-            #  - parameters
-            cmd_descriptor = current_menu.get_command(command.name)
-            if len(command.parameters) == 0:
-                cmd_descriptor()
-            else:
-                # special case which I want to change and make it works like the others
-                if command.name == "?":
-                    cmd_descriptor(command.parameters)
-                    return
-                
-                arguments = cmd_descriptor.cast_arguments(command.parameters)
-                cmd_descriptor(*arguments)
-        except ValueError as ex:
-            print(self._draw_panel("Error", f"Error in parameters: {ex}"))
-        except Exception as ex:
-            print(self._draw_panel("Error", f"An error occurred: {ex}"))
+            return self.reloader.reload(self._menu)
+        finally:
+            self._reloading = False
 
-    def run(self) -> None:
+    def watch_modules(self, interval: float = 1.0) -> None:
+        """
+        Check the source files of the command modules every 'interval' seconds,
+        the changed ones are reloaded before the next command line.
+        """
+        self.reloader.watch(interval)
 
-        # clear the screen and print the hello message (if exists)
-        print("\033[H\033[J", end="")
-        self._set_autocomplete()
+    def _reload_cmd(self, arguments: List[str] = []) -> None:
+        """Reload the changed command modules."""
+        if len(arguments) > 0:
+            raise ValueError("reload has no arguments")
+        print(self.reload())
 
-        if self._hello_message != "":
-            print(self._hello_message)
-        while self._exit is False:
-            command_path = input(f"{self._prompt} ")
-            if command_path == '':
-                continue
-            
-            commands = command_path.split()
-            # here we have a list of string that is the command path
-            # plus eventually some parameters.
-            # So we need to goes trought the menu command by command
-            # and stop when we found a command that has no subcommand
-            # and call that command with the parameters.
-            current_menu = self._menu
-            command = None
+    def build_manifest(self, prog: str) -> Dict[str, Any]:
+        """
+        Returns the static manifest of the command tree, without the builtins
+        acting on the interactive CLI (exit, history, profile, reload, search, watch).
+        """
+        from mustiolo import manifest
 
-            try:
-                while True:
-                    command = commands.pop(0)
-                    if not current_menu.has_command(command):
-                        raise CommandNotFound(command)
-
-                    entry = current_menu.get_command(command)
-                    if isinstance(entry, SubCommandGroup):
-                        # we need to go to the next sub group
-                        current_menu = entry
-                        continue
-
-                    break
-                # here current_menu is a Command
-                parsed_command = self._parse_command_line(command + " " + (" ".join(commands)))
-                if parsed_command.name == "":
-                    continue
-                self._execute_command(current_menu, parsed_command)
+        return manifest.build_manifest(self._menu, prog, exclude=self._cli_builtins())
 
+    def export_completion(self, prog: str, directory: str) -> List[str]:
+        """
+        Write in the directory the manifest ('<prog>.json') and the bash ('<prog>.bash')
+        and zsh ('_<prog>') completion scripts generated from it.
+        Returns the paths of the written files.
+        """
+        from mustiolo import manifest
+
+        data = self.build_manifest(prog)
+        paths = [os.path.join(directory, f"{prog}.json"), os.path.join(directory, f"{prog}.bash"),
+                 os.path.join(directory, f"_{prog}")]
+        manifest.write_manifest(data, paths[0])
+        for path, script in zip(paths[1:], (manifest.generate_bash_completion(data),
+                                             manifest.generate_zsh_completion(data))):
+            with open(path, "w", encoding="utf-8") as fp:
+                fp.write(script)
+        return paths
+
+    def check_manifest(self, path: str) -> List[str]:
+        """
+        Compare the manifest in 'path' with the live command tree.
+        Returns the differences, an empty list means the manifest is up to date.
+        """
+        from mustiolo import manifest
+
+        return manifest.check_manifest(manifest.load_manifest(path), self._menu, exclude=self._cli_builtins())
+
+    def _handle_exception(self, ex: Exception) -> None:
+        print(self._draw_panel("Error", str(ex)))
+
+
+    def _execute(self, tokens: List[str], references: bool = True) -> CommandResult:
+        """
+        Resolve, cast and call the command in the tokens, with 'references' the
+        '$' arguments are replaced by the stored results.
+        Exceptions are not raised but stored in the result, with the exit code
+        telling if the command failed (1) or could not be called at all (2).
+        """
+        result = CommandResult()
+        start = time.perf_counter()
+        try:
+            current_menu, result.path, command = resolve_command(self._menu, tokens)
+            cmd_descriptor, result.arguments = prepare_call(current_menu, command,
+                                                            self._results if references else None)
+            if self._chains:
+                # until a middleware is registered the commands are called directly
+                cmd_descriptor = self._chain(result.path, cmd_descriptor)
+        except Exception as ex:
+            result.error, result.exit_code = ex, 2
+        else:
+            try:
+                if self._output_mode is OutputMode.JSONL:
+                    # what the command prints becomes part of the record
+                    with redirect_stdout(io.StringIO()) as output:
+                        try:
+                            result.result = cmd_descriptor(*result.arguments)
+                        finally:
+                            result.output = output.getvalue()
+                else:
+                    result.result = cmd_descriptor(*result.arguments)
             except Exception as ex:
-                print(self._draw_panel("Error", f"An error occurred: {ex}"))
+                result.error, result.exit_code = ex, failure_exit_code(ex)
+        result.duration = time.perf_counter() - start
+        return result
+
+    def _handle_line(self, tokens: List[str]) -> CommandResult:
+        """A step of the interactive loop: execute the command line and show the outcome."""
+        if self._reloader is not None and self._reloader.pending.is_set():
+            report = self.reload()
+            if self._output_mode is not OutputMode.JSONL:
+                print(report)
+        result = self._execute_line(tokens)
+        self._report(result)
+        return result
+
+    def _report(self, result: CommandResult) -> None:
+        """Show the outcome of a command line in the interactive loop."""
+        if self._output_mode is OutputMode.JSONL:
+            self._jsonl_writer.write(result)
+            return
+        if result.error is None:
+            return
+        if isinstance(result.error, ValueError):
+            print(self._draw_panel("Error", f"Error in parameters: {result.error}"))
+        else:
+            print(self._draw_panel("Error", f"An error occurred: {result.error}"))
 
-            
+    def set_output_mode(self, mode: OutputMode) -> None:
+        """
+        Switch between the panels for humans (OutputMode.BOX) and a JSON Lines
+        record per command (OutputMode.JSONL).
+        """
+        self._output_mode = OutputMode(mode)
+
+    def main(self, argv: List[str]) -> int:
+        """
+        Execute a single command, e.g. 'cli.main(sys.argv[1:])', and returns the exit code:
+            - 0 the command has been executed
+            - 1 the command raised an exception
+            - 2 the command path or the arguments are wrong
+
+        Nothing of the interactive loop (screen clear, readline, hello message and
+        terminal size) is set up, errors are printed on stderr without panels.
+        In JSON Lines mode the record is printed on stdout.
+        A single run has no earlier results to refer to: the arguments are passed
+        as they are ('$5' is a string, not a reference) and nothing is stored.
+        """
+        if len(argv) == 0:
+            self._menu.help()
+            return 2
+
+        ts = time.time()
+        result = self._execute(list(argv), references=False)
+        if self._recorder is not None:
+            # escaped, so the replay passes the same literal arguments
+            self._recorder.write(ts, " ".join("$" + token if token.startswith("$") else token for token in argv),
+                                 result)
+        if self._output_mode is OutputMode.JSONL:
+            self._jsonl_writer.write(result)
+        elif result.error is not None:
+            print(f"Error: {result.error}", file=sys.stderr)
+        return result.exit_code
+
+    def run(self) -> None:
+        # used to have history and arrow handling
+        import readline
+
+        self._set_autocomplete()
+        is_jsonl = self._output_mode is OutputMode.JSONL
+
+        # clear the screen and print the hello message (if exists),
+        # nothing of this when the output is for other programs
+        if not is_jsonl:
+            print("\033[H\033[J", end="")
+            if self._hello_message != "":
+                print(self._hello_message)
+        readline_synced = False
+        try:
+            while self._exit is False:
+                readline_synced = self._sync_readline(readline, readline_synced)
+                # here we have a list of string that is the command path
+                # plus eventually some parameters.
+                commands = input("" if is_jsonl else f"{self._prompt} ").split()
+                if len(commands) == 0:
+                    continue
+                result = self._handle_line(commands)
+                self.history.append(" ".join(commands), result.path)
+                is_jsonl = self._output_mode is OutputMode.JSONL
+        finally:
+            self.history.close()
+            if self._reloader is not None:
+                self._reloader.stop()
@@ -0,0 +1,135 @@
+"""
+Completion providers for the command arguments.
+
+A provider is a callable receiving the text typed so far for the argument and
+returning the candidates. They are declared per parameter on the command:
+
+    @cli.command(completers={"color": ["red", "green"], "path": PathCompleter(),
+                             "host": CachedProvider(list_hosts, ttl=60)})
+"""
+import os
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Iterable, List, Union
+
+
+class Choices:
+    """Static set of candidates."""
+
+    def __init__(self, values: Iterable[Any]):
+        self.values: List[str] = [str(value) for value in values]
+
+    def __call__(self, prefix: str) -> List[str]:
+        return [value for value in self.values if value.startswith(prefix)]
+
+
+class PathCompleter:
+    """Filesystem paths, directories are completed with a trailing separator."""
+
+    def __init__(self, only_directories: bool = False):
+        self.only_directories = only_directories
+
+    def __call__(self, prefix: str) -> List[str]:
+        directory, partial = os.path.split(prefix)
+        try:
+            entries = list(os.scandir(os.path.expanduser(directory) if directory != "" else "."))
+        except OSError:
+            return []
+
+        candidates = []
+        for entry in entries:
+            if not entry.name.startswith(partial):
+                continue
+            # hidden files only if explicitly requested
+            if entry.name.startswith(".") and not partial.startswith("."):
+                continue
+            if entry.is_dir():
+                candidates.append(os.path.join(directory, entry.name) + os.sep)
+            elif not self.only_directories:
+                candidates.append(os.path.join(directory, entry.name))
+        return candidates
+
+
+class CachedProvider:
+    """
+    Wraps a callable without arguments returning all the candidates, e.g. a query
+    on a slow backend.
+    The callable runs in a background thread and its result is cached for 'ttl'
+    seconds. While a refresh is in flight the last cached candidates are returned,
+    so the completion never blocks; only the very first call waits for the
+    result at most 'first_wait' seconds.
+    """
+
+    def __init__(self, fn: Callable[[], Iterable[Any]], ttl: float = 30.0, first_wait: float = 0.1):
+        self._fn = fn
+        self._ttl = ttl
+        self._first_wait = first_wait
+        self._lock = threading.Lock()
+        self._values: List[str] = []
+        self._expires_at = 0.0
+        self._refreshing = False
+        self._loaded = threading.Event()
+
+    def _refresh(self) -> None:
+        try:
+            values = [str(value) for value in self._fn()]
+        except Exception:
+            # keep the old candidates, a failing backend must not break the completion
+            values = None
+        with self._lock:
+            if values is not None:
+                self._values = values
+            self._expires_at = time.monotonic() + self._ttl
+            self._refreshing = False
+        self._loaded.set()
+
+    def refresh(self) -> None:
+        """Start a refresh in background unless one is already in flight."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def __call__(self, prefix: str) -> List[str]:
+        if time.monotonic() >= self._expires_at:
+            self.refresh()
+        if not self._loaded.is_set():
+            self._loaded.wait(self._first_wait)
+        with self._lock:
+            values = self._values
+        return [value for value in values if value.startswith(prefix)]
+
+
+Provider = Callable[[str], List[str]]
+
+
+def make_provider(spec: Any) -> Union[Provider, None]:
+    """
+    Build a provider from what has been declared on the command:
+        - a list, tuple or set of static choices
+        - an Enum type, its values are the choices
+        - a provider instance (Choices, PathCompleter, CachedProvider)
+        - any other callable without arguments, wrapped in a CachedProvider
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, (Choices, PathCompleter, CachedProvider)):
+        return spec
+    if isinstance(spec, (list, tuple, set, frozenset)):
+        return Choices(spec)
+    if isinstance(spec, type) and issubclass(spec, Enum):
+        return Choices([member.value for member in spec])
+    if callable(spec):
+        return CachedProvider(spec)
+    raise TypeError(f"'{spec}' cannot be used as completion provider")
+
+
+def default_provider(ptype: Any) -> Union[Provider, None]:
+    """Provider for the parameter types which have a closed set of values."""
+    if ptype is bool:
+        return Choices(["true", "false"])
+    if isinstance(ptype, type) and issubclass(ptype, Enum):
+        return make_provider(ptype)
+    return None
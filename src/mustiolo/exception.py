@@ -1,3 +1,4 @@
+from typing import List, Tuple
 
 
 class CommandNotFound(Exception):
@@ -9,6 +10,15 @@ class CommandNotFound(Exception):
         return f"Command '{self._command}' does not exists."
 
 
+class CommandGroupNotExecutable(Exception):
+    def __init__(self, command: str):
+        self._command = command
+        super().__init__()
+
+    def __str__(self):
+        return f"'{self._command}' is a command group, use '? {self._command}' to see its commands."
+
+
 class CommandDuplicate(Exception):
 
     def __init__(self, command: str, filename: str, lineno: int):
@@ -21,6 +31,18 @@ class CommandDuplicate(Exception):
         return f"Command '{self.command}' is already defined. Check '{self.filename}:{self.lineno}'"
 
 
+class CommandConflicts(Exception):
+    """All the name and alias collisions found registering many commands at once."""
+    def __init__(self, conflicts: List[Tuple[str, str, int]]):
+        # (command, filename, lineno)
+        self.conflicts = conflicts
+        super().__init__()
+
+    def __str__(self) -> str:
+        return "\n".join(f"Command '{command}' is already defined. Check '{filename}:{lineno}'"
+                         for command, filename, lineno in self.conflicts)
+
+
 class CommandReserved(Exception):
     def __init__(self, command: str):
         self.command = command
@@ -50,6 +72,46 @@ class ParameterWrongType(Exception):
     def __str__(self):
         return f"Get '{self.value}' expected {self.expected_type}"
     
+
+class ParameterWrongElement(ParameterWrongType):
+    """An element of a list argument cannot be converted, 'index' is its position."""
+    def __init__(self, value: str, index: int, expected_type: str):
+        self.index = index
+        super().__init__(value, expected_type)
+
+    def __str__(self):
+        return f"Element {self.index} '{self.value}' is not a valid {self.expected_type}"
+
+
+class ParameterSourceError(Exception):
+    def __init__(self, source: str, reason: str):
+        self.source = source
+        self.reason = reason
+        super().__init__()
+
+    def __str__(self):
+        return f"Cannot read the argument from '@{self.source}': {self.reason}"
+
+
+class ResultNotFound(Exception):
+    def __init__(self, reference: str):
+        self.reference = reference
+        super().__init__()
+
+    def __str__(self):
+        return f"'${self.reference}' is not a stored result"
+
+
+class ScriptError(Exception):
+    def __init__(self, lineno: int, message: str):
+        self.lineno = lineno
+        self.message = message
+        super().__init__()
+
+    def __str__(self):
+        return f"Script line {self.lineno}: {self.message}"
+
+
 class ParameterMissingType(Exception):
     def __init__(self, fun_name: str, filename: str, lineno: int):
         self.function_name = fun_name
@@ -0,0 +1,56 @@
+"""
+In-process driver of a CLI, for tests and for embedding the commands in
+another program. The command lines go through the same steps of CLI.run
+(resolution, cast, middlewares, panels or JSON Lines records) without a
+terminal, readline or input():
+
+    driver = cli.headless(columns=60)
+    result = driver.send("math add 1 2")
+    assert result.ok and result.output == "3\\n"
+"""
+import io
+from contextlib import redirect_stdout
+from typing import TYPE_CHECKING, Iterable, List, Union
+
+from mustiolo.models.result import CommandResult
+
+if TYPE_CHECKING:
+    from mustiolo.cli import CLI
+
+
+class HeadlessDriver:
+
+    def __init__(self, cli: 'CLI', columns: int = 80):
+        self._cli = cli
+        # the panels are drawn for a virtual terminal
+        cli.columns = columns
+
+    @property
+    def closed(self) -> bool:
+        """True once the 'exit' command has been executed."""
+        return self._cli._exit
+
+    def send(self, line: str) -> Union[CommandResult, None]:
+        """
+        Execute a command line, returns None for empty lines.
+        'output' in the result is everything printed for the line: what the
+        command printed and the error panel (or the JSON Lines record).
+        """
+        tokens = line.split()
+        if len(tokens) == 0:
+            return None
+        with redirect_stdout(io.StringIO()) as output:
+            result = self._cli._handle_line(tokens)
+        result.output = output.getvalue()
+        return result
+
+    def run(self, lines: Iterable[str]) -> List[CommandResult]:
+        """Execute the lines as typed in CLI.run, until 'exit'."""
+        results = []
+        for line in lines:
+            if self.closed:
+                break
+            result = self.send(line)
+            if result is not None:
+                results.append(result)
+        return results
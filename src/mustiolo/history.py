@@ -0,0 +1,309 @@
+"""
+Persistent history of the command lines, shared by the sessions of a CLI.
+
+The history file is append-only, a line per command line with the resolved
+command path before a tab:
+
+    math add<TAB>math add 1 2
+
+Appending only queues the line, a background thread writes the queued lines
+and compacts the file when it grows over the limits, keeping the most recent
+entries. The file is loaded in background too, so a large history does not
+delay the first prompt.
+
+Many sessions (processes) can append to the same file: the compaction
+rewrites the tail of the file, not the lines of one session, and on POSIX
+the appends and the compaction are serialized by a lock on '<path>.lock'.
+
+An index from command path to the positions of its lines keeps the most used
+commands and the search of the lines by command path fast on large histories.
+"""
+import heapq
+import os
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no lock, the compaction still reads again the lines appended while it runs
+    fcntl = None
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 1024 * 1024
+# the file is compacted once it is this much over the limits
+COMPACTION_SLACK = 1.5
+
+
+def default_history_path(prog: str = "mustiolo") -> str:
+    state_home = os.environ.get("XDG_STATE_HOME", os.path.join(os.path.expanduser("~"), ".local", "state"))
+    return os.path.join(state_home, "mustiolo", f"{prog}.history")
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Exclusive lock among the processes sharing the history file."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+def _parse(record: str) -> Tuple[str, str]:
+    path, separator, line = record.rstrip("\n").partition("\t")
+    if separator == "":
+        # a plain line, e.g. from an older history file
+        line = path
+        path = " ".join(line.split()[:1])
+    return path, line
+
+
+class History:
+    """
+    Bounded history of command lines, persisted in 'path' if given.
+    Entries have increasing sequence numbers, only the last 'max_entries' are kept.
+    """
+
+    def __init__(self, path: Union[str, None] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, flush_interval: float = 0.5):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # entries[i] has sequence number self._base + i
+        self._entries: List[Tuple[str, str]] = []
+        self._base = 0
+        # command path -> sequence numbers, ascending
+        self._by_path: Dict[str, List[int]] = {}
+        self._counts: Counter = Counter()
+        # lines appended while the file was loading
+        self._early: List[Tuple[str, str]] = []
+        self._queue: Deque[str] = deque()
+        self._file_entries = 0
+        self._file_bytes = 0
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+        if path is None:
+            self._loaded.set()
+        else:
+            self._thread = threading.Thread(target=self._run, name="mustiolo-history", daemon=True)
+            self._thread.start()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    def wait_loaded(self, timeout: Union[float, None] = None) -> bool:
+        return self._loaded.wait(timeout)
+
+    def __len__(self) -> int:
+        self._loaded.wait()
+        return len(self._entries)
+
+    # ---- in memory ----
+
+    def _add(self, path: str, line: str) -> None:
+        seq = self._base + len(self._entries)
+        self._entries.append((path, line))
+        self._by_path.setdefault(path, []).append(seq)
+        self._counts[path] += 1
+        if len(self._entries) >= self.max_entries * 2:
+            self._trim()
+
+    def _trim(self) -> None:
+        """Keep the last max_entries, the index is rebuilt once every max_entries appends."""
+        drop = len(self._entries) - self.max_entries
+        if drop <= 0:
+            return
+        self._entries = self._entries[drop:]
+        self._base += drop
+        self._by_path = {}
+        self._counts = Counter()
+        for offset, (path, _) in enumerate(self._entries):
+            self._by_path.setdefault(path, []).append(self._base + offset)
+            self._counts[path] += 1
+
+    def append(self, line: str, path: Union[List[str], str, None] = None) -> None:
+        """Add a command line, 'path' is the command it resolved to (the first word if not given)."""
+        line = " ".join(line.split())
+        if line == "":
+            return
+        if path is None or len(path) == 0:
+            path = line.split()[0]
+        elif not isinstance(path, str):
+            path = " ".join(path)
+        with self._lock:
+            if self._loaded.is_set():
+                self._add(path, line)
+            else:
+                self._early.append((path, line))
+            if self.path is not None:
+                self._queue.append(f"{path}\t{line}\n")
+        if self.path is not None:
+            self._wakeup.set()
+
+    def lines(self, limit: Union[int, None] = None) -> List[str]:
+        """The last 'limit' command lines, oldest first."""
+        self._loaded.wait()
+        with self._lock:
+            limit = self.max_entries if limit is None else min(limit, self.max_entries)
+            entries = self._entries[-limit:] if limit > 0 else []
+            return [line for _, line in entries]
+
+    def most_used(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """The most executed command paths with their count."""
+        self._loaded.wait()
+        with self._lock:
+            return self._counts.most_common(limit)
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """
+        The most recent distinct command lines matching the query, newest first.
+        When the query is the start of command paths (e.g. 'math ad') the index is
+        used, otherwise the lines containing the query are scanned from the newest.
+        """
+        self._loaded.wait()
+        query = " ".join(query.split())
+        with self._lock:
+            paths = [path for path in self._by_path if path.startswith(query)] if query != "" else []
+            if len(paths) > 0:
+                candidates: Iterator[int] = heapq.merge(*[reversed(self._by_path[path]) for path in paths],
+                                                        reverse=True)
+                lines = (self._entries[seq - self._base][1] for seq in candidates)
+            else:
+                lines = (line for _, line in reversed(self._entries) if query in line)
+            found: List[str] = []
+            seen = set()
+            for line in lines:
+                if line not in seen:
+                    seen.add(line)
+                    found.append(line)
+                    if len(found) == limit:
+                        break
+            return found
+
+    # ---- file ----
+
+    def _load(self) -> None:
+        # only the tail is kept in memory while reading
+        records: Deque[str] = deque(maxlen=self.max_entries)
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="replace") as fp:
+                for record in fp:
+                    self._file_entries += 1
+                    records.append(record)
+                self._file_bytes = fp.tell()
+        except OSError:
+            pass
+        with self._lock:
+            for record in records:
+                if record.strip() != "":
+                    self._add(*_parse(record))
+            for path, line in self._early:
+                self._add(path, line)
+            self._early = []
+            self._loaded.set()
+        if self._file_entries > self.max_entries or self._file_bytes > self.max_bytes:
+            # e.g. the limits have been lowered since the file was written
+            try:
+                self._compact()
+            except OSError:
+                # as for the appends, a read-only or full disk must not stop the writer
+                pass
+
+    def _write_queued(self) -> None:
+        with self._lock:
+            records = list(self._queue)
+            self._queue.clear()
+        if len(records) == 0:
+            return
+        data = "".join(records)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with _file_lock(self.path), open(self.path, "a", encoding="utf-8") as fp:
+            fp.write(data)
+        self._file_entries += len(records)
+        self._file_bytes += len(data.encode("utf-8"))
+        if self._file_entries > self.max_entries * COMPACTION_SLACK or \
+                self._file_bytes > self.max_bytes * COMPACTION_SLACK:
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Rewrite the file with its most recent entries within the limits, the
+        lines appended by the other sessions included.
+        """
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with _file_lock(self.path):
+            records: Deque[bytes] = deque(maxlen=self.max_entries)
+            with open(self.path, "rb") as fp:
+                records.extend(record for record in fp if record.strip() != b"")
+                size = fp.tell()
+            try:
+                with open(tmp_path, "wb") as tmp:
+                    kept = self._tail(records)
+                    tmp.writelines(kept)
+                    # without a lock another session may have appended meanwhile
+                    while os.path.getsize(self.path) > size:
+                        with open(self.path, "rb") as fp:
+                            fp.seek(size)
+                            appended = [record for record in fp if record.strip() != b""]
+                            size = fp.tell()
+                        tmp.writelines(appended)
+                        kept.extend(appended)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        self._file_entries = len(kept)
+        self._file_bytes = sum(len(record) for record in kept)
+
+    def _tail(self, records: Deque[bytes]) -> List[bytes]:
+        """The last records within max_bytes, each one ending with a newline."""
+        size = 0
+        keep = 0
+        for record in reversed(records):
+            size += len(record) + (0 if record.endswith(b"\n") else 1)
+            if size > self.max_bytes:
+                break
+            keep += 1
+        return [record if record.endswith(b"\n") else record + b"\n"
+                for record in list(records)[len(records) - keep:]]
+
+    def _run(self) -> None:
+        try:
+            self._load()
+        finally:
+            self._loaded.set()
+        while not self._stop.is_set():
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                self._write_queued()
+            except OSError:
+                # a read-only or full disk must not break the prompt
+                pass
+
+    def close(self) -> None:
+        """Write the queued lines and stop the background thread."""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join()
+        try:
+            self._write_queued()
+        except OSError:
+            pass
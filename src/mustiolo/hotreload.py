@@ -0,0 +1,192 @@
+"""
+Reload the modules defining the commands without restarting the CLI.
+
+    > reload
+    reloaded app.db in 4.21 ms
+    changed: db query, db dump
+
+Only the modules whose source file changed since they were loaded (or last
+reloaded) are imported again. Every command defined in them is replaced by a
+new CommandModel built from the new function: the group entry of the command
+and of its alias are swapped for the new one, the CommandModel running before
+is never modified. A session executing on a frozen tree keeps the commands it
+was frozen with. The listeners of the tree (the search index, the middleware
+chains, ...) receive a "remove" and an "add" event for every replaced command.
+
+The commands are found again in the reloaded module by their qualified name.
+Commands added to a module after the start need a restart, as the commands
+defined in the main script and the methods.
+"""
+import importlib
+import inspect
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple, Union
+
+from mustiolo.models.command import CommandAlias, CommandModel, SubCommandGroup, build_command
+from mustiolo.utils import parse_docstring_for_menu_usage
+
+Stamp = Tuple[int, int]
+
+
+def _stamp(path: str) -> Union[Stamp, None]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _reloadable(cmd: CommandModel) -> bool:
+    return inspect.isfunction(cmd.f) and "<locals>" not in cmd.f.__qualname__
+
+
+def _fingerprint(cmd: CommandModel) -> Tuple:
+    code = cmd.f.__code__
+    return (code.co_code, code.co_consts, code.co_names, cmd.f.__defaults__, cmd.menu, cmd.usage,
+            [str(param) for param in cmd.parameters])
+
+
+@dataclass
+class ReloadReport:
+    modules: List[str] = field(default_factory=list)
+    # paths of the commands whose code, parameters or help changed
+    changed: List[str] = field(default_factory=list)
+    # module or command path -> error, those keep running the previous code
+    errors: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        if len(self.modules) == 0 and len(self.errors) == 0:
+            return "Nothing to reload"
+        lines = [f"reloaded {', '.join(self.modules) or 'nothing'} in {self.elapsed * 1000:.2f} ms"]
+        if len(self.changed) > 0:
+            lines.append(f"changed: {', '.join(self.changed)}")
+        lines.extend(f"error: {name}: {error}" for name, error in self.errors.items())
+        return "\n".join(lines)
+
+
+class Reloader:
+    """
+    Reloads the modules in 'modules', the source file and its stamp by module
+    name, filled as the commands are added to the tree (see utils.source_stamp).
+    """
+
+    def __init__(self, modules: Dict[str, Tuple[str, Stamp]]):
+        self._modules = modules
+        # module name -> stamp of a source which failed to import, not tried again
+        self._failed: Dict[str, Stamp] = {}
+        self._watcher: Union[threading.Thread, None] = None
+        self._stop = threading.Event()
+        # one reload at a time, the watcher thread and the reload builtin may overlap
+        self._lock = threading.Lock()
+        # set by the watcher when a source file changed
+        self.pending = threading.Event()
+
+    def changed_modules(self) -> List[str]:
+        """The modules whose source file changed since they were loaded."""
+        changed = []
+        for name, (source, stamp) in list(self._modules.items()):
+            current = _stamp(source)
+            if current not in (None, stamp, self._failed.get(name)):
+                changed.append(name)
+        return changed
+
+    def reload(self, root: SubCommandGroup) -> ReloadReport:
+        """Import the changed modules again and replace their commands in 'root'."""
+        with self._lock:
+            return self._reload(root)
+
+    def _reload(self, root: SubCommandGroup) -> ReloadReport:
+        start = time.perf_counter()
+        self.pending.clear()
+        report = ReloadReport()
+        reloaded = set()
+        for name in self.changed_modules():
+            source, _ = self._modules[name]
+            stamp = _stamp(source)
+            try:
+                importlib.reload(sys.modules[name])
+            except Exception as ex:
+                report.errors[name] = f"{type(ex).__name__}: {ex}"
+                self._failed[name] = stamp
+                continue
+            self._failed.pop(name, None)
+            self._modules[name] = (source, stamp)
+            reloaded.add(name)
+            report.modules.append(name)
+
+        if len(reloaded) > 0:
+            for path, cmd in list(root.walk()):
+                if _reloadable(cmd) and cmd.f.__module__ in reloaded:
+                    self._swap(root, path, cmd, report)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _swap(self, root: SubCommandGroup, path: Tuple[str, ...], cmd: CommandModel, report: ReloadReport) -> None:
+        label = " ".join(path)
+        fn: object = sys.modules[cmd.f.__module__]
+        for attribute in cmd.f.__qualname__.split("."):
+            fn = getattr(fn, attribute, None)
+        # the names removed from the source are left in the module by the reload
+        if not inspect.isfunction(fn) or fn is cmd.f:
+            report.errors[label] = f"'{cmd.f.__qualname__}' not found in {cmd.f.__module__}"
+            return
+        # the help messages given at registration are kept, those from the docstring follow it
+        old_menu, old_usage = parse_docstring_for_menu_usage(cmd.f)
+        try:
+            new = build_command(fn, cmd.name, cmd.alias, "" if cmd.menu == old_menu else cmd.menu,
+                                "" if cmd.usage in (old_usage, old_menu) else cmd.usage)
+        except Exception as ex:
+            report.errors[label] = str(ex)
+            return
+        completers = {param.name: param.completer for param in cmd.parameters}
+        for param in new.parameters:
+            param.completer = param.completer or completers.get(param.name)
+        new.raw_arguments = cmd.raw_arguments
+
+        group = root
+        for name in path[:-1]:
+            group = group.get_command(name)
+        if _fingerprint(cmd) != _fingerprint(new):
+            report.changed.append(label)
+        # the listeners of the group forward the events to the ones of its parents
+        group._notify("remove", path[-1:], cmd)
+        # a single assignment per key, a lookup gets either the previous command or the new one;
+        # the identity checks only guard against an entry replaced in the meantime
+        commands = group.commands
+        if commands.get(path[-1]) is cmd:
+            commands[path[-1]] = new
+        alias = commands.get(cmd.alias) if cmd.alias else None
+        if isinstance(alias, CommandAlias) and alias.command is cmd:
+            commands[cmd.alias] = CommandAlias(command=new)
+        group._notify("add", path[-1:], new)
+
+    def watch(self, interval: float = 1.0, on_change: Union[Callable[[], None], None] = None) -> None:
+        """
+        Check the source files every 'interval' seconds in a background thread,
+        'pending' is set (and 'on_change' called) when one changed. The reload
+        itself is left to the thread executing the commands.
+        """
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                if not self.pending.is_set() and len(self.changed_modules()) > 0:
+                    self.pending.set()
+                    if on_change is not None:
+                        on_change()
+
+        self._watcher = threading.Thread(target=run, name="mustiolo-reload", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
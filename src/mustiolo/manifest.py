@@ -0,0 +1,212 @@
+"""
+Static manifest of a command tree and shell completion scripts generated from it.
+
+The manifest is a compact JSON document listing every command path with its
+aliases and parameters. Bash and zsh completion scripts are generated from the
+manifest, so the completion runs in pure shell without starting Python.
+"""
+import hashlib
+import json
+from typing import Any, Collection, Dict, List, Tuple
+
+from mustiolo.completion import Choices
+from mustiolo.models.command import CommandAlias, CommandGroup, CommandModel, SubCommandGroup
+from mustiolo.models.parameters import ParameterModel, ptype_to_str
+
+
+MANIFEST_VERSION = 1
+
+
+def _parameter_choices(param: ParameterModel) -> List[str]:
+    # only static choices can be exported, the other providers need Python
+    if isinstance(param.completer, Choices):
+        return param.completer.values
+    return []
+
+
+def _command_entry(path: Tuple[str, ...], cmd: CommandModel) -> Dict[str, Any]:
+    parameters = []
+    # builtins with raw arguments do not declare real parameters
+    if not cmd.raw_arguments:
+        for param in cmd.parameters:
+            entry = {"name": param.name, "type": ptype_to_str(param.ptype),
+                     "required": param.default is None}
+            choices = _parameter_choices(param)
+            if len(choices) > 0:
+                entry["choices"] = choices
+            parameters.append(entry)
+    return {"path": list(path), "alias": cmd.alias, "parameters": parameters}
+
+
+def _collect(group: CommandGroup, prefix: Tuple[str, ...], groups: List[Dict[str, Any]],
+             commands: List[Dict[str, Any]], exclude: Collection[str] = ()) -> None:
+    for name, entry in group.commands.items():
+        if isinstance(entry, CommandAlias) or name in exclude:
+            continue
+        path = prefix + (name,)
+        if isinstance(entry, SubCommandGroup):
+            groups.append({"path": list(path)})
+            _collect(entry, path, groups, commands)
+            continue
+        commands.append(_command_entry(path, entry))
+
+
+def fingerprint(manifest: Dict[str, Any]) -> str:
+    """Hash of the tree described by the manifest, the program name is not part of it."""
+    payload = json.dumps([manifest["groups"], manifest["commands"]], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_manifest(root: CommandGroup, prog: str, exclude: Collection[str] = ()) -> Dict[str, Any]:
+    """
+    Walk the tree from the root menu and returns the manifest, without the root
+    commands named in 'exclude' (CLI.build_manifest excludes the interactive builtins).
+    """
+    groups: List[Dict[str, Any]] = []
+    commands: List[Dict[str, Any]] = []
+    _collect(root, (), groups, commands, exclude)
+    manifest = {"version": MANIFEST_VERSION, "prog": prog, "groups": groups, "commands": commands}
+    manifest["fingerprint"] = fingerprint(manifest)
+    return manifest
+
+
+def write_manifest(manifest: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, separators=(",", ":"))
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as fp:
+        manifest = json.load(fp)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version '{manifest.get('version')}' in '{path}'")
+    return manifest
+
+
+def check_manifest(manifest: Dict[str, Any], root: CommandGroup, exclude: Collection[str] = ()) -> List[str]:
+    """
+    Compare a manifest with the live tree, the root commands in 'exclude' are left out as in build_manifest.
+    Returns the list of differences, an empty list means the manifest is up to date.
+    """
+    live = build_manifest(root, manifest.get("prog", ""), exclude)
+    if live["fingerprint"] == manifest.get("fingerprint"):
+        return []
+
+    def index(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return {" ".join(entry["path"]): entry for entry in entries}
+
+    differences = []
+    for kind in ("groups", "commands"):
+        old = index(manifest.get(kind, []))
+        new = index(live[kind])
+        differences.extend([f"added: {path}" for path in new.keys() - old.keys()])
+        differences.extend([f"removed: {path}" for path in old.keys() - new.keys()])
+        differences.extend([f"changed: {path}" for path in new.keys() & old.keys() if new[path] != old[path]])
+    if len(differences) == 0:
+        # same entries but the manifest has been edited by hand
+        differences.append("fingerprint mismatch")
+    return sorted(differences)
+
+
+def _completion_table(manifest: Dict[str, Any]) -> Tuple[Dict[str, List[str]], Dict[Tuple[str, ...], List[str]]]:
+    """
+    Returns the words to offer for every group path and, for every command path
+    (alias included), the words to offer for each positional argument.
+    """
+    children: Dict[str, List[str]] = {"": []}
+    for group in manifest["groups"]:
+        children.setdefault(" ".join(group["path"]), [])
+    leaves: Dict[Tuple[str, ...], List[str]] = {}
+    for entry in manifest["groups"] + manifest["commands"]:
+        parent = " ".join(entry["path"][:-1])
+        children.setdefault(parent, []).append(entry["path"][-1])
+        if entry.get("alias", "") != "":
+            children[parent].append(entry["alias"])
+    for entry in manifest["commands"]:
+        arguments = [" ".join(param.get("choices", [])) for param in entry["parameters"]]
+        leaves[tuple(entry["path"])] = arguments
+        if entry["alias"] != "":
+            leaves[tuple(entry["path"][:-1]) + (entry["alias"],)] = arguments
+    return children, leaves
+
+
+def _quote(text: str) -> str:
+    """Double quote a string for a shell script."""
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("$", "\\$").replace("`", "\\`")
+    return f'"{escaped}"'
+
+
+def _function_name(prog: str) -> str:
+    return "_" + "".join(c if c.isalnum() else "_" for c in prog) + "_complete"
+
+
+def _case_branches(manifest: Dict[str, Any], indent: str) -> List[str]:
+    children, leaves = _completion_table(manifest)
+    lines = []
+    for path, words in sorted(children.items()):
+        lines.append(f"{indent}{_quote(path)}) candidates={_quote(' '.join(sorted(words)))} ;;")
+    for path, arguments in sorted(leaves.items()):
+        if not any(arguments):
+            continue
+        joined = " ".join(path)
+        values = " ".join(_quote(arg) for arg in arguments)
+        lines.append(f"{indent}{_quote(joined)}|{_quote(joined + ' ')}*)")
+        lines.append(f"{indent}    args=({values}); depth={len(path)} ;;")
+    return lines
+
+
+def generate_bash_completion(manifest: Dict[str, Any]) -> str:
+    prog = manifest["prog"]
+    function = _function_name(prog)
+    lines = [
+        f"# bash completion for {prog}, generated by mustiolo",
+        f"# fingerprint: {manifest['fingerprint']}",
+        f"{function}() {{",
+        '    local cur="${COMP_WORDS[COMP_CWORD]}"',
+        "    local start=1",
+        '    # the help command takes a command path too',
+        '    if [[ "${COMP_WORDS[1]}" == "?" && $COMP_CWORD -gt 1 ]]; then start=2; fi',
+        '    local cmd_path="${COMP_WORDS[*]:start:COMP_CWORD-start}"',
+        '    local candidates="" depth=-1',
+        "    local -a args=()",
+        '    case "$cmd_path" in',
+        *_case_branches(manifest, " " * 8),
+        "    esac",
+        "    if [[ $depth -ge 0 ]]; then",
+        '        candidates="${args[COMP_CWORD - start - depth]}"',
+        "    fi",
+        "    # mapfile avoids the pathname expansion of candidates like '?'",
+        '    mapfile -t COMPREPLY < <(compgen -W "$candidates" -- "$cur")',
+        "}",
+        f"complete -F {function} {prog}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def generate_zsh_completion(manifest: Dict[str, Any]) -> str:
+    prog = manifest["prog"]
+    function = _function_name(prog)
+    lines = [
+        f"#compdef {prog}",
+        f"# zsh completion for {prog}, generated by mustiolo",
+        f"# fingerprint: {manifest['fingerprint']}",
+        f"{function}() {{",
+        "    local start=2",
+        '    # the help command takes a command path too',
+        '    if [[ "${words[2]}" == "?" && $CURRENT -gt 2 ]]; then start=3; fi',
+        '    local cmd_path="${(j: :)words[start,CURRENT-1]}"',
+        '    local candidates="" depth=-1',
+        "    local -a args",
+        '    case "$cmd_path" in',
+        *_case_branches(manifest, " " * 8),
+        "    esac",
+        "    if (( depth >= 0 )); then",
+        '        candidates="${args[CURRENT - start - depth + 1]}"',
+        "    fi",
+        "    compadd -- ${=candidates}",
+        "}",
+        f"compdef {function} {prog}",
+        "",
+    ]
+    return "\n".join(lines)
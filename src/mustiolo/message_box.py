@@ -1,5 +1,7 @@
+import unicodedata
 from enum import IntEnum
-from typing import List
+from functools import lru_cache
+from typing import List, Tuple
 
 
 TOP_LEFT = 0
@@ -26,26 +28,167 @@ class BorderStyle(IntEnum):
     SINGLE_BOLD = 3
     DOUBLE_RECTANGLE = 4
 
-def _handle_line(line: str, border_style: BorderStyle, columns: int = 80) -> List[str]:
-    """Handle a line of text, wrapping it to fit within the specified number of columns."""
-    side_border = _borders[border_style][SIDE]
 
-    # convert '\t' to '    ' (4 spaces)
-    line = line.expandtabs(4)
+def _unicode_width(char: str) -> int:
+    if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me", "Cf", "Cc"):
+        return 0
+    if unicodedata.east_asian_width(char) in ("W", "F"):
+        return 2
+    return 1
+
+
+class _WidthMap(dict):
+    """
+    str.translate table replacing every character with as many characters as
+    the columns it takes, so the width of a text is the length of its translation.
+    Filled the first time a character is seen.
+    """
+
+    def __missing__(self, code: int) -> str:
+        char = chr(code)
+        width = _unicode_width(char)
+        # a character taking a column is kept, so the spaces still split the words
+        value = self[code] = char if width == 1 else "\x00" * width
+        return value
+
+
+_widths = _WidthMap()
+
+
+def char_width(char: str) -> int:
+    """Columns taken by a character on the terminal: 0, 1 or 2 (CJK and emoji)."""
+    return len(_widths[ord(char)])
+
+
+def display_width(text: str) -> int:
+    """Columns taken by the text on the terminal."""
+    if text.isascii():
+        return len(text)
+    return len(text.translate(_widths))
+
+
+def _word_widths(line: str, words: List[str]) -> List[int]:
+    """Columns taken by each of the words of the line split at the spaces, one translate for the line."""
+    if line.isascii():
+        return [len(word) for word in words]
+    return [len(word) for word in line.translate(_widths).split(" ")]
+
 
-    # Calculate the number of spaces available for the message removing the borders and padding
-    message_spaces = columns - ((len(side_border) * 2) + 2)
-    # Split the line into chunks of message_spaces
-    lines = [line[i:i + message_spaces] for i in range(0, len(line), message_spaces)]
-    # Pad the last line if necessary
-    if len(lines) == 0:
-        return [f"{' ' * message_spaces}"]
+def _split_word(word: str, width: int) -> List[str]:
+    """Split a word longer than 'width' columns, a character wider than 'width' gets a chunk of its own."""
+    if word.isascii():
+        return [word[i:i + width] for i in range(0, len(word), width)]
+    chunks = []
+    start = 0
+    used = 0
+    for index, char in enumerate(word):
+        char_columns = char_width(char)
+        if used + char_columns > width and used > 0:
+            chunks.append(word[start:index])
+            start = index
+            used = 0
+        used += char_columns
+    chunks.append(word[start:])
+    return chunks
 
-    if len(lines[-1]) < message_spaces:
-        lines[-1] += ' ' * (message_spaces - len(lines[-1]))
+
+def wrap(line: str, width: int) -> List[str]:
+    """
+    Wrap a line at the spaces into chunks padded to 'width' columns, the words
+    longer than a chunk are split. The spaces where the line is wrapped are
+    dropped, the indentation of the first chunk is kept.
+    """
+    width = max(width, 1)
+    line = line.expandtabs(4)
+    words = line.split(" ")
+    widths = _word_widths(line, words)
+    line_columns = sum(widths) + len(words) - 1
+    if line_columns <= width:
+        return [line + " " * (width - line_columns)]
+
+    lines: List[str] = []
+    pieces: List[str] = []
+    used = 0
+
+    def flush() -> None:
+        nonlocal pieces, used
+        joined = "".join(pieces)
+        text = joined.rstrip(" ")
+        used -= len(joined) - len(text)
+        lines.append(text + " " * (width - used))
+        pieces = []
+        used = 0
+
+    for index, (word, word_columns) in enumerate(zip(words, widths)):
+        if index > 0 and used < width and (used > 0 or len(lines) == 0):
+            pieces.append(" ")
+            used += 1
+        if word == "":
+            continue
+        if used + word_columns <= width:
+            pieces.append(word)
+            used += word_columns
+            continue
+        if "".join(pieces).strip(" ") == "":
+            # only the indentation, dropped with the word on the next line
+            pieces = []
+            used = 0
+        else:
+            flush()
+        if word_columns <= width:
+            pieces.append(word)
+            used = word_columns
+            continue
+        chunks = _split_word(word, width)
+        for chunk in chunks[:-1]:
+            pieces.append(chunk)
+            used = display_width(chunk)
+            flush()
+        pieces.append(chunks[-1])
+        used = display_width(chunks[-1])
+    if used > 0 or len(lines) == 0:
+        flush()
     return lines
 
 
+def _truncate(text: str, width: int) -> str:
+    """The longest start of the text within 'width' columns, a wide character not fitting is dropped."""
+    if display_width(text) <= width:
+        return text
+    used = 0
+    for index, char in enumerate(text):
+        used += char_width(char)
+        if used > width:
+            return text[:index]
+    return text
+
+
+@lru_cache(maxsize=64)
+def _frame(border_style: BorderStyle, columns: int) -> Tuple[str, int, str, str]:
+    """The side border, the room for the message, the untitled header and the footer of a box."""
+    borders = _borders[border_style]
+    message_spaces = columns - ((len(borders[SIDE]) * 2) + 2)
+    header_fill = columns - (len(borders[TOP_LEFT]) + len(borders[TOP_RIGHT]))
+    header = f"{borders[TOP_LEFT]}{borders[TOP] * header_fill}{borders[TOP_RIGHT]}"
+    footer = f"{borders[BOTTOM_LEFT]}{borders[TOP] * (columns - 2)}{borders[BOTTOM_RIGHT]}"
+    return borders[SIDE], message_spaces, header, footer
+
+
+@lru_cache(maxsize=256)
+def _titled_header(title: str, border_style: BorderStyle, columns: int) -> str:
+    borders = _borders[border_style]
+    # 2 whitespaces around the title
+    header_fill = columns - (display_width(title) + len(borders[TOP_LEFT]) + len(borders[TOP_RIGHT]) + 2)
+    half_header_fill = header_fill // 2
+    return f"{borders[TOP_LEFT]}{borders[TOP] * half_header_fill} {title} " \
+           f"{borders[TOP] * (half_header_fill + header_fill % 2)}{borders[TOP_RIGHT]}"
+
+
+def _handle_line(line: str, border_style: BorderStyle, columns: int = 80) -> List[str]:
+    """Handle a line of text, wrapping it to fit within the specified number of columns."""
+    return wrap(line, _frame(border_style, columns)[1])
+
+
 def draw_message_box(title: str, content: str, border_style: BorderStyle = BorderStyle.SINGLE_ROUNDED,
                      columns: int = 80) -> str:
     """
@@ -69,31 +212,15 @@ def draw_message_box(title: str, content: str, border_style: BorderStyle = Borde
 
     # check if the title fits within the specified number of columns
     # otherwise use sub string
-    if len(title) + 4 > columns:
-        title = title[:columns - 4]
+    title = _truncate(title, columns - 4)
 
-    borders = _borders[border_style]
-    lines = []
-
-    if title != "":
-        # header with title
-        header_fill = columns - (len(title) + len(borders[TOP_LEFT]) + len(borders[TOP_RIGHT]) + 2) # 2 whitespaces
-        half_header_fill = header_fill // 2
-        lines.append(
-            f"{borders[TOP_LEFT]}{borders[TOP]* half_header_fill} {title} {borders[TOP] * (half_header_fill + header_fill%2)}{borders[TOP_RIGHT]}"
-        )
-    else:
-        # header with title
-        header_fill = columns - (len(borders[TOP_LEFT]) + len(borders[TOP_RIGHT]))
-        lines.append(
-            f"{borders[TOP_LEFT]}{borders[TOP]* header_fill}{borders[TOP_RIGHT]}"
-        )
+    side, message_spaces, header, footer = _frame(border_style, columns)
+    lines = [_titled_header(title, border_style, columns) if title != "" else header]
 
     # content will be split into lines
     # and each line will be wrapped to fit within the specified number of columns.
     for line in content.splitlines():
-        for chunk in _handle_line(line, border_style, columns):
-            lines.append(f"{borders[SIDE]} {chunk} {borders[SIDE]}")
-    # footer
-    lines.append(f"{borders[BOTTOM_LEFT]}{borders[TOP] * (columns - 2)}{borders[BOTTOM_RIGHT]}")
-    return '\n'.join(lines)
\ No newline at end of file
+        for chunk in wrap(line, message_spaces):
+            lines.append(f"{side} {chunk} {side}")
+    lines.append(footer)
+    return '\n'.join(lines)
@@ -0,0 +1,58 @@
+"""
+Middleware chain around the command execution.
+
+A middleware is a callable receiving the CommandContext and a 'call_next'
+callable running the rest of the chain (and finally the command):
+
+    def audit(context: CommandContext, call_next: Callable[[], Any]) -> Any:
+        log(context.path, context.arguments)
+        return call_next()
+
+Middlewares are registered on a menu and are inherited by its sub menus. The
+chain of a command is composed when the command or a middleware above it is
+registered, never while commands run, and commands without middlewares are
+called directly.
+"""
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+Middleware = Callable[['CommandContext', Callable[[], Any]], Any]
+
+@dataclass
+class CommandContext:
+    path: List[str]
+    # the CommandModel (or CommandAlias) being executed
+    command: Any
+    # arguments already cast, a middleware can replace them before call_next()
+    arguments: List[Any]
+    # free space to share data between middlewares
+    state: Dict[str, Any] = field(default_factory=dict)
+
+
+def _call_command(command: Callable, context: CommandContext) -> Any:
+    return command(*context.arguments)
+
+
+def _step(middleware: Middleware, next_step: Callable[[CommandContext], Any], context: CommandContext) -> Any:
+    return middleware(context, partial(next_step, context))
+
+
+def compose(command: Callable, middlewares: List[Middleware], path: List[str]) -> Callable[..., Any]:
+    """
+    Returns a callable with the same signature as the command running it
+    through the middlewares, the first one is the outermost.
+    Without middlewares the command itself is returned.
+    """
+    if len(middlewares) == 0:
+        return command
+
+    chain: Callable[[CommandContext], Any] = partial(_call_command, command)
+    for middleware in reversed(middlewares):
+        chain = partial(_step, middleware, chain)
+    path = list(path)
+
+    def handler(*arguments: Any) -> Any:
+        return chain(CommandContext(path=path, command=command, arguments=list(arguments)))
+
+    return handler
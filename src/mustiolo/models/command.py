@@ -1,12 +1,20 @@
-from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List, NewType, Union
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, Mapping, NewType, Tuple, Union
 
 from mustiolo.exception import (
+    CommandConflicts,
     CommandDuplicate,
+    CommandGroupNotExecutable,
     CommandMissingMenuMessage,
     CommandNotFound,
+    ParameterSourceError,
+    ParameterWrongType,
 )
-from mustiolo.models.parameters import ParameterModel
+from mustiolo import middleware
+from mustiolo.completion import make_provider
+from mustiolo.models.parameters import ParameterModel, ParsedCommand
+from mustiolo.results import ResultStore
 from mustiolo.utils import (
     get_function_location,
     get_function_metadata,
@@ -17,6 +25,14 @@ from mustiolo.utils import (
 CommandsType = NewType('CommandsType', Dict[str, Union['CommandModel', 'CommandAlias',
                                                         'SubCommandGroup']])
 
+# A listener receives the event ("add", "remove" or "use" when a middleware is
+# added above the command), the command path relative to the group it is
+# subscribed to and the command itself.
+CommandListener = Callable[[str, Tuple[str, ...], 'CommandModel'], None]
+# Optional companion of a listener receiving the same event for many commands
+# at once, e.g. for all the commands added by register_commands.
+BatchListener = Callable[[str, List[Tuple[Tuple[str, ...], 'CommandModel']]], None]
+
 
 @dataclass
 class CommandModel:
@@ -33,6 +49,9 @@ class CommandModel:
     usage: str = ""  # this is the long help message
     # TODO: change parameters into arguments
     parameters: List[ParameterModel] = field(default_factory=list)
+    # builtin commands like '?' receive the arguments as a list of strings
+    # without any cast
+    raw_arguments: bool = False
 
     def __str__(self) -> str:
         return self.get_usage()
@@ -58,7 +77,7 @@ class CommandModel:
     def get_optional_parameters(self) -> List[ParameterModel]:
         return [ param for param in self.parameters if param.default is not None ]
 
-    def cast_arguments(self, args: List[str]) -> List[Any]:
+    def cast_arguments(self, args: List[Any]) -> List[Any]:
         """
         This function cast the arguments to the correct type.
         Raises an exception if the number of arguments is less than the
@@ -69,7 +88,9 @@ class CommandModel:
         if len(args) > len(self.parameters):
             raise Exception("Too many parameters")
 
-        return [ self.parameters[index].convert_to_type(args[index]) for index in range(0, len(args)) ]
+        # objects coming from the result store ('$1') are passed as they are
+        return [ self.parameters[index].convert_to_type(args[index]) if isinstance(args[index], str) else args[index]
+                 for index in range(0, len(args)) ]
 
     def __call__(self, *args, **kwargs) -> Any:
         if self.f is None:
@@ -84,6 +105,14 @@ class CommandAlias:
     def __str__(self) -> str:
         return self.command.get_usage()
 
+    @property
+    def raw_arguments(self) -> bool:
+        return self.command.raw_arguments
+
+    @property
+    def parameters(self) -> List[ParameterModel]:
+        return self.command.parameters
+
     def get_menu(self, padding: int) -> str:
         return self.command.get_menu(padding)
 
@@ -104,6 +133,49 @@ class CommandAlias:
             return None
         return self.command(*args, **kwargs)
 
+def build_command(fn: Callable, name: Union[str, None] = None, alias: str = "", menu: str = "",
+                  usage: str = "", completers: Union[Dict[str, Any], None] = None) -> CommandModel:
+    """Build the CommandModel of a function, the help messages come from its docstring if not given."""
+    docstring_msgs = parse_docstring_for_menu_usage(fn)
+
+    command_name = name if name is not None else fn.__name__
+    command_menu = menu if menu != "" else docstring_msgs[0]
+    command_usage = usage if usage != "" else docstring_msgs[1]
+
+    if command_name == "" or command_name is None:
+        raise Exception(f"Command name '{command_name}' '{fn.__name__}' cannot be None or empty")
+
+    if command_menu == "":
+        fmeta = get_function_metadata(fn)
+        raise CommandMissingMenuMessage(fmeta.name, fmeta.location.filename, fmeta.location.lineno)
+
+    # if usage is not defined use menu help message
+    if command_usage == "":
+        command_usage = command_menu
+
+    parameters = parse_parameters(fn)
+    if completers is not None:
+        by_name = {param.name: param for param in parameters}
+        for pname, spec in completers.items():
+            if pname not in by_name:
+                raise Exception(f"Completer for unknown parameter '{pname}' in '{command_name}'")
+            by_name[pname].completer = make_provider(spec)
+    return CommandModel(name=command_name, alias=alias, f=fn, menu=command_menu, usage=command_usage,
+                        parameters=parameters)
+
+
+def _entry_location(entry: Union[CommandModel, CommandAlias, 'SubCommandGroup']) -> Tuple[str, int]:
+    """Where the function of a command is defined, for the error messages."""
+    if isinstance(entry, CommandAlias):
+        entry = entry.command
+    elif isinstance(entry, CommandGroup):
+        entry = entry._current_cmd
+    if entry.f is None or not hasattr(entry.f, "__code__"):
+        return "<unknown>", 0
+    location = get_function_location(entry.f)
+    return location.filename, location.lineno
+
+
 # TODO find a better name for this class, maybe CommandSet or CommandCollection
 class CommandGroup:
     """
@@ -114,6 +186,7 @@ class CommandGroup:
         # commands key is the command name and its alias (2 entries which points to the same value)
         self._commands: CommandsType = {}
         self._max_command_length = 0
+        self._listeners: List[Tuple[CommandListener, Union[BatchListener, None]]] = []
 
     @property
     def commands(self) -> CommandsType:
@@ -136,43 +209,133 @@ class CommandGroup:
         """
         return name in self._commands
 
-    def register_command(self, fn: Callable, name: Union[str, None] = None, alias: str = "",
-                          menu: str = "", usage: str = "") -> None:
+    def subscribe(self, listener: CommandListener, batch: Union[BatchListener, None] = None) -> None:
+        """
+        Register a listener notified every time a command is added to this
+        group or to one of its sub groups, even after the group has been
+        included somewhere else. When many commands are added at once the
+        'batch' listener, if given, receives all of them in a single call.
+        The commands already in the tree are replayed to the listener.
+        """
+        self._listeners.append((listener, batch))
+        self._notify_batch_to(listener, batch, "add", list(self.walk()))
+
+    @staticmethod
+    def _notify_batch_to(listener: CommandListener, batch: Union[BatchListener, None], event: str,
+                         entries: List[Tuple[Tuple[str, ...], 'CommandModel']]) -> None:
+        if len(entries) == 0:
+            return
+        if batch is not None:
+            batch(event, entries)
+            return
+        for path, cmd in entries:
+            listener(event, path, cmd)
+
+    def _notify(self, event: str, path: Tuple[str, ...], cmd: 'CommandModel') -> None:
+        for listener, _ in self._listeners:
+            listener(event, path, cmd)
 
-        docstring_msgs = parse_docstring_for_menu_usage(fn)
+    def _notify_batch(self, event: str, entries: List[Tuple[Tuple[str, ...], 'CommandModel']]) -> None:
+        for listener, batch in self._listeners:
+            self._notify_batch_to(listener, batch, event, entries)
 
-        command_name = name if name is not None else fn.__name__
-        command_menu = menu if menu != "" else docstring_msgs[0]
-        command_usage = usage if usage != "" else docstring_msgs[1]
+    def _announce(self, name: str, entry: Union['CommandModel', 'CommandAlias', 'SubCommandGroup']) -> None:
+        """Notify the listeners about an entry included from another group."""
+        if isinstance(entry, CommandAlias):
+            return
+        if isinstance(entry, SubCommandGroup):
+            # forward everything happening in the sub group to our listeners
+            entry.subscribe(lambda event, path, cmd: self._notify(event, (name,) + path, cmd),
+                            lambda event, entries: self._notify_batch(
+                                event, [((name,) + path, cmd) for path, cmd in entries]))
+            return
+        self._notify("add", (name,), entry)
 
-        if command_name == "" or command_name is None:
-            raise Exception(f"Command name '{command_name}' '{fn.__name__}' cannot be None or empty")
+    def walk(self) -> Iterator[Tuple[Tuple[str, ...], 'CommandModel']]:
+        """
+        Yields (path, command) for every command in the tree rooted in this group.
+        Aliases are skipped, sub groups are visited recursively.
+        """
+        for name, entry in list(self._commands.items()):
+            if isinstance(entry, CommandAlias):
+                continue
+            if isinstance(entry, SubCommandGroup):
+                for path, cmd in entry.walk():
+                    yield (name,) + path, cmd
+                continue
+            yield (name,), entry
 
-        if command_menu == "":
-            fmeta = get_function_metadata(fn)
-            raise CommandMissingMenuMessage(fmeta.name, fmeta.location.filename, fmeta.location.lineno)
+    def register_command(self, fn: Callable, name: Union[str, None] = None, alias: str = "",
+                          menu: str = "", usage: str = "",
+                          completers: Union[Dict[str, Any], None] = None) -> None:
 
-        # if usage is not defined use menu help message
-        if command_usage == "":
-            command_usage = command_menu
+        cmd = build_command(fn, name, alias, menu, usage, completers)
 
-        if len(command_name) + len(", ") + len(alias) > self._max_command_length:
-            self._max_command_length = len(command_name)
+        if len(cmd.name) + len(", ") + len(alias) > self._max_command_length:
+            self._max_command_length = len(cmd.name)
 
-        if command_name in self._commands.keys():
+        if cmd.name in self._commands.keys():
             location = get_function_location(fn)
-            raise CommandDuplicate(command_name, location.filename, location.lineno)
+            raise CommandDuplicate(cmd.name, location.filename, location.lineno)
 
         if alias in self._commands.keys():
             location = get_function_location(fn)
             raise CommandDuplicate(alias, location.filename, location.lineno)
 
-        parameters = parse_parameters(fn)
-        cmd = CommandModel(name=command_name, alias=alias, f=fn, menu=command_menu, usage=command_usage,
-                             parameters=parameters)
-        self._commands[command_name] = cmd
+        self._commands[cmd.name] = cmd
         if len(alias) > 0:
             self._commands[alias] = CommandAlias(command=cmd)
+        self._notify("add", (cmd.name,), cmd)
+
+    def register_commands(self, entries: Iterable[Union[Callable, Dict[str, Any], 'CommandGroup']]) -> None:
+        """
+        Register many commands at once. An entry is a function, a dictionary with
+        the arguments of register_command ('fn', 'name', 'alias', ...) or a group:
+        a SubCommandGroup is added as a sub group, the commands of a CommandGroup
+        are merged.
+        The collisions among the entries and with the commands already in the group
+        are all reported together by CommandConflicts, in that case nothing is added.
+        """
+        staged: Dict[str, Union[CommandModel, CommandAlias, SubCommandGroup]] = {}
+        conflicts: List[str] = []
+        max_length = self._max_command_length
+
+        def stage(key: str, entry: Union[CommandModel, CommandAlias, SubCommandGroup]) -> None:
+            if key in staged:
+                conflicts.append(key)
+            else:
+                staged[key] = entry
+
+        for item in entries:
+            if isinstance(item, SubCommandGroup):
+                stage(item.name, item)
+            elif isinstance(item, CommandGroup):
+                for key, entry in item.commands.items():
+                    stage(key, entry)
+                max_length = max(max_length, item.max_command_length)
+            else:
+                cmd = build_command(**item) if isinstance(item, dict) else build_command(item)
+                if len(cmd.name) + len(", ") + len(cmd.alias) > max_length:
+                    max_length = len(cmd.name)
+                stage(cmd.name, cmd)
+                if len(cmd.alias) > 0:
+                    stage(cmd.alias, CommandAlias(command=cmd))
+
+        # a single pass for the collisions with the commands already registered
+        conflicts.extend(staged.keys() & self._commands.keys())
+        if len(conflicts) > 0:
+            raise CommandConflicts(sorted((key, *_entry_location(staged[key])) for key in set(conflicts)))
+
+        self._commands.update(staged)
+        self._max_command_length = max_length
+        # a single notification for the commands, the sub groups replay theirs
+        added = []
+        for name, entry in staged.items():
+            if isinstance(entry, CommandModel):
+                added.append(((name,), entry))
+            elif isinstance(entry, SubCommandGroup):
+                self._announce(name, entry)
+        self._notify_batch("add", added)
 
     def include_commands(self, cmds: Union['CommandGroup', 'SubCommandGroup']) -> None:
         """
@@ -188,6 +351,7 @@ class CommandGroup:
                 # probably we need to raise a custom exception here
                 raise CommandDuplicate(cmds.name, cmds._current_cmd.f.__code__.co_filename, cmds._current_cmd.f.__code__.co_firstlineno)
             self._commands[cmds.name] = cmds
+            self._announce(cmds.name, cmds)
             return
 
         if isinstance(cmds, CommandGroup):
@@ -198,6 +362,7 @@ class CommandGroup:
                     # probably we need to raise a custom exception here
                     raise CommandDuplicate(cmd_name, cmd.f.__code__.co_filename, cmd.f.__code__.co_firstlineno)
                 self._commands[cmd_name] = cmd
+                self._announce(cmd_name, cmd)
             # update the max command length
             if self._max_command_length < cmds.max_command_length:
                 self._max_command_length = cmds.max_command_length
@@ -219,13 +384,24 @@ class SubCommandGroup(CommandGroup):
         self._menu: str = menu
         self._usage: str = usage
         self._current_cmd = CommandModel(f=None, name=name, alias="", menu=menu, usage=usage, parameters=[])
+        self._middlewares: List[middleware.Middleware] = []
 
     @property
     def name(self) -> str:
         return self._name
 
+    @property
+    def middlewares(self) -> List[middleware.Middleware]:
+        return self._middlewares
+
+    def use(self, fn: middleware.Middleware) -> None:
+        """Add a middleware for the commands of this group and of its sub groups."""
+        self._middlewares.append(fn)
+        self._notify_batch("use", list(self.walk()))
+
     def add_help_command(self) -> None:
         self.register_command(self.help, name="?", menu="Shows this help.")
+        self._commands["?"].raw_arguments = True
 
     def get_usage(self, cmd: str) -> str:
         return self._commands[cmd].get_usage()
@@ -261,3 +437,132 @@ class SubCommandGroup(CommandGroup):
             raise Exception(f"'{self._name}' is not executable")
 
         return self._current_command()
+
+
+@dataclass(frozen=True)
+class FrozenCommandGroup:
+    """
+    Immutable snapshot of a SubCommandGroup: the commands can be looked up
+    concurrently from many threads without locks because nothing can change them.
+    Commands and aliases are shared with the group they come from, the sub
+    groups are frozen recursively.
+    """
+    name: str
+    menu: str
+    usage: str
+    commands: Mapping[str, Union[CommandModel, CommandAlias, 'FrozenCommandGroup']]
+    middlewares: Tuple[middleware.Middleware, ...] = ()
+    max_command_length: int = 0
+
+    @classmethod
+    def freeze(cls, group: CommandGroup, exclude: Collection[str] = ()) -> 'FrozenCommandGroup':
+        """Freeze the group, without the commands named in 'exclude' (only in this group, not in the sub groups)."""
+        entries: Dict[str, Any] = {}
+        source = group if isinstance(group, SubCommandGroup) else None
+        frozen = cls(name=source.name if source else "", menu=source._menu if source else "",
+                     usage=source._usage if source else "", commands=MappingProxyType(entries),
+                     middlewares=tuple(source.middlewares) if source else (),
+                     max_command_length=group.max_command_length)
+        # the commands bound to the source group (the help command) are bound to the frozen one
+        rebound: Dict[int, CommandModel] = {}
+        for name, entry in group.commands.items():
+            if name in exclude:
+                continue
+            if isinstance(entry, SubCommandGroup):
+                entry = cls.freeze(entry)
+            elif isinstance(entry, CommandModel) and getattr(entry.f, "__self__", None) is group:
+                rebound[id(entry)] = replace(entry, f=getattr(frozen, entry.f.__name__))
+                entry = rebound[id(entry)]
+            entries[name] = entry
+        for name, entry in entries.items():
+            if isinstance(entry, CommandAlias) and id(entry.command) in rebound:
+                entries[name] = CommandAlias(command=rebound[id(entry.command)])
+        return frozen
+
+    def has_command(self, name: str) -> bool:
+        return name in self.commands
+
+    def get_command(self, name: str) -> Union[CommandModel, CommandAlias, 'FrozenCommandGroup']:
+        if name not in self.commands:
+            raise CommandNotFound(name)
+        return self.commands[name]
+
+    def walk(self) -> Iterator[Tuple[Tuple[str, ...], CommandModel]]:
+        for name, entry in self.commands.items():
+            if isinstance(entry, CommandAlias):
+                continue
+            if isinstance(entry, FrozenCommandGroup):
+                for path, cmd in entry.walk():
+                    yield (name,) + path, cmd
+                continue
+            yield (name,), entry
+
+    def get_menu(self, padding: int) -> str:
+        return f"{self.name.ljust(padding)}\t\t{self.menu}"
+
+    def get_usage(self) -> str:
+        return f"{self.usage}\n\n{self.name} "
+
+    def help(self, cmd_path: List[str] = []) -> None:
+        """Shows the help menu, as SubCommandGroup.help."""
+        if len(cmd_path) == 0:
+            print("\n".join([command.get_menu(self.max_command_length) for command in self.commands.values()
+                             if not isinstance(command, CommandAlias)]))
+            return
+        cmd_name, cmd_path = cmd_path[0], cmd_path[1:]
+        command = self.get_command(cmd_name)
+        if isinstance(command, FrozenCommandGroup):
+            command.help(cmd_path)
+            return
+        if len(cmd_path) > 0:
+            raise Exception(f"{cmd_name} is not a subcommand of {self.name}")
+        print(command.get_usage())
+
+
+GroupType = Union[SubCommandGroup, FrozenCommandGroup]
+
+
+def resolve_command(root: GroupType, tokens: List[str]) -> Tuple[GroupType, List[str], ParsedCommand]:
+    """
+    Goes through the tree following the tokens until a command which is
+    not a group is found.
+    Returns the menu containing the command, the command path and the parsed
+    command with the remaining tokens as parameters.
+    """
+    current_menu = root
+    path = []
+    for index, name in enumerate(tokens):
+        if not current_menu.has_command(name):
+            raise CommandNotFound(name)
+        path.append(name)
+        entry = current_menu.get_command(name)
+        if isinstance(entry, (SubCommandGroup, FrozenCommandGroup)):
+            # we need to go to the next sub group
+            current_menu = entry
+            continue
+        return current_menu, path, ParsedCommand(name=name, parameters=tokens[index + 1:])
+    raise CommandGroupNotExecutable(" ".join(path))
+
+
+def prepare_call(current_menu: GroupType, command: ParsedCommand,
+                 results: Union[ResultStore, None] = None) -> Tuple[Callable, List[Any]]:
+    """
+    Returns the command to call and its arguments cast to the parameter types.
+    With a result store the '$' references are replaced by the stored objects.
+    """
+    cmd_descriptor = current_menu.get_command(command.name)
+    if cmd_descriptor.raw_arguments:
+        # builtins like '?' and 'search' handle the arguments by themselves
+        return cmd_descriptor, [command.parameters]
+    if len(command.parameters) == 0:
+        return cmd_descriptor, []
+    parameters = command.parameters if results is None else results.substitute(command.parameters)
+    return cmd_descriptor, cmd_descriptor.cast_arguments(parameters)
+
+
+def failure_exit_code(ex: Exception) -> int:
+    """
+    Exit code of a command which raised: 2 for the wrong arguments found while
+    it runs (the elements of an '@file' list are converted lazily), 1 otherwise.
+    """
+    return 2 if isinstance(ex, (ParameterWrongType, ParameterSourceError)) else 1
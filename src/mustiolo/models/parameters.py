@@ -1,7 +1,9 @@
 from dataclasses import dataclass
 from typing import Any, List, get_args, get_origin
 
-from mustiolo.exception import ParameterWrongType
+from mustiolo.bulk import FloatArray, IntArray, is_ndarray, iterable_to_ndarray, to_array, to_ndarray
+from mustiolo.exception import ParameterSourceError, ParameterWrongElement, ParameterWrongType
+from mustiolo.sources import FileListSource, read_source
 
 
 @dataclass
@@ -10,6 +12,25 @@ class ParsedCommand:
     parameters: List[Any]
 
 
+_TRUE_VALUES = frozenset(["true", "1", "yes"])
+_FALSE_VALUES = frozenset(["false", "0", "no"])
+
+
+def str_to_bool(value: str) -> bool:
+    """'true', '1' and 'yes' are True, 'false', '0' and 'no' are False (case-insensitive)."""
+    lowered = value.lower()
+    if lowered in _TRUE_VALUES:
+        return True
+    if lowered in _FALSE_VALUES:
+        return False
+    raise ValueError(f"'{value}' is not a boolean")
+
+
+def _converter(ptype: Any) -> Any:
+    """The callable converting a string to the type, bool('false') would be True."""
+    return str_to_bool if ptype is bool else ptype
+
+
 def ptype_to_str(ptype: Any) -> str:
     # return ptype.__name__.upper()
     if ptype is str:
@@ -20,6 +41,10 @@ def ptype_to_str(ptype: Any) -> str:
         return "NUMBER"
     if ptype is bool:
         return "BOOLEAN"
+    if ptype is IntArray:
+        return "LIST[INTEGER]"
+    if ptype is FloatArray or is_ndarray(ptype):
+        return "LIST[NUMBER]"
     if get_origin(ptype) is list:
         type_str = "LIST"
         if get_args(ptype) is not None:
@@ -33,6 +58,8 @@ class ParameterModel:
     name: str
     ptype: Any
     default: Any
+    # completion provider for the argument values, see mustiolo.completion
+    completer: Any = None
 
     def __str__(self) -> str:
         # TODO handle list type and subtypes
@@ -44,7 +71,33 @@ class ParameterModel:
         return "".join(msg)
 
     def convert_to_type(self, value: str) -> Any:
-        
+        """
+        Convert the argument to the parameter type.
+        '@path' and '@-' read the argument from a file or from stdin, '@@' escapes
+        a value starting with '@'.
+        """
+        if value.startswith("@"):
+            if value.startswith("@@"):
+                return self._convert(value[1:])
+            return self._convert_source(value[1:])
+        return self._convert(value)
+
+    def _convert_source(self, path: str) -> Any:
+        if path == "":
+            raise ParameterSourceError(path, "missing file name")
+        if get_origin(self.ptype) is list:
+            # lazy iterator, the file is never read wholly into memory
+            subtype = get_args(self.ptype)[0] if len(get_args(self.ptype)) > 0 else str
+            return FileListSource(path, _converter(subtype), ptype_to_str(subtype))
+        if self.ptype is IntArray:
+            return IntArray(FileListSource(path, int, "INTEGER"))
+        if self.ptype is FloatArray:
+            return FloatArray(FileListSource(path, float, "NUMBER"))
+        if is_ndarray(self.ptype):
+            return iterable_to_ndarray(FileListSource(path), self.ptype)
+        return self._convert(read_source(path))
+
+    def _convert(self, value: str) -> Any:
         try:
             # here we try to convert the value to the correct type
             # if it fails an exception is raised
@@ -52,8 +105,30 @@ class ParameterModel:
                 values = value.split(',')
                 subtype = get_args(self.ptype)[0] if len(get_args(self.ptype)) > 0 else None
                 if subtype is not None:
-                    return [subtype(v) for v in values]
-                return values    
-            return self.ptype(value)
+                    return self._convert_list(values, subtype)
+                return values
+            # bulk conversion of numeric lists
+            if self.ptype is IntArray or self.ptype is FloatArray:
+                return to_array(value, self.ptype)
+            if is_ndarray(self.ptype):
+                return to_ndarray(value, self.ptype)
+            return _converter(self.ptype)(value)
+        except ParameterWrongType:
+            raise
         except Exception:
             raise ParameterWrongType(value, ptype_to_str(self.ptype))
+
+    @staticmethod
+    def _convert_list(values: List[str], subtype: Any) -> List[Any]:
+        convert = _converter(subtype)
+        try:
+            return [convert(v) for v in values]
+        except Exception:
+            pass
+        # find the element which cannot be converted
+        for index, v in enumerate(values):
+            try:
+                convert(v)
+            except Exception:
+                raise ParameterWrongElement(v, index, ptype_to_str(subtype))
+        raise ParameterWrongType(",".join(values), f"LIST[{ptype_to_str(subtype)}]")
@@ -0,0 +1,27 @@
+from dataclasses import dataclass, field
+from typing import Any, List, Union
+
+
+@dataclass
+class CommandResult:
+    """
+    Outcome of a command line: the resolved command path, the arguments cast
+    to the parameter types, the returned value or the raised exception and
+    how long it took.
+    'exit_code' follows CLI.main: 0 executed, 1 the command raised an exception,
+    2 wrong command path or arguments.
+    """
+    path: List[str] = field(default_factory=list)
+    arguments: List[Any] = field(default_factory=list)
+    result: Any = None
+    error: Union[Exception, None] = None
+    exit_code: int = 0
+    duration: float = 0.0
+    # what the command printed, captured only when the output is not a terminal
+    output: Union[str, None] = None
+    # number of the returned object in the result store ('$N'), if stored
+    handle: Union[int, None] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
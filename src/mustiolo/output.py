@@ -0,0 +1,176 @@
+"""
+Machine-readable output: every executed command line is written as a JSON
+Lines record, without box drawing nor terminal size probing.
+"""
+import io
+import json
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+from dataclasses import asdict, is_dataclass
+from enum import Enum
+from typing import Any, Dict, Iterator, TextIO, Union
+
+from mustiolo.models.result import CommandResult
+
+# orjson module, False when not installed, imported on the first record
+_orjson: Any = None
+
+
+class OutputMode(Enum):
+    BOX = "box"
+    JSONL = "jsonl"
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for the objects json does not know, lazy iterables are never consumed."""
+    if isinstance(obj, array):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    if hasattr(obj, "tolist"):
+        # numpy arrays and scalars
+        return obj.tolist()
+    return repr(obj)
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def _optional_orjson() -> Any:
+    """orjson if it is installed, False otherwise."""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+            _orjson = orjson
+        except ImportError:
+            _orjson = False
+    return _orjson
+
+
+def _safe_repr(obj: Any) -> str:
+    try:
+        return repr(obj)
+    except Exception as ex:
+        return f"<{type(obj).__name__} object, repr failed: {ex}>"
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON, orjson is used when installed.
+
+    What orjson refuses (integers over 64 bits, ...) is retried with the json module,
+    its errors (circular references, tuple keys, ...) are raised.
+    """
+    orjson = _optional_orjson()
+    if orjson:
+        try:
+            return orjson.dumps(obj, default=_default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass
+    return _encoder.encode(obj)
+
+
+def to_record(result: CommandResult) -> Dict[str, Any]:
+    error: Union[Dict[str, str], None] = None
+    if result.error is not None:
+        error = {"type": type(result.error).__name__, "message": str(result.error)}
+    record = {
+        "path": result.path,
+        "arguments": result.arguments,
+        "result": result.result,
+        "error": error,
+        "exit_code": result.exit_code,
+        "duration": result.duration,
+    }
+    if result.output is not None:
+        record["output"] = result.output
+    if result.handle is not None:
+        record["handle"] = result.handle
+    return record
+
+
+def record_line(result: CommandResult) -> str:
+    """The JSON record of a result, never fails because of what the command returned.
+
+    When the result or the arguments cannot be encoded they are written as their repr,
+    with the reason in "serialization_error".
+    """
+    record = to_record(result)
+    try:
+        return dumps(record)
+    except (TypeError, ValueError, OverflowError, RecursionError) as ex:
+        record["result"] = _safe_repr(result.result)
+        record["arguments"] = [_safe_repr(argument) for argument in result.arguments]
+        record["serialization_error"] = f"{type(ex).__name__}: {ex}"
+        return dumps(record)
+
+
+class JsonLinesWriter:
+    """Writes a JSON record per command result on the stream (stdout by default)."""
+
+    def __init__(self, stream: Union[TextIO, None] = None):
+        self._stream = stream
+
+    def write(self, result: CommandResult) -> None:
+        stream = self._stream if self._stream is not None else sys.stdout
+        stream.write(record_line(result) + "\n")
+        stream.flush()
+
+
+class _ThreadStdout:
+    """
+    sys.stdout replacement while some thread is capturing: every thread writes
+    to its own capture buffer, the threads not capturing to the original stdout.
+    """
+
+    def __init__(self, stdout: TextIO):
+        self.stdout = stdout
+        self.local = threading.local()
+        self.users = 0
+
+    def _target(self) -> TextIO:
+        buffer = getattr(self.local, "buffer", None)
+        return buffer if buffer is not None else self.stdout
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target(), name)
+
+
+_stdout_lock = threading.Lock()
+
+
+@contextmanager
+def capture_stdout() -> Iterator[io.StringIO]:
+    """
+    Like contextlib.redirect_stdout(io.StringIO()) but only for the calling
+    thread, many threads can capture what they print at the same time.
+    """
+    with _stdout_lock:
+        proxy = sys.stdout
+        if not isinstance(proxy, _ThreadStdout):
+            proxy = sys.stdout = _ThreadStdout(sys.stdout)
+        proxy.users += 1
+    buffer = io.StringIO()
+    previous = getattr(proxy.local, "buffer", None)
+    proxy.local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        proxy.local.buffer = previous
+        with _stdout_lock:
+            proxy.users -= 1
+            if proxy.users == 0 and sys.stdout is proxy:
+                sys.stdout = proxy.stdout
@@ -0,0 +1,176 @@
+"""
+Discovery of command plugins through the entry points of the installed distributions.
+
+A distribution exposes a MenuGroup or a CommandCollection with an entry point in
+the 'mustiolo.plugins' group, the entry point name is the menu name:
+
+    [project.entry-points."mustiolo.plugins"]
+    db = "mycompany_db.cli:db_menu"
+
+Reading the metadata of every distribution at each start is slow, so the
+discovered entry points are cached on disk. The cache key is computed from the
+names (name and version) of the installed distributions, so it changes
+whenever a distribution is installed, removed or upgraded.
+Plugins are imported on first use.
+"""
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator, List, Tuple, Union
+
+from mustiolo.exception import CommandDuplicate
+from mustiolo.models.command import CommandModel, SubCommandGroup
+
+
+ENTRY_POINT_GROUP = "mustiolo.plugins"
+
+
+@dataclass
+class PluginSpec:
+    name: str
+    value: str
+    distribution: str
+    version: str
+
+
+def default_cache_path(group: str = ENTRY_POINT_GROUP) -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "mustiolo", f"{group}.json")
+
+
+def distributions_key() -> str:
+    """
+    Hash of the metadata directories ('<name>-<version>.dist-info') found in
+    sys.path and of their modification time. Only the directories are listed,
+    no metadata file is read.
+    """
+    digest = hashlib.sha256()
+    for entry in sys.path:
+        try:
+            with os.scandir(entry or ".") as it:
+                names = sorted(
+                    f"{item.name}:{item.stat().st_mtime_ns}" for item in it
+                    if item.name.endswith((".dist-info", ".egg-info"))
+                )
+        except OSError:
+            continue
+        digest.update(entry.encode("utf-8", "surrogateescape"))
+        digest.update("\n".join(names).encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def _scan(group: str) -> List[PluginSpec]:
+    # only on a cache miss: importing importlib.metadata alone costs more than a cache hit
+    from importlib import metadata
+
+    specs = []
+    for entry_point in metadata.entry_points(group=group):
+        dist = entry_point.dist
+        specs.append(PluginSpec(name=entry_point.name, value=entry_point.value,
+                                distribution=dist.name if dist is not None else "",
+                                version=dist.version if dist is not None else ""))
+    return specs
+
+
+def discover(group: str = ENTRY_POINT_GROUP, cache_path: Union[str, None] = None) -> Tuple[List[PluginSpec], bool]:
+    """
+    Returns the plugins in the entry point group and whether they come from the cache.
+    The cache is refreshed when the installed distributions change.
+    """
+    cache_path = cache_path if cache_path is not None else default_cache_path(group)
+    key = distributions_key()
+    try:
+        with open(cache_path, "r", encoding="utf-8") as fp:
+            cache = json.load(fp)
+        if cache.get("key") == key:
+            return [PluginSpec(**spec) for spec in cache["plugins"]], True
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    specs = _scan(group)
+    try:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump({"key": key, "plugins": [asdict(spec) for spec in specs]}, fp)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # a read-only cache directory only costs the scan at every start
+        pass
+    return specs, False
+
+
+def load_object(value: str) -> Any:
+    """Import 'module:attribute.path' as in the entry points."""
+    module_name, _, attributes = value.partition(":")
+    obj = importlib.import_module(module_name.strip())
+    for attribute in filter(None, attributes.strip().split(".")):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+class PluginGroup(SubCommandGroup):
+    """
+    Menu of a plugin, the plugin module is imported the first time the menu
+    content is needed (command lookup, help, completion).
+    """
+
+    def __init__(self, spec: PluginSpec):
+        super().__init__(spec.name, f"Commands from {spec.distribution or spec.value}", "")
+        self.spec = spec
+        self.loaded = False
+        self.load_time = 0.0
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        # set before loading so a failing plugin is not imported again at each access
+        self.loaded = True
+        start = time.perf_counter()
+        try:
+            plugin = load_object(self.spec.value)
+            group = plugin.get_group() if hasattr(plugin, "get_group") else plugin
+            if not isinstance(getattr(group, "commands", None), dict):
+                raise TypeError(f"Plugin '{self.spec.name}' ({self.spec.value}) is not a MenuGroup or CommandCollection")
+            if isinstance(group, SubCommandGroup):
+                # a MenuGroup gives its help messages to the plugin menu
+                self._menu = group._menu or self._menu
+                self._usage = group._usage or self._usage
+                self._current_cmd = CommandModel(f=None, name=self._name, menu=self._menu,
+                                                 usage=self._usage or self._menu, parameters=[])
+            for name, entry in group.commands.items():
+                if name in self._commands:
+                    raise CommandDuplicate(name, self.spec.value, 0)
+                self._commands[name] = entry
+                self._announce(name, entry)
+            self._max_command_length = max(self._max_command_length, group.max_command_length)
+        finally:
+            self.load_time = time.perf_counter() - start
+
+    @property
+    def commands(self):
+        self.load()
+        return self._commands
+
+    def has_command(self, name: str) -> bool:
+        self.load()
+        return super().has_command(name)
+
+    def get_command(self, name: str):
+        self.load()
+        return super().get_command(name)
+
+    def help(self, cmd_path: List[str] = []) -> None:
+        self.load()
+        super().help(cmd_path)
+
+    def walk(self) -> Iterator[Tuple[Tuple[str, ...], CommandModel]]:
+        # walking does not load the plugin: its commands are announced to the
+        # listeners when it is loaded
+        if not self.loaded:
+            return iter(())
+        return super().walk()
@@ -0,0 +1,122 @@
+"""
+'profile' builtin: execute a command under cProfile (and tracemalloc with
+--mem) and show where the time and the memory went.
+
+    > profile --mem --top 10 --dump slow.pstats db query users
+"""
+import cProfile
+import os
+import pstats
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, List, Tuple, TypeVar, Union
+
+DEFAULT_TOP = 15
+
+T = TypeVar("T")
+
+
+@dataclass
+class ProfileOptions:
+    memory: bool = False
+    top: int = DEFAULT_TOP
+    # where to write the .pstats file
+    dump: Union[str, None] = None
+
+
+def parse_arguments(arguments: List[str]) -> Tuple[ProfileOptions, List[str]]:
+    """Split 'profile [--mem] [--top N] [--dump FILE] PATH...' into the options and the command line."""
+    options = ProfileOptions()
+    index = 0
+    while index < len(arguments) and arguments[index].startswith("--"):
+        option = arguments[index]
+        if option == "--mem":
+            options.memory = True
+        elif option in ("--top", "--dump"):
+            if index + 1 >= len(arguments):
+                raise ValueError(f"{option} needs a value")
+            index += 1
+            if option == "--dump":
+                options.dump = arguments[index]
+            else:
+                try:
+                    options.top = int(arguments[index])
+                except ValueError:
+                    raise ValueError(f"'{arguments[index]}' is not a valid number of rows")
+                if options.top <= 0:
+                    raise ValueError("--top must be greater than 0")
+        else:
+            raise ValueError(f"Unknown option '{option}'")
+        index += 1
+    if index == len(arguments):
+        raise ValueError("profile needs a command")
+    return options, arguments[index:]
+
+
+def _function_label(key: Tuple[str, int, str]) -> str:
+    filename, lineno, name = key
+    if filename == "~":
+        # builtins, e.g. "<built-in method time.sleep>"
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def format_stats(stats: pstats.Stats, top: int) -> List[str]:
+    """The 'top' functions by cumulative time."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    lines = [f"{'cumulative':>12}{'own':>12}{'calls':>9}  function"]
+    for key, (_, calls, own, cumulative, _) in rows:
+        lines.append(f"{cumulative * 1000:>9.2f} ms{own * 1000:>9.2f} ms{calls:>9}  {_function_label(key)}")
+    return lines
+
+
+def _own_frames(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                   tracemalloc.Filter(False, __file__)])
+
+
+def format_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top: int) -> List[str]:
+    """The 'top' source lines by memory allocated during the command and still held at its end."""
+    lines = [f"{'size':>12}{'blocks':>9}  allocated at"]
+    for stat in _own_frames(after).compare_to(_own_frames(before), "lineno")[:top]:
+        if stat.size_diff <= 0:
+            break
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:>8.1f} KiB{stat.count_diff:>9}  "
+                     f"{os.path.basename(frame.filename)}:{frame.lineno}")
+    return lines
+
+
+def profile(call: Callable[[], T], options: ProfileOptions) -> Tuple[T, str]:
+    """Returns what 'call' returns and the report of its execution."""
+    start_tracing = options.memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        if options.memory:
+            # the memory held before the command is not part of the report
+            before = tracemalloc.take_snapshot()
+            start_memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        profiler.enable()
+        try:
+            value = call()
+        finally:
+            profiler.disable()
+        if options.memory:
+            peak = tracemalloc.get_traced_memory()[1] - start_memory
+            after = tracemalloc.take_snapshot()
+    finally:
+        if start_tracing:
+            tracemalloc.stop()
+
+    stats = pstats.Stats(profiler)
+    lines = [f"{stats.total_calls} calls in {stats.total_tt * 1000:.2f} ms", ""] + format_stats(stats, options.top)
+    if options.memory:
+        lines += ["", f"Memory, peak {peak / 1024:.1f} KiB during the command"]
+        lines += format_allocations(before, after, options.top)
+    if options.dump is not None:
+        profiler.dump_stats(options.dump)
+        lines += ["", f"Stats written to {options.dump}"]
+    return value, "\n".join(lines)
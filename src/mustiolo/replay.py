@@ -0,0 +1,177 @@
+"""
+Record the command lines executed in a CLI and replay them for load testing.
+
+The recorder appends a JSON record per command line to the log:
+
+    {"ts":1760889600.123456,"line":"db query users","path":["db","query"],"duration":0.0123,"exit_code":0}
+
+The replayer sends the recorded lines through the command dispatch again at
+the original pace, N times faster or as fast as possible, with K concurrent
+workers, and reports throughput and latency percentiles per command.
+
+    cli.record("operators.log")
+    cli.run()
+    ...
+    print(cli.replay("operators.log", speed=None, workers=8))
+"""
+import json
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Union
+
+from mustiolo.models.result import CommandResult
+from mustiolo.output import capture_stdout, dumps
+from mustiolo.results import ResultStore, execute_line, split_assignment
+
+
+@dataclass
+class Record:
+    ts: float
+    line: str
+    path: List[str] = field(default_factory=list)
+    duration: float = 0.0
+    exit_code: int = 0
+
+
+class Recorder:
+    """Append-only log of the executed command lines, flushed line by line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fp = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, ts: float, line: str, result: CommandResult) -> None:
+        record = {"ts": round(ts, 6), "line": line, "path": result.path,
+                  "duration": round(result.duration, 6), "exit_code": result.exit_code}
+        data = dumps(record) + "\n"
+        with self._lock:
+            self._fp.write(data)
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+def load_log(path: str) -> Iterator[Record]:
+    """Yields the records of a log, a truncated last line is skipped."""
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            try:
+                yield Record(**json.loads(line))
+            except (ValueError, TypeError):
+                continue
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if len(values) == 0:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+@dataclass
+class CommandStats:
+    count: int = 0
+    errors: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        latencies = sorted(self.latencies)
+        return {"p50": percentile(latencies, 50), "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99), "max": latencies[-1] if latencies else 0.0}
+
+
+@dataclass
+class ReplayReport:
+    commands: Dict[str, CommandStats] = field(default_factory=dict)
+    total: int = 0
+    errors: int = 0
+    # wall clock time of the whole replay
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Command lines per second."""
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        lines = [f"{self.total} commands in {self.elapsed:.3f} s, {self.throughput:.1f} commands/s, "
+                 f"{self.errors} errors",
+                 "command\tcount\terrors\tp50 ms\tp90 ms\tp99 ms\tmax ms"]
+        for name, stats in sorted(self.commands.items()):
+            summary = stats.summary()
+            lines.append(f"{name}\t{stats.count}\t{stats.errors}\t" +
+                         "\t".join(f"{summary[key] * 1000:.3f}" for key in ("p50", "p90", "p99", "max")))
+        return "\n".join(lines)
+
+
+def replay(records: Iterator[Record], execute: Callable[[List[str], ResultStore], CommandResult],
+           speed: Union[float, None] = 1.0, workers: int = 1, quiet: bool = True) -> ReplayReport:
+    """
+    Execute the recorded lines again through 'execute'.
+    'speed' 1.0 keeps the original pace, 2.0 is twice as fast, None sends the
+    lines as fast as possible. 'workers' lines can run at the same time.
+    Each worker has its own result store, as a session: the '$name = ...'
+    lines and the '$' references of the lines it runs work as when recorded.
+    The 'exit' lines are skipped. What the commands print is captured by each
+    worker, with 'quiet' it is discarded, otherwise it is written to stdout a
+    command line at a time.
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError("speed must be greater than 0 or None")
+    report = ReplayReport()
+    lock = threading.Lock()
+    worker = threading.local()
+
+    def run(line: str) -> None:
+        if not hasattr(worker, "results"):
+            worker.results = ResultStore()
+        start = time.perf_counter()
+        with capture_stdout() as printed:
+            result = execute_line(execute, line.split(), worker.results)
+        latency = time.perf_counter() - start
+        if not quiet:
+            # FrozenCommandTree.execute captures by itself, other callables print
+            text = printed.getvalue() + (result.output or "")
+            if text != "":
+                with lock:
+                    sys.stdout.write(text)
+        name = " ".join(result.path) if len(result.path) > 0 else split_assignment(line.split())[1][0]
+        with lock:
+            stats = report.commands.setdefault(name, CommandStats())
+            stats.count += 1
+            stats.latencies.append(latency)
+            report.total += 1
+            if result.exit_code != 0:
+                stats.errors += 1
+                report.errors += 1
+
+    # bounds the lines waiting for a worker, the log is never loaded wholly into memory
+    pending = threading.BoundedSemaphore(workers * 4)
+
+    def submit(line: str) -> None:
+        try:
+            run(line)
+        finally:
+            pending.release()
+
+    start = time.perf_counter()
+    first_ts = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            if record.line.split() in ([], ["exit"]):
+                continue
+            if speed is not None:
+                first_ts = record.ts if first_ts is None else first_ts
+                delay = (record.ts - first_ts) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            pending.acquire()
+            pool.submit(submit, record.line)
+    report.elapsed = time.perf_counter() - start
+    return report
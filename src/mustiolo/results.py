@@ -0,0 +1,154 @@
+"""
+Store of the objects returned by the commands of a session.
+
+Every command returning something other than None gets a number, the object
+is referenced in the next command lines as '$N', the last one as '$last' and
+a line like '$users = db query users' stores it as '$users' too. A reference
+is replaced by the object itself: the command receives it as is, without any
+conversion. '$$' escapes a literal argument starting with '$'.
+
+    > db query users
+    > $active = filter $last active
+    > export $active users.csv
+
+The store is bounded by number of entries and by (estimated) memory, the least
+recently used results are dropped first. It can be shared by threads, e.g.
+the parallel steps of a script.
+"""
+import re
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from mustiolo.exception import ResultNotFound
+from mustiolo.models.result import CommandResult
+
+LAST = "last"
+_REFERENCE_RE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*|[0-9]+)")
+
+# elements measured to estimate the size of a large container
+SIZE_SAMPLE = 1000
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Approximate memory used by an object and by its elements, large containers
+    are estimated from a sample of their elements.
+    """
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        # numpy arrays, the data are not counted by getsizeof on views
+        return sys.getsizeof(obj) + nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray)):
+        return size
+    if isinstance(obj, dict):
+        items = obj.items()
+        count = len(obj)
+        sample = [sys.getsizeof(key) + sys.getsizeof(value) for _, (key, value) in zip(range(SIZE_SAMPLE), items)]
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        count = len(obj)
+        sample = [sys.getsizeof(item) for _, item in zip(range(SIZE_SAMPLE), obj)]
+    else:
+        return size
+    if len(sample) == 0:
+        return size
+    return size + sum(sample) * count // len(sample)
+
+
+def parse_reference(token: Any) -> Union[str, None]:
+    """The name or number in a '$name' token, None if it is not a reference."""
+    if not isinstance(token, str):
+        return None
+    match = _REFERENCE_RE.fullmatch(token)
+    return match.group(1) if match is not None else None
+
+
+def split_assignment(tokens: List[str]) -> Tuple[Union[str, None], List[str]]:
+    """Returns the name and the command of a '$name = command ...' line."""
+    if len(tokens) > 2 and tokens[1] == "=":
+        name = parse_reference(tokens[0])
+        if name is not None and not name.isdigit() and name != LAST:
+            return name, tokens[2:]
+    return None, tokens
+
+
+def execute_line(execute: Callable[[List[str], 'ResultStore'], CommandResult], tokens: List[str],
+                 results: 'ResultStore') -> CommandResult:
+    """
+    Execute a command line through 'execute' (e.g. FrozenCommandTree.execute)
+    as typed at the prompt: '$name = ' assignments and '$' references use
+    'results', where what the command returns is stored.
+    """
+    name, tokens = split_assignment(tokens)
+    result = execute(tokens, results)
+    if result.ok and (result.result is not None or name is not None):
+        result.handle = results.put(result.result, name)
+    return result
+
+
+@dataclass
+class StoredResult:
+    number: int
+    value: Any
+    size: int
+
+
+class ResultStore:
+
+    def __init__(self, max_entries: int = 100, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # number -> result, in least recently used order
+        self._entries: "OrderedDict[int, StoredResult]" = OrderedDict()
+        self._names: Dict[str, int] = {}
+        self._counter = 0
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated memory used by the stored results."""
+        return self._nbytes
+
+    def put(self, value: Any, name: Union[str, None] = None) -> int:
+        """Store the value and returns its number, the oldest results are dropped to make room."""
+        size = estimate_size(value)
+        with self._lock:
+            self._counter += 1
+            entry = StoredResult(self._counter, value, size)
+            self._entries[entry.number] = entry
+            self._nbytes += entry.size
+            self._names[LAST] = entry.number
+            if name is not None:
+                self._names[name] = entry.number
+            # the new result is kept even if alone it is over the memory limit
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._nbytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.size
+            return entry.number
+
+    def get(self, reference: str) -> Any:
+        """Value of a reference ('3', 'last' or a name), it becomes the most recently used."""
+        with self._lock:
+            number = int(reference) if reference.isdigit() else self._names.get(reference)
+            if number is None or number not in self._entries:
+                raise ResultNotFound(reference)
+            self._entries.move_to_end(number)
+            return self._entries[number].value
+
+    def substitute(self, tokens: List[str]) -> List[Any]:
+        """Replace the '$' references with the stored objects, '$$' escapes a '$'."""
+        arguments: List[Any] = []
+        for token in tokens:
+            if token.startswith("$$"):
+                arguments.append(token[1:])
+                continue
+            reference = parse_reference(token)
+            arguments.append(token if reference is None else self.get(reference))
+        return arguments
@@ -0,0 +1,215 @@
+"""
+Scripts of command lines executed in parallel, respecting the declared
+dependencies between the steps.
+
+Every line is a step, independent from the others unless it has a name and
+depends on earlier named steps. A header ending with ':' followed by indented
+lines is a block, its lines run one after the other as a single step:
+
+    # comments and empty lines are ignored
+    users: db dump users
+    orders: db dump orders
+    report after users orders:
+        report build
+        report send
+    tmp clean
+
+'users', 'orders' and 'tmp clean' start together, 'report' when both dumps
+are done. When a step fails the steps depending on it, directly or not, are
+skipped; the others go on.
+
+The steps share a result store, as the lines of a session: a step can use
+the '$name' stored by the steps it depends on.
+
+    users: $users = db dump users
+    report after users: report build $users
+"""
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Collection, Dict, List, Set, Tuple, Union
+
+from mustiolo.exception import ScriptError
+from mustiolo.models.result import CommandResult
+from mustiolo.results import ResultStore, execute_line, split_assignment
+
+_HEADER_RE = re.compile(r"([A-Za-z_][\w-]*)((?:\s+after(?:\s+[A-Za-z_][\w-]*)+)?)\s*:(.*)")
+
+
+@dataclass
+class Step:
+    name: str
+    lines: List[str]
+    after: List[str] = field(default_factory=list)
+    lineno: int = 0
+
+
+class StepStatus(Enum):
+    OK = "ok"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+
+@dataclass
+class StepResult:
+    step: Step
+    status: StepStatus = StepStatus.SKIPPED
+    # seconds from the start of the script
+    start: float = 0.0
+    duration: float = 0.0
+    results: List[CommandResult] = field(default_factory=list)
+
+    @property
+    def error(self) -> Union[Exception, None]:
+        return self.results[-1].error if len(self.results) > 0 else None
+
+
+def _check_command(line: str, lineno: int, builtins: Collection[str]) -> None:
+    tokens = split_assignment(line.split())[1]
+    if len(tokens) > 0 and tokens[0] in builtins:
+        raise ScriptError(lineno, f"'{tokens[0]}' cannot be used in a script")
+
+
+def parse_script(text: str, builtins: Collection[str] = ()) -> List[Step]:
+    """
+    Split a script in steps, the dependencies must name earlier steps.
+    The commands in 'builtins' (those acting on the interactive CLI, like
+    'exit' or 'watch') are refused.
+    """
+    steps: List[Step] = []
+    names: Set[str] = set()
+    block: Union[Step, None] = None
+
+    for lineno, raw in enumerate(text.splitlines(), start=1):
+        line = raw.rstrip()
+        if line.strip() == "" or line.lstrip().startswith("#"):
+            continue
+        if block is not None and raw[0].isspace():
+            _check_command(line, lineno, builtins)
+            block.lines.append(line.strip())
+            continue
+        if block is not None and len(block.lines) == 0:
+            raise ScriptError(block.lineno, f"block '{block.name}' has no command")
+        block = None
+
+        if raw[0].isspace():
+            raise ScriptError(lineno, "unexpected indentation")
+        match = _HEADER_RE.fullmatch(line)
+        if match is None:
+            # an anonymous step, nothing can depend on it
+            _check_command(line, lineno, builtins)
+            steps.append(Step(name=f"line {lineno}", lines=[line], lineno=lineno))
+            continue
+        name, after, command = match.group(1), match.group(2).split()[1:], match.group(3).strip()
+        _check_command(command, lineno, builtins)
+        if name in names:
+            raise ScriptError(lineno, f"step '{name}' is already defined")
+        for dependency in after:
+            if dependency not in names:
+                raise ScriptError(lineno, f"'{name}' depends on '{dependency}' which is not an earlier step")
+        step = Step(name=name, lines=[command] if command != "" else [], after=after, lineno=lineno)
+        names.add(name)
+        steps.append(step)
+        if command == "":
+            block = step
+
+    if block is not None and len(block.lines) == 0:
+        raise ScriptError(block.lineno, f"block '{block.name}' has no command")
+    return steps
+
+
+@dataclass
+class ScriptReport:
+    steps: Dict[str, StepResult]
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return all(result.status is StepStatus.OK for result in self.steps.values())
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """The chain of dependent executed steps which took the longest, and its duration."""
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Union[str, None]] = {}
+        for name, result in self.steps.items():
+            if result.status is StepStatus.SKIPPED:
+                continue
+            longest, before = 0.0, None
+            for dependency in result.step.after:
+                if finish.get(dependency, 0.0) > longest:
+                    longest, before = finish[dependency], dependency
+            finish[name] = longest + result.duration
+            previous[name] = before
+        if len(finish) == 0:
+            return [], 0.0
+        last = max(finish, key=finish.get)
+        path: List[str] = []
+        current: Union[str, None] = last
+        while current is not None:
+            path.append(current)
+            current = previous[current]
+        return path[::-1], finish[last]
+
+    def __str__(self) -> str:
+        padding = max([len(name) for name in self.steps] + [len("step")])
+        lines = [f"{'step'.ljust(padding)}  {'status':<8}{'start':>10}{'duration':>11}"]
+        for name, result in self.steps.items():
+            line = f"{name.ljust(padding)}  {result.status.value:<8}"
+            if result.status is not StepStatus.SKIPPED:
+                line += f"{result.start:>9.3f}s{result.duration:>10.3f}s"
+            if result.status is StepStatus.FAILED:
+                line += f"  {result.error}"
+            lines.append(line)
+        path, duration = self.critical_path()
+        lines.append("")
+        lines.append(f"critical path: {' -> '.join(path)} ({duration:.3f}s), total {self.elapsed:.3f}s")
+        return "\n".join(lines)
+
+
+def run_script(steps: List[Step], execute: Callable[[List[str], ResultStore], CommandResult], workers: int = 4,
+               results: Union[ResultStore, None] = None) -> ScriptReport:
+    """
+    Execute the steps on 'workers' threads, a step starts as soon as the steps
+    it depends on are done. A failed step skips all the steps depending on it.
+    The '$' references of all the steps use 'results' (a new store by default).
+    """
+    results = ResultStore() if results is None else results
+    report = ScriptReport(steps={step.name: StepResult(step) for step in steps})
+    dependents: Dict[str, List[str]] = {step.name: [] for step in steps}
+    waiting: Dict[str, int] = {}
+    for step in steps:
+        waiting[step.name] = len(step.after)
+        for dependency in step.after:
+            dependents[dependency].append(step.name)
+    start = time.perf_counter()
+
+    def run_step(result: StepResult) -> StepResult:
+        result.start = time.perf_counter() - start
+        result.status = StepStatus.OK
+        for line in result.step.lines:
+            command = execute_line(execute, line.split(), results)
+            result.results.append(command)
+            if not command.ok:
+                result.status = StepStatus.FAILED
+                break
+        result.duration = time.perf_counter() - start - result.start
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running: Set[Future] = {pool.submit(run_step, report.steps[name]) for name, count in waiting.items()
+                                if count == 0}
+        while len(running) > 0:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result.status is StepStatus.FAILED:
+                    # the dependent subgraph stays SKIPPED: its steps are never submitted
+                    continue
+                for name in dependents[result.step.name]:
+                    waiting[name] -= 1
+                    if waiting[name] == 0:
+                        running.add(pool.submit(run_step, report.steps[name]))
+    report.elapsed = time.perf_counter() - start
+    return report
@@ -0,0 +1,249 @@
+import heapq
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+from mustiolo.models.command import CommandModel
+
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+# weight of a term depending on the field where it has been found
+NAME_WEIGHT = 4.0
+ALIAS_WEIGHT = 4.0
+MENU_WEIGHT = 2.0
+USAGE_WEIGHT = 1.0
+PATH_WEIGHT = 1.0
+
+# a query term matching only as prefix of an indexed term scores less
+PREFIX_FACTOR = 0.5
+# maximum number of indexed terms a single query term can expand to
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a text in lowercase alphanumeric terms ('add_list' -> ['add', 'list'])."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass
+class SearchResult:
+    path: Tuple[str, ...]
+    command: CommandModel
+    score: float
+
+    @property
+    def full_path(self) -> str:
+        return " ".join(self.path)
+
+
+class CommandIndex:
+    """
+    Inverted index over name, alias, menu and usage of the commands in a tree.
+
+    The index is a CommandGroup listener, so subscribing it to the root menu
+    keeps it updated while the commands are registered: every command is
+    indexed when it is added and the first search costs as much as the others.
+    """
+
+    def __init__(self):
+        self._next_id = 0
+        self._doc_ids: Dict[Tuple[str, ...], int] = {}
+        self._docs: Dict[int, Tuple[Tuple[str, ...], CommandModel]] = {}
+        # (-weight, depth) -> {term -> document ids}, the postings split by rank: the ids are
+        # given in increasing order, so the documents of a term in a bucket are sorted as they come
+        self._postings: Dict[Tuple[float, int], Dict[str, Dict[int, None]]] = {}
+        # document id -> {term -> weight}, used to score the other terms of a query and to remove a document
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        # sorted terms, used to expand a query term to all the terms it prefixes
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        # group name -> its terms, shared by all the commands in the group
+        self._group_terms: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __call__(self, event: str, path: Tuple[str, ...], cmd: CommandModel) -> None:
+        if event == "add":
+            self.add(path, cmd)
+        elif event == "remove":
+            self.remove(path)
+
+    def batch(self, event: str, entries: List[Tuple[Tuple[str, ...], CommandModel]]) -> None:
+        """Batch listener, see CommandGroup.subscribe."""
+        if event == "add":
+            add = self.add
+            for path, cmd in entries:
+                add(path, cmd)
+        elif event == "remove":
+            for path, _ in entries:
+                self.remove(path)
+
+    def add(self, path: Tuple[str, ...], cmd: CommandModel) -> None:
+        if path in self._doc_ids:
+            self.remove(path)
+
+        doc_id = self._next_id
+        self._next_id += 1
+        self._doc_ids[path] = doc_id
+        self._docs[doc_id] = (path, cmd)
+
+        # the fields in increasing weight: a term found in many fields keeps the weight of the best one
+        weights: Dict[str, float] = {}
+        # parent groups take part to the search too, so 'math add' finds 'add' in 'math'
+        for group in path[:-1]:
+            terms = self._group_terms.get(group)
+            if terms is None:
+                terms = self._group_terms[group] = tokenize(group)
+            weights.update(dict.fromkeys(terms, PATH_WEIGHT))
+        if cmd.usage and cmd.usage != cmd.menu:
+            weights.update(dict.fromkeys(tokenize(cmd.usage), USAGE_WEIGHT))
+        if cmd.menu:
+            weights.update(dict.fromkeys(tokenize(cmd.menu), MENU_WEIGHT))
+        if cmd.alias:
+            weights.update(dict.fromkeys(tokenize(cmd.alias), ALIAS_WEIGHT))
+        weights.update(dict.fromkeys(tokenize(cmd.name), NAME_WEIGHT))
+        self._doc_terms[doc_id] = weights
+
+        depth = len(path)
+        # weight -> postings of the bucket of this document
+        buckets: Dict[float, Dict[str, Dict[int, None]]] = {}
+        for term, weight in weights.items():
+            postings = buckets.get(weight)
+            if postings is None:
+                postings = buckets[weight] = self._postings.setdefault((-weight, depth), {})
+            doc_ids = postings.get(term)
+            if doc_ids is None:
+                postings[term] = {doc_id: None}
+                self._vocabulary_dirty = True
+            else:
+                doc_ids[doc_id] = None
+
+    def remove(self, path: Tuple[str, ...]) -> None:
+        doc_id = self._doc_ids.pop(path, None)
+        if doc_id is None:
+            return
+        del self._docs[doc_id]
+        for term, weight in self._doc_terms.pop(doc_id).items():
+            postings = self._postings[(-weight, len(path))]
+            doc_ids = postings[term]
+            del doc_ids[doc_id]
+            if len(doc_ids) == 0:
+                del postings[term]
+                self._vocabulary_dirty = True
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Returns the indexed terms matching the query term with their score factor."""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(set().union(*self._postings.values()))
+            self._vocabulary_dirty = False
+
+        matches = []
+        index = bisect_left(self._vocabulary, term)
+        if index < len(self._vocabulary) and self._vocabulary[index] == term:
+            matches.append((term, 1.0))
+            index += 1
+        while index < len(self._vocabulary) and len(matches) < MAX_PREFIX_EXPANSION:
+            candidate = self._vocabulary[index]
+            if not candidate.startswith(term):
+                break
+            matches.append((candidate, PREFIX_FACTOR))
+            index += 1
+        return matches
+
+    def _ranked_docs(self, matches: List[Tuple[str, float]]) -> Iterator[Tuple[float, int, int]]:
+        """
+        Yields (-score, depth, document id) of the documents matching one of the
+        expansions of a term, best first, every document once with its best score.
+        """
+        groups: Dict[Tuple[float, int], List[Dict[int, None]]] = {}
+        for (weight, depth), postings in self._postings.items():
+            for term, factor in matches:
+                doc_ids = postings.get(term)
+                if doc_ids is not None:
+                    groups.setdefault((weight * factor, depth), []).append(doc_ids)
+        if len(matches) == 1:
+            for score, depth in sorted(groups):
+                for doc_id in groups[(score, depth)][0]:
+                    yield score, depth, doc_id
+            return
+        seen = set()
+        for score, depth in sorted(groups):
+            buckets = groups[(score, depth)]
+            for doc_id in buckets[0] if len(buckets) == 1 else heapq.merge(*buckets):
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    yield score, depth, doc_id
+
+    def search(self, query: str, limit: int = 20) -> List[SearchResult]:
+        """
+        Returns the commands matching all the terms in the query, best first.
+        A query term matches an indexed term equal to it or starting with it.
+        Ties are broken preferring shallower commands, then registration order.
+
+        The documents of the most selective term are visited best first and the
+        visit stops when even the best weights of the other terms could not bring
+        a document in the first 'limit' ones, so a common term costs about as
+        much as a rare one.
+        """
+        terms = set(tokenize(query))
+        if len(terms) == 0 or limit <= 0:
+            return []
+
+        expansions = []
+        for term in terms:
+            matches = self._expand(term)
+            if len(matches) == 0:
+                return []
+            size = sum(len(postings.get(indexed_term, ())) for indexed_term, _ in matches
+                       for postings in self._postings.values())
+            expansions.append((size, matches))
+        # the most selective term gives the candidates, the others only filter them
+        expansions.sort(key=lambda item: item[0])
+
+        # indexed term -> score factor of every other query term
+        others = [dict(matches) for _, matches in expansions[1:]]
+        # the most the other terms can add to the score of a document
+        bound = sum(max(-weight * factor for (weight, _), postings in self._postings.items()
+                        for term, factor in matches if term in postings)
+                    for _, matches in expansions[1:])
+        doc_terms = self._doc_terms
+
+        # the worst of the best 'limit' documents on top: (score, -depth, -document id)
+        best: List[Tuple[float, int, int]] = []
+        for score, depth, doc_id in self._ranked_docs(expansions[0][1]):
+            # the documents come best first, none of the next ones can rank better than this bound
+            if len(best) == limit and (bound - score, -depth, -doc_id) <= best[0]:
+                break
+            total = -score
+            weights = doc_terms[doc_id]
+            for factors in others:
+                term_best = 0.0
+                # through the shorter of the two, a prefix can expand to many terms
+                if len(factors) <= len(weights):
+                    for term, factor in factors.items():
+                        weight = weights.get(term)
+                        if weight is not None and weight * factor > term_best:
+                            term_best = weight * factor
+                else:
+                    for term, weight in weights.items():
+                        factor = factors.get(term)
+                        if factor is not None and weight * factor > term_best:
+                            term_best = weight * factor
+                if term_best == 0.0:
+                    break
+                total += term_best
+            else:
+                item = (total, -depth, -doc_id)
+                if len(best) < limit:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        results = []
+        for score, _, doc_id in sorted(best, reverse=True):
+            path, cmd = self._docs[-doc_id]
+            results.append(SearchResult(path=path, command=cmd, score=score))
+        return results
@@ -0,0 +1,163 @@
+"""
+Many sessions sharing one command tree.
+
+The command tree of a CLI is frozen once, after all the commands have been
+registered, into an immutable FrozenCommandTree. Any number of Session objects,
+each one with its own prompt, exit flag and history, execute commands against
+it concurrently (threads or asyncio tasks through asyncio.to_thread) without
+copying the tree and without locks:
+
+    tree = cli.freeze()
+    session = tree.session(prompt="db>")
+    result = session.execute("math add 1 2")
+"""
+import time
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Callable, Collection, Deque, Dict, List, Mapping, Tuple, Union
+
+from mustiolo import middleware
+from mustiolo.message_box import BorderStyle, draw_message_box
+from mustiolo.models.command import (
+    CommandGroup,
+    FrozenCommandGroup,
+    failure_exit_code,
+    prepare_call,
+    resolve_command,
+)
+from mustiolo.models.result import CommandResult
+from mustiolo.output import OutputMode, capture_stdout, record_line
+from mustiolo.results import ResultStore, execute_line
+
+
+class FrozenCommandTree:
+    """
+    Immutable command tree, it keeps the commands it was frozen with: a reload
+    or a registration on the CLI does not change it, freeze again to see them.
+    The middleware chain of every command is composed when the tree is frozen,
+    so executing a command only reads the tree.
+    Plugins are loaded when the tree is frozen.
+    The root commands named in 'exclude' are left out, CLI.freeze excludes the
+    builtins acting on the CLI itself (exit, history, watch, ...).
+    """
+
+    def __init__(self, root: CommandGroup, exclude: Collection[str] = ()):
+        self._root = FrozenCommandGroup.freeze(root, exclude)
+        handlers: Dict[Tuple[str, ...], Callable] = {}
+        self._compose(self._root, (), [], handlers)
+        self._handlers: Mapping[Tuple[str, ...], Callable] = MappingProxyType(handlers)
+
+    def _compose(self, group: FrozenCommandGroup, path: Tuple[str, ...], middlewares: List[middleware.Middleware],
+                 handlers: Dict[Tuple[str, ...], Callable]) -> None:
+        middlewares = middlewares + list(group.middlewares)
+        for name, entry in group.commands.items():
+            if isinstance(entry, FrozenCommandGroup):
+                self._compose(entry, path + (name,), middlewares, handlers)
+            else:
+                handlers[path + (name,)] = middleware.compose(entry, middlewares, list(path + (name,)))
+
+    @property
+    def root(self) -> FrozenCommandGroup:
+        return self._root
+
+    def execute(self, tokens: List[str], results: Union[ResultStore, None] = None) -> CommandResult:
+        """
+        Resolve, cast and call the command in the tokens, as CLI.main without
+        printing anything: the outcome is in the result, what the command prints
+        in result.output (captured for the calling thread only).
+        The '$' references are taken from 'results'.
+        """
+        result = CommandResult()
+        start = time.perf_counter()
+        try:
+            current_menu, result.path, command = resolve_command(self._root, tokens)
+            _, result.arguments = prepare_call(current_menu, command, results)
+            handler = self._handlers[tuple(result.path)]
+        except Exception as ex:
+            result.error, result.exit_code = ex, 2
+        else:
+            with capture_stdout() as output:
+                try:
+                    result.result = handler(*result.arguments)
+                except Exception as ex:
+                    result.error, result.exit_code = ex, failure_exit_code(ex)
+            result.output = output.getvalue()
+        result.duration = time.perf_counter() - start
+        return result
+
+    def session(self, prompt: str = ">", output_mode: OutputMode = OutputMode.BOX, columns: int = 80,
+                history_size: int = 1000) -> 'Session':
+        return Session(self, prompt, output_mode, columns, history_size)
+
+
+class Session:
+    """
+    State of a single user of a FrozenCommandTree. Sessions are cheap, they
+    only hold the prompt, the exit flag, the last command lines and the
+    objects returned by the commands.
+    'exit' ends the session and not the process.
+    """
+
+    def __init__(self, tree: FrozenCommandTree, prompt: str = ">", output_mode: OutputMode = OutputMode.BOX,
+                 columns: int = 80, history_size: int = 1000):
+        self.tree = tree
+        self.prompt = prompt
+        self.output_mode = OutputMode(output_mode)
+        # the panels are drawn for the session terminal, not for the process one
+        self.columns = columns
+        self.history: Deque[str] = deque(maxlen=history_size)
+        self.results = ResultStore()
+        self._exit = False
+
+    @property
+    def closed(self) -> bool:
+        return self._exit
+
+    def close(self) -> None:
+        self._exit = True
+
+    def execute(self, line: str) -> Union[CommandResult, None]:
+        """Execute a command line, returns None for empty lines."""
+        tokens = line.split()
+        if len(tokens) == 0:
+            return None
+        self.history.append(line)
+        if tokens == ["exit"]:
+            self.close()
+            return CommandResult(path=["exit"])
+        return execute_line(self.tree.execute, tokens, self.results)
+
+    def render(self, result: Union[CommandResult, None]) -> str:
+        """
+        Text to show for a result: a JSON Lines record with the command output,
+        or the command output followed by the error panel.
+        """
+        if result is None:
+            return ""
+        if self.output_mode is OutputMode.JSONL:
+            return record_line(result)
+        text = result.output[:-1] if result.output and result.output.endswith("\n") else result.output or ""
+        if result.error is None:
+            return text
+        if isinstance(result.error, ValueError):
+            message = f"Error in parameters: {result.error}"
+        else:
+            message = f"An error occurred: {result.error}"
+        panel = draw_message_box("Error", message, BorderStyle.SINGLE_ROUNDED, self.columns)
+        return f"{text}\n{panel}" if text != "" else panel
+
+    def run(self, read_line: Callable[[str], str] = input, write: Callable[[str], Any] = print) -> None:
+        """
+        Interactive loop until 'exit' or the end of the input. 'read_line' receives
+        the prompt and returns a command line, e.g. read from a socket; 'write'
+        receives what the commands print and the errors, never the process stdout.
+        """
+        while not self._exit:
+            try:
+                line = read_line("" if self.output_mode is OutputMode.JSONL else f"{self.prompt} ")
+            except EOFError:
+                self.close()
+                break
+            text = self.render(self.execute(line))
+            if text != "":
+                write(text)
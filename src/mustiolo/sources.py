@@ -0,0 +1,112 @@
+"""
+Argument sources: an argument written as '@path' is read from a file, '@-'
+from the standard input. List parameters receive a lazy iterator over the
+elements (separated by commas or newlines) so the file is never read wholly
+into memory: regular files are memory mapped and scanned chunk by chunk.
+"""
+import mmap
+import os
+import re
+import stat
+import sys
+from typing import Any, Callable, Iterable, Iterator
+
+from mustiolo.exception import ParameterSourceError, ParameterWrongElement
+
+
+STDIN = "-"
+CHUNK_SIZE = 1 << 20
+
+_SEPARATOR_RE = re.compile(rb"[,\r\n]")
+
+
+def _mapped_chunks(fileno: int) -> Iterator[bytes]:
+    if os.fstat(fileno).st_size == 0:
+        return
+    with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(0, len(mapped), CHUNK_SIZE):
+            yield mapped[offset:offset + CHUNK_SIZE]
+
+
+def _stream_chunks(stream: Any) -> Iterator[bytes]:
+    yield from iter(lambda: stream.read(CHUNK_SIZE), b"")
+
+
+def _stdin_chunks() -> Iterator[bytes]:
+    stream = sys.stdin.buffer
+    try:
+        # stdin redirected from a file can be mapped too
+        regular = stat.S_ISREG(os.fstat(stream.fileno()).st_mode)
+    except (OSError, ValueError):
+        regular = False
+    if regular:
+        yield from _mapped_chunks(stream.fileno())
+    else:
+        yield from _stream_chunks(stream)
+
+
+def split_elements(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Split the chunks on commas and newlines, empty elements are skipped."""
+    tail = b""
+    for chunk in chunks:
+        parts = _SEPARATOR_RE.split(tail + chunk)
+        # the last part can continue in the next chunk
+        tail = parts.pop()
+        for part in parts:
+            part = part.strip()
+            if len(part) > 0:
+                yield part
+    tail = tail.strip()
+    if len(tail) > 0:
+        yield tail
+
+
+class FileListSource:
+    """
+    Lazy sequence of the elements in a file ('-' is the standard input), each
+    element is converted when it is reached. A file can be iterated again, the
+    standard input only once: a second iteration raises ParameterSourceError.
+    A wrong element raises ParameterWrongElement while iterating.
+    """
+
+    def __init__(self, path: str, convert: Callable[[str], Any] = str, expected_type: str = "STRING"):
+        if path != STDIN and not os.path.isfile(path):
+            raise ParameterSourceError(path, "file not found")
+        self.path = path
+        self._convert = convert
+        self._expected_type = expected_type
+        self._consumed = False
+
+    def __repr__(self) -> str:
+        return f"FileListSource('{self.path}')"
+
+    def _chunks(self) -> Iterator[bytes]:
+        if self.path == STDIN:
+            if self._consumed:
+                raise ParameterSourceError(self.path, "the standard input can be read only once")
+            self._consumed = True
+            yield from _stdin_chunks()
+            return
+        with open(self.path, "rb") as fp:
+            yield from _mapped_chunks(fp.fileno())
+
+    def __iter__(self) -> Iterator[Any]:
+        for index, element in enumerate(split_elements(self._chunks())):
+            text = element.decode("utf-8")
+            try:
+                yield self._convert(text)
+            except (ValueError, TypeError, OverflowError):
+                raise ParameterWrongElement(text, index, self._expected_type)
+
+
+def read_source(path: str) -> str:
+    """Whole content of a file ('-' is the standard input) without the trailing newline."""
+    try:
+        if path == STDIN:
+            text = sys.stdin.read()
+        else:
+            with open(path, "r", encoding="utf-8") as fp:
+                text = fp.read()
+    except OSError as ex:
+        raise ParameterSourceError(path, ex.strerror or str(ex))
+    return text.rstrip("\r\n")
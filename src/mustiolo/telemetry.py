@@ -0,0 +1,311 @@
+"""
+Export of the command executions to a local file, in OTLP-JSON (one span per
+command) or Prometheus text format (counters and duration histograms per command).
+
+The exporter is a middleware: on the hot path it only formats the arguments
+(bounded and redacted) and appends the span to a bounded queue, a background
+thread drains the queue and writes the file.
+When the queue is full the spans are dropped and counted. A failed write is
+logged and the thread keeps going: the spans of that OTLP batch are lost and
+counted, the Prometheus aggregates are written again at the next flush.
+
+    exporter = SpanExporter("spans.jsonl", redact={"password"})
+    cli.use(exporter)
+"""
+import atexit
+import json
+import logging
+import os
+import reprlib
+import secrets
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Tuple, Union
+
+from mustiolo.middleware import CommandContext
+
+
+OTLP_JSON = "otlp-json"
+PROMETHEUS = "prometheus"
+
+REDACTED = "***"
+MAX_ARGUMENT_LENGTH = 256
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+
+class _ArgumentRepr(reprlib.Repr):
+    """
+    repr of the arguments bounded while it is built: a list of millions of
+    elements costs as much as one of a few, the arrays of mustiolo.bulk too.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.maxlist = self.maxtuple = self.maxset = self.maxfrozenset = self.maxdict = self.maxarray = 16
+        self.maxstring = self.maxlong = self.maxother = MAX_ARGUMENT_LENGTH
+
+    def repr_IntArray(self, x: Any, level: int) -> str:
+        return self.repr_array(x, level)
+
+    def repr_FloatArray(self, x: Any, level: int) -> str:
+        return self.repr_array(x, level)
+
+
+_argument_repr = _ArgumentRepr()
+
+
+@dataclass
+class Span:
+    path: Tuple[str, ...]
+    # argument name -> bounded and redacted repr, formatted when the command
+    # returns so the span does not keep the argument objects alive in the queue
+    arguments: Dict[str, str]
+    start: float
+    duration: float
+    exception: Union[str, None] = None
+    command: Any = None
+
+    @property
+    def ok(self) -> bool:
+        return self.exception is None
+
+    @property
+    def command_path(self) -> Tuple[str, ...]:
+        """The path with the command name, also when the command was typed by its alias."""
+        command = getattr(self.command, "command", self.command)
+        name = getattr(command, "name", None)
+        if not name or len(self.path) == 0:
+            return self.path
+        return self.path[:-1] + (name,)
+
+
+def _argument_names(command: Any, count: int) -> List[str]:
+    parameters = getattr(command, "parameters", None)
+    if parameters is None:
+        # CommandAlias
+        parameters = getattr(getattr(command, "command", None), "parameters", [])
+    names = [param.name for param in parameters[:count]]
+    return names + [f"arg{index}" for index in range(len(names), count)]
+
+
+class SpanExporter:
+
+    def __init__(self, path: str, format: str = OTLP_JSON, redact: Iterable[str] = (),
+                 max_queue: int = 10000, flush_interval: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3,
+                 service_name: str = "mustiolo") -> None:
+        if format not in (OTLP_JSON, PROMETHEUS):
+            raise ValueError(f"Unknown exporter format '{format}'")
+        self.path = path
+        self.format = format
+        self._redact = frozenset(redact)
+        self._max_queue = max_queue
+        self._flush_interval = flush_interval
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._service_name = service_name
+        # deque.append and popleft are atomic, the hot path takes no lock
+        self._queue: Deque[Span] = deque()
+        self._dropped = 0
+        self._failed = 0
+        self._exported = 0
+        # Prometheus aggregates: (path, outcome) -> count, path -> [sum, count, buckets...]
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._durations: Dict[str, List[float]] = {}
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="mustiolo-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def dropped(self) -> int:
+        """Spans dropped because the queue was full."""
+        return self._dropped
+
+    @property
+    def failed(self) -> int:
+        """Spans lost because the file could not be written."""
+        return self._failed
+
+    @property
+    def exported(self) -> int:
+        return self._exported
+
+    def __call__(self, context: CommandContext, call_next: Callable[[], Any]) -> Any:
+        start = time.time()
+        counter = time.perf_counter()
+        exception = None
+        try:
+            return call_next()
+        except Exception as ex:
+            exception = type(ex).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - counter
+            # the Prometheus aggregates do not use the arguments
+            arguments = self._arguments(context.command, context.arguments) if self.format == OTLP_JSON else {}
+            self.record(Span(path=tuple(context.path), arguments=arguments, start=start,
+                             duration=duration, exception=exception, command=context.command))
+
+    def _arguments(self, command: Any, values: List[Any]) -> Dict[str, str]:
+        arguments = {}
+        for name, value in zip(_argument_names(command, len(values)), values):
+            # repr never consumes lazy arguments like the @file sources
+            arguments[name] = REDACTED if name in self._redact else _argument_repr.repr(value)[:MAX_ARGUMENT_LENGTH]
+        return arguments
+
+    def record(self, span: Span) -> None:
+        if len(self._queue) >= self._max_queue:
+            self._dropped += 1
+            return
+        self._queue.append(span)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # a full disk or a removed directory must not stop the export
+                logger.exception("Cannot write the spans to '%s'", self.path)
+
+    def _drain(self) -> List[Span]:
+        spans = []
+        try:
+            while True:
+                spans.append(self._queue.popleft())
+        except IndexError:
+            return spans
+
+    def flush(self) -> None:
+        """Write the queued spans, called periodically by the background thread."""
+        with self._write_lock:
+            spans = self._drain()
+            if self.format == OTLP_JSON:
+                if len(spans) > 0:
+                    try:
+                        self._append(json.dumps(self._otlp(spans), separators=(",", ":")) + "\n")
+                    except Exception:
+                        self._failed += len(spans)
+                        raise
+            else:
+                self._aggregate(spans)
+                self._replace(self._prometheus())
+            self._exported += len(spans)
+
+    def close(self) -> None:
+        """Stop the background thread and write what is still queued."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        atexit.unregister(self.close)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Cannot write the spans to '%s'", self.path)
+
+    def _rotate(self) -> None:
+        for index in range(self._backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self._backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _append(self, data: str) -> None:
+        try:
+            if os.path.getsize(self.path) + len(data) > self._max_bytes:
+                self._rotate()
+        except OSError:
+            pass
+        with open(self.path, "a", encoding="utf-8") as fp:
+            fp.write(data)
+
+    def _replace(self, data: str) -> None:
+        # the scrapers must never read a half written file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            fp.write(data)
+        os.replace(tmp_path, self.path)
+
+    def _otlp(self, spans: List[Span]) -> Dict[str, Any]:
+        otlp_spans = []
+        for span in spans:
+            name = " ".join(span.command_path)
+            attributes = [{"key": "command.path", "value": {"stringValue": name}}]
+            attributes.extend({"key": f"command.argument.{name}", "value": {"stringValue": value}}
+                              for name, value in span.arguments.items())
+            status: Dict[str, Any] = {"code": 1}
+            if span.exception is not None:
+                attributes.append({"key": "exception.type", "value": {"stringValue": span.exception}})
+                status = {"code": 2, "message": span.exception}
+            start = int(span.start * 1e9)
+            otlp_spans.append({
+                # every command is a trace of its own
+                "traceId": secrets.token_hex(16),
+                "spanId": secrets.token_hex(8),
+                "name": name,
+                "kind": 1,
+                "startTimeUnixNano": str(start),
+                "endTimeUnixNano": str(start + int(span.duration * 1e9)),
+                "attributes": attributes,
+                "status": status,
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": self._service_name}},
+                {"key": "mustiolo.exporter.dropped_spans", "value": {"intValue": str(self._dropped)}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "mustiolo"}, "spans": otlp_spans}],
+        }]}
+
+    def _aggregate(self, spans: List[Span]) -> None:
+        for span in spans:
+            # one series per command, whether it was typed by its name or its alias
+            path = " ".join(span.command_path)
+            key = (path, "ok" if span.ok else "error")
+            self._counters[key] = self._counters.get(key, 0) + 1
+            if span.exception is not None:
+                key = (path, span.exception)
+                self._errors[key] = self._errors.get(key, 0) + 1
+            durations = self._durations.setdefault(path, [0.0, 0] + [0] * len(DURATION_BUCKETS))
+            durations[0] += span.duration
+            durations[1] += 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    durations[2 + index] += 1
+
+    def _prometheus(self) -> str:
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        lines = ["# HELP mustiolo_commands_total Executed commands.",
+                 "# TYPE mustiolo_commands_total counter"]
+        for (path, outcome), count in sorted(self._counters.items()):
+            lines.append(f'mustiolo_commands_total{{path="{escape(path)}",outcome="{outcome}"}} {count}')
+        lines += ["# HELP mustiolo_command_errors_total Commands failed, by exception type.",
+                  "# TYPE mustiolo_command_errors_total counter"]
+        for (path, exception), count in sorted(self._errors.items()):
+            lines.append(f'mustiolo_command_errors_total{{path="{escape(path)}",exception="{exception}"}} {count}')
+        lines += ["# HELP mustiolo_command_duration_seconds Command duration.",
+                  "# TYPE mustiolo_command_duration_seconds histogram"]
+        for path, durations in sorted(self._durations.items()):
+            label = escape(path)
+            for index, bound in enumerate(DURATION_BUCKETS):
+                lines.append(f'mustiolo_command_duration_seconds_bucket{{path="{label}",le="{bound}"}} '
+                             f'{durations[2 + index]}')
+            lines.append(f'mustiolo_command_duration_seconds_bucket{{path="{label}",le="+Inf"}} {durations[1]}')
+            lines.append(f'mustiolo_command_duration_seconds_sum{{path="{label}"}} {durations[0]}')
+            lines.append(f'mustiolo_command_duration_seconds_count{{path="{label}"}} {durations[1]}')
+        lines += ["# HELP mustiolo_exporter_dropped_spans_total Spans dropped because the queue was full.",
+                  "# TYPE mustiolo_exporter_dropped_spans_total counter",
+                  f"mustiolo_exporter_dropped_spans_total {self._dropped}"]
+        return "\n".join(lines) + "\n"
@@ -1,6 +1,9 @@
+import os
 import re
-from typing import Any, Callable, Dict, List
+import sys
+from typing import Any, Callable, Dict, List, Tuple, Union
 
+from mustiolo.completion import default_provider
 from mustiolo.exception import ParameterMissingType
 from mustiolo.models.function_info import FunctionLocation, FunctionMetadata
 from mustiolo.models.parameters import ParameterModel
@@ -22,6 +25,10 @@ def get_defaults(fn: Callable) -> Dict[str, Any]:
     return output
 
 
+_MENU_RE = re.compile(r"\<menu\>(.*?)\<\/menu\>", re.DOTALL)
+_USAGE_RE = re.compile(r"\<usage\>(.*?)\<\/usage\>", re.DOTALL)
+
+
 def parse_docstring_for_menu_usage(fn: Callable) -> List[str]:
     """
     This function retrieve the short help message and long help message
@@ -39,8 +46,11 @@ def parse_docstring_for_menu_usage(fn: Callable) -> List[str]:
     <usage></usage>
 
     """
-    def get_section(text: str , pattern: str) -> str:
-        match = re.search(pattern, text, re.DOTALL)
+    def get_section(text: str, tag: str, pattern: re.Pattern) -> str:
+        # most docstrings have no tags at all, skip the regex for them
+        if tag not in text:
+            return ""
+        match = pattern.search(text)
 
         # Check if a match is found and extract the substring
         if match:
@@ -54,11 +64,8 @@ def parse_docstring_for_menu_usage(fn: Callable) -> List[str]:
 
     help_msg: List[str] = []
 
-    menu_pattern = r"\<menu\>(.*?)\<\/menu\>"
-    usage_pattern = r"\<usage\>(.*?)\<\/usage\>"
-
-    help_msg.append(get_section(fn.__doc__, menu_pattern))
-    help_msg.append(get_section(fn.__doc__, usage_pattern))
+    help_msg.append(get_section(fn.__doc__, "<menu>", _MENU_RE))
+    help_msg.append(get_section(fn.__doc__, "<usage>", _USAGE_RE))
 
     return help_msg
 
@@ -88,6 +95,22 @@ def parse_parameters(f: Callable) -> List[ParameterModel]:
         raise ParameterMissingType(fmeta.name, fmeta.location.filename, fmeta.location.lineno)
 
     for pname, ptype in f.__annotations__.items():
-        parameters.append(ParameterModel(name=pname, ptype=ptype, default=(defaults.get(pname, None))))
+        parameters.append(ParameterModel(name=pname, ptype=ptype, default=(defaults.get(pname, None)),
+                                         completer=default_provider(ptype)))
 
     return parameters
+
+
+def source_stamp(module_name: str) -> Union[Tuple[str, Tuple[int, int]], None]:
+    """
+    The source file of a loaded module with its modification time and size,
+    None for the main script, the built-in and the compiled modules.
+    """
+    path = getattr(sys.modules.get(module_name), "__file__", None)
+    if module_name == "__main__" or path is None or not path.endswith(".py"):
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,151 @@
+"""
+'watch' builtin: execute a command at a fixed interval and show its output,
+redrawing only the lines which changed since the previous run.
+
+    > watch -n 5 db status
+
+The screen is never cleared: the cursor goes back to the top of the previous
+output and skips the unchanged lines, so a large table where a few values
+change costs a few escape sequences per tick. The lines longer than the
+terminal are counted for the rows they wrap on, and an output taller than
+the terminal is cut to its height as watch(1) does: the cursor cannot go
+back above the top of the screen. A run lasting more than the
+interval skips the next ticks instead of piling them up. Ctrl-C stops it.
+"""
+import math
+import time
+from typing import Callable, List, TextIO, Tuple, Union
+
+from mustiolo.message_box import display_width
+
+DEFAULT_INTERVAL = 2.0
+
+CURSOR_UP = "\033[{}A"
+CURSOR_DOWN = "\033[{}B"
+CLEAR_LINE = "\033[2K"
+CLEAR_DOWN = "\033[J"
+HIDE_CURSOR = "\033[?25l"
+SHOW_CURSOR = "\033[?25h"
+
+
+def parse_arguments(arguments: List[str]) -> Tuple[float, List[str]]:
+    """Split 'watch [-n SECONDS] PATH...' into the interval and the command line."""
+    interval = DEFAULT_INTERVAL
+    if len(arguments) > 0 and arguments[0] == "-n":
+        if len(arguments) < 2:
+            raise ValueError("-n needs the interval in seconds")
+        try:
+            interval = float(arguments[1])
+        except ValueError:
+            raise ValueError(f"'{arguments[1]}' is not a valid interval")
+        arguments = arguments[2:]
+    if interval <= 0:
+        raise ValueError("the interval must be greater than 0")
+    if len(arguments) == 0:
+        raise ValueError("watch needs a command")
+    return interval, arguments
+
+
+def _rows(line: str, columns: Union[int, None]) -> int:
+    """Terminal rows taken by a line, None columns means the lines never wrap."""
+    if columns is None:
+        return 1
+    return max(1, -(-display_width(line) // columns))
+
+
+def fit_rows(frame: List[str], rows: int, columns: Union[int, None] = None) -> List[str]:
+    """The first lines of the frame taking at most 'rows' terminal rows."""
+    used = 0
+    for index, line in enumerate(frame):
+        used += _rows(line, columns)
+        if used > rows:
+            return frame[:index]
+    return frame
+
+
+def diff_frame(previous: List[str], current: List[str], columns: Union[int, None] = None) -> str:
+    """
+    Escape sequences turning the previous frame into the current one, the
+    cursor is expected on the line after the previous frame and is left on
+    the line after the current one. With the terminal 'columns' the cursor
+    moves over the rows of the wrapped lines.
+    """
+    previous_rows = [_rows(line, columns) for line in previous]
+    out = []
+    if len(previous) > 0:
+        out.append(CURSOR_UP.format(sum(previous_rows)))
+    out.append("\r")
+    skip = 0
+    for index, line in enumerate(current):
+        rows = _rows(line, columns)
+        if index < len(previous) and previous[index] == line:
+            skip += rows
+            continue
+        if skip > 0:
+            out.append(CURSOR_DOWN.format(skip))
+            skip = 0
+        if index < len(previous):
+            if rows != previous_rows[index]:
+                # the lines below move up or down: the rest of the frame is written again
+                out.append(CLEAR_DOWN)
+                out.extend(line + "\n" for line in current[index:])
+                return "".join(out)
+            out.append(CLEAR_LINE)
+            if rows > 1:
+                out.append((CURSOR_DOWN.format(1) + CLEAR_LINE) * (rows - 1))
+                out.append(CURSOR_UP.format(rows - 1))
+        out.append(line + "\n")
+    if skip > 0:
+        out.append(CURSOR_DOWN.format(skip))
+    # lines left from a longer previous frame
+    extra = sum(previous_rows[len(current):])
+    if extra > 0:
+        out.append((CLEAR_LINE + "\n") * extra)
+        out.append(CURSOR_UP.format(extra))
+    return "".join(out)
+
+
+def watch(run: Callable[[], str], interval: float, stream: TextIO, title: str,
+          iterations: Union[int, None] = None, clock: Callable[[], float] = time.monotonic,
+          sleep: Callable[[float], None] = time.sleep, columns: Union[int, None] = None,
+          lines: Union[int, None] = None) -> int:
+    """
+    Call 'run' every 'interval' seconds and draw the text it returns under a
+    header, until Ctrl-C or 'iterations' runs. Returns the number of skipped ticks.
+    'columns' is the terminal width, None when the lines never wrap; 'lines'
+    is the terminal height, the frame is cut to a row less (the cursor line).
+    """
+    previous: List[str] = []
+    skipped = 0
+    runs = 0
+    next_tick = clock()
+    stream.write(HIDE_CURSOR)
+    try:
+        while iterations is None or runs < iterations:
+            text = run()
+            runs += 1
+            header = f"Every {interval:g}s: {title}"
+            if skipped > 0:
+                header += f" (skipped {skipped})"
+            current = [header, ""] + text.splitlines()
+            if lines is not None:
+                current = fit_rows(current, max(1, lines - 1), columns)
+            stream.write(diff_frame(previous, current, columns))
+            stream.flush()
+            previous = current
+
+            next_tick += interval
+            now = clock()
+            if now > next_tick:
+                # overrun: wait for the next tick in the future
+                missed = math.ceil((now - next_tick) / interval)
+                skipped += missed
+                next_tick += missed * interval
+            if iterations is None or runs < iterations:
+                sleep(max(0.0, next_tick - clock()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.write(SHOW_CURSOR)
+        stream.flush()
+    return skipped
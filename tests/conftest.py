@@ -0,0 +1,25 @@
+from mustiolo.cli import CLI, MenuGroup
+
+import pytest
+
+
+@pytest.fixture
+def cli():
+    """A CLI with a 'math' menu whose commands print and return the result."""
+    cli = CLI()
+    math = MenuGroup("math", "Math operations")
+
+    @math.command(alias="a")
+    def add(a: int, b: int):
+        """<menu>Add two numbers.</menu>"""
+        print(a + b)
+        return a + b
+
+    @math.command()
+    def div(a: int, b: int):
+        """<menu>Divide two numbers.</menu>"""
+        print(a / b)
+        return a / b
+
+    cli.add_group(math)
+    return cli
@@ -0,0 +1,98 @@
+from mustiolo.bulk import FloatArray, IntArray, is_ndarray
+from mustiolo.exception import ParameterWrongElement, ParameterWrongType
+from mustiolo.models.parameters import ParameterModel, ptype_to_str
+
+import pytest
+
+
+def test_int_array():
+    param = ParameterModel(name="ids", ptype=IntArray, default=None)
+    values = param.convert_to_type("1, 2,-3")
+    assert isinstance(values, IntArray)
+    assert values.typecode == "q"
+    assert list(values) == [1, 2, -3]
+    # not valid JSON but valid integers
+    assert list(param.convert_to_type("007,8")) == [7, 8]
+    assert ptype_to_str(IntArray) == "LIST[INTEGER]"
+
+
+def test_float_array():
+    param = ParameterModel(name="values", ptype=FloatArray, default=None)
+    assert list(param.convert_to_type("1,2.5,3e2")) == [1.0, 2.5, 300.0]
+    assert list(param.convert_to_type(".5,inf"))[0] == 0.5
+
+
+@pytest.mark.parametrize("ptype, value, index", [
+    (IntArray, "1,2,x,4", 2),
+    (IntArray, "1,,2", 1),
+    (IntArray, "1,99999999999999999999999", 1),
+    (IntArray, "1,2.5", 1),
+    (FloatArray, "1.0,abc", 1),
+    (list[int], "1,2,x", 2),
+])
+def test_wrong_element(ptype, value, index):
+    param = ParameterModel(name="values", ptype=ptype, default=None)
+    with pytest.raises(ParameterWrongElement) as e:
+        param.convert_to_type(value)
+    assert e.value.index == index
+    # still a ParameterWrongType for the callers
+    assert isinstance(e.value, ParameterWrongType)
+
+
+@pytest.mark.parametrize("ptype", [IntArray, FloatArray])
+def test_json_path_in_slices(monkeypatch, ptype):
+    from mustiolo import bulk
+
+    monkeypatch.setattr(bulk, "NUMPY_MIN_LENGTH", 10 ** 9)
+    monkeypatch.setattr(bulk, "JSON_CHUNK_LENGTH", 4)
+    param = ParameterModel(name="values", ptype=ptype, default=None)
+    value = ",".join(str(i * 37) for i in range(200))
+    assert list(param.convert_to_type(value)) == [i * 37 for i in range(200)]
+    assert list(param.convert_to_type("")) == []
+    for wrong, index in (("12345,6,", 2), ("12345,,6", 1), ("1,2,3,4,5 6", 4)):
+        with pytest.raises(ParameterWrongElement) as e:
+            param.convert_to_type(wrong)
+        assert e.value.index == index
+
+
+def test_ndarray():
+    numpy = pytest.importorskip("numpy")
+    import numpy.typing as npt
+
+    assert is_ndarray(numpy.ndarray)
+    assert is_ndarray(npt.NDArray[numpy.int64])
+    param = ParameterModel(name="ids", ptype=npt.NDArray[numpy.int64], default=None)
+    values = param.convert_to_type("1,2,3")
+    assert values.dtype == numpy.int64
+    assert values.tolist() == [1, 2, 3]
+    with pytest.raises(ParameterWrongElement) as e:
+        param.convert_to_type("1,x")
+    assert e.value.index == 1
+
+
+def test_arrays_parsed_by_numpy(monkeypatch):
+    pytest.importorskip("numpy")
+    import mustiolo.bulk
+
+    monkeypatch.setattr(mustiolo.bulk, "NUMPY_MIN_LENGTH", 0)
+    ints = ParameterModel(name="ids", ptype=IntArray, default=None)
+    values = ints.convert_to_type(" 1, 2,-3")
+    assert isinstance(values, IntArray)
+    assert list(values) == [1, 2, -3]
+    assert list(ints.convert_to_type("9223372036854775807,1")) == [9223372036854775807, 1]
+    floats = ParameterModel(name="values", ptype=FloatArray, default=None)
+    assert list(floats.convert_to_type("1,2.5,3e2")) == [1.0, 2.5, 300.0]
+    for ptype, value, index in [(IntArray, "1,99999999999999999999999", 1), (IntArray, "1,2.5", 1),
+                                (IntArray, "1,,2", 1), (FloatArray, "1.0,abc", 1)]:
+        param = ParameterModel(name="values", ptype=ptype, default=None)
+        with pytest.raises(ParameterWrongElement) as e:
+            param.convert_to_type(value)
+        assert e.value.index == index
+
+
+def test_large_int_array():
+    param = ParameterModel(name="ids", ptype=IntArray, default=None)
+    values = param.convert_to_type(",".join(str(i) for i in range(50000)))
+    assert values.typecode == "q"
+    assert values[-1] == 49999
+    assert len(values) == 50000
@@ -0,0 +1,82 @@
+from mustiolo.cli import CLI, CommandCollection, MenuGroup
+from mustiolo.exception import CommandConflicts
+from mustiolo.models.command import SubCommandGroup
+
+import pytest
+
+
+def make_command(name: str):
+    def command(value: int = 0):
+        return value
+    command.__name__ = name
+    command.__doc__ = f"<menu>Command {name}.</menu>"
+    return command
+
+
+def test_register_commands(capsys):
+    cli = CLI()
+    math = MenuGroup("math", "Math operations")
+    collection = CommandCollection()
+
+    @collection.command()
+    def hello():
+        """<menu>Say hello.</menu>"""
+        return "hello"
+
+    cli.register_commands([make_command("first"), {"fn": make_command("second"), "alias": "s"},
+                           math, collection])
+    driver = cli.headless()
+    assert driver.send("first 1").result == 1
+    assert driver.send("s 2").result == 2
+    assert driver.send("hello").result == "hello"
+    assert cli._menu.has_command("math")
+    # the registered commands reach the listeners, e.g. the search index
+    assert cli.search("second")[0].full_path == "second"
+
+
+def test_all_conflicts_are_reported_and_nothing_is_added():
+    cli = CLI()
+    cli.register_commands([make_command("first")])
+    with pytest.raises(CommandConflicts) as error:
+        cli.register_commands([make_command("new"), make_command("first"), make_command("exit"),
+                               {"fn": make_command("other"), "alias": "new"}])
+    assert [conflict[0] for conflict in error.value.conflicts] == ["exit", "first", "new"]
+    assert "Command 'first' is already defined" in str(error.value)
+    assert not cli._menu.has_command("new")
+    assert not cli._menu.has_command("other")
+
+
+def test_menu_group_register_commands():
+    math = MenuGroup("math", "Math operations")
+    math.register_commands([make_command(f"op{index}") for index in range(100)])
+    assert len(math.get_group().commands) == 100
+    assert math.get_group().max_command_length == len("op10")
+
+
+def test_batch_listener_is_notified_once():
+    root = SubCommandGroup("__root__")
+    math = SubCommandGroup("math", "Math operations")
+    root.include_commands(math)
+    single, batches = [], []
+    root.subscribe(lambda event, path, cmd: single.append(path),
+                   lambda event, entries: batches.append([path for path, _ in entries]))
+    math.register_commands([make_command(f"op{index}") for index in range(3)])
+    assert single == []
+    assert batches == [[("math", "op0"), ("math", "op1"), ("math", "op2")]]
+
+
+def test_cli_bulk_registration_composes_the_middlewares():
+    cli = CLI()
+    math = MenuGroup("math", "Math operations")
+    calls = []
+
+    def record(context, call_next):
+        calls.append(context.path)
+        return call_next()
+
+    math.use(record)
+    cli.add_group(math)
+    math.register_commands([make_command("op0"), make_command("op1")])
+    driver = cli.headless()
+    assert driver.send("math op1 3").result == 3
+    assert calls == [["math", "op1"]]
@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+
+import mustiolo
+from mustiolo.cli import CLI
+
+import pytest
+
+
+def test_main_executes_command(cli, capsys):
+    assert cli.main(["math", "add", "1", "2"]) == 0
+    assert capsys.readouterr().out == "3\n"
+
+
+def test_main_exit_codes(cli, capsys):
+    assert cli.main(["math", "div", "1", "0"]) == 1
+    assert "division by zero" in capsys.readouterr().err
+    assert cli.main(["math", "add", "1", "x"]) == 2
+    assert cli.main(["math", "mul", "1", "2"]) == 2
+    assert cli.main(["math", "add", "1"]) == 2
+    assert cli.main(["math"]) == 2
+    assert "is a command group" in capsys.readouterr().err
+
+
+def test_main_passes_dollar_arguments_through(capsys):
+    cli = CLI()
+
+    @cli.command(menu="Echo the text.")
+    def echo(text: str):
+        print(text)
+        return text
+
+    assert cli.main(["echo", "$5"]) == 0
+    assert cli.main(["echo", "$HOME"]) == 0
+    assert capsys.readouterr().out == "$5\n$HOME\n"
+    # nothing kept from a single run
+    assert len(cli.results) == 0
+
+
+def test_main_does_not_probe_terminal(cli):
+    cli.main(["math", "add", "1", "2"])
+    assert cli._columns is None
+
+
+def test_main_imports_no_subsystem():
+    code = "\n".join([
+        "import sys",
+        "from mustiolo.cli import CLI",
+        "cli = CLI()",
+        "cli.command(name='hello', menu='Say hello.')(lambda: None)",
+        "assert cli.main(['hello']) == 0",
+        "print(' '.join(name for name in sys.modules if name.startswith('mustiolo.')))",
+    ])
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(mustiolo.__file__)))
+    loaded = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            check=True).stdout.split()
+    assert "mustiolo.cli" in loaded
+    for name in ("headless", "history", "hotreload", "manifest", "plugins", "profiling", "replay", "script",
+                 "session", "telemetry", "watch"):
+        assert f"mustiolo.{name}" not in loaded
+
+
+def test_main_jsonl_output(cli, capsys):
+    import json
+    from mustiolo.output import OutputMode
+
+    cli.set_output_mode(OutputMode.JSONL)
+    assert cli.main(["math", "add", "1", "2"]) == 0
+    record = json.loads(capsys.readouterr().out)
+    assert record["path"] == ["math", "add"]
+    assert record["arguments"] == [1, 2]
+    assert record["output"] == "3\n"
+    assert record["error"] is None
+    assert record["exit_code"] == 0
+
+    assert cli.main(["math", "div", "1", "0"]) == 1
+    record = json.loads(capsys.readouterr().out)
+    assert record["error"] == {"type": "ZeroDivisionError", "message": "division by zero"}
+    assert cli._columns is None
+
+
+def test_run_jsonl_output(cli, capsys, monkeypatch):
+    import json
+    from mustiolo.output import OutputMode
+
+    lines = iter(["math add 2 3", "nope", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(lines))
+    cli.set_output_mode(OutputMode.JSONL)
+    cli.run()
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["path"] for r in records] == [["math", "add"], [], ["exit"]]
+    assert records[0]["output"] == "5\n"
+    assert records[1]["error"]["type"] == "CommandNotFound"
+    assert records[1]["exit_code"] == 2
+
+
+@pytest.mark.parametrize("orjson", [True, False])
+def test_jsonl_output_unusual_results(capsys, monkeypatch, orjson):
+    import json
+    from mustiolo import output
+
+    if not orjson:
+        monkeypatch.setattr(output, "_orjson", False)
+    circular = []
+    circular.append(circular)
+    results = {"keys": {1: "x"}, "big": 2 ** 70, "tuple": {(1, 2): "x"}, "circular": circular}
+    cli = CLI()
+
+    @cli.command(menu="Return a value.")
+    def get(name: str):
+        return results[name]
+
+    cli.set_output_mode(output.OutputMode.JSONL)
+
+    for name in results:
+        assert cli.main(["get", name]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records[0]["result"] == {"1": "x"}
+    assert records[1]["result"] == 2 ** 70
+    for record, name in zip(records[2:], ["tuple", "circular"]):
+        assert record["result"] == repr(results[name])
+        assert record["serialization_error"]
+        assert record["error"] is None
+        assert record["exit_code"] == 0
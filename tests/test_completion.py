@@ -0,0 +1,130 @@
+import threading
+import time
+from enum import Enum
+
+from mustiolo.cli import CLI, MenuGroup
+from mustiolo.completion import CachedProvider, Choices, PathCompleter, make_provider
+
+import pytest
+
+
+class Color(Enum):
+    RED = "red"
+    GREEN = "green"
+
+
+@pytest.fixture
+def cli():
+    cli = CLI()
+    paint = MenuGroup("paint", "Paint things")
+
+    @paint.command(completers={"shape": ["circle", "square"]})
+    def draw(shape: str, color: Color, fill: bool = False):
+        """<menu>Draw a shape.</menu>"""
+        pass
+
+    cli.add_group(paint)
+    return cli
+
+
+def test_command_candidates(cli):
+    assert cli._completion_candidates("", "") == ["? ", "exit ", "history ", "paint ", "profile ", "reload ", "search ", "watch "]
+    assert cli._completion_candidates("pa", "pa") == ["paint "]
+    assert cli._completion_candidates("paint ", "") == ["draw "]
+    assert cli._completion_candidates("? ", "") == ["exit ", "history ", "paint ", "profile ", "reload ", "search ", "watch "]
+    assert cli._completion_candidates("unknown ", "") == []
+
+
+def test_argument_candidates(cli):
+    assert cli._completion_candidates("paint draw ", "") == ["circle ", "square "]
+    assert cli._completion_candidates("paint draw s", "s") == ["square "]
+    # Enum and bool parameters have their choices by default
+    assert cli._completion_candidates("paint draw circle ", "") == ["green ", "red "]
+    assert cli._completion_candidates("paint draw circle red ", "") == ["false ", "true "]
+    assert cli._completion_candidates("paint draw circle red true ", "") == []
+    assert cli._completion_candidates("? paint draw ", "") == []
+
+
+def test_completed_bool_values_are_parsed():
+    cli = CLI()
+
+    @cli.command(menu="Deploy.")
+    def deploy(force: bool, steps: list[bool] = []):
+        return force, steps
+
+    assert cli._completion_candidates("deploy ", "") == ["false ", "true "]
+    driver = cli.headless()
+    assert driver.send("deploy false").result == (False, [])
+    assert driver.send("deploy TRUE 1,0,yes,No").result == (True, [True, False, True, False])
+    assert driver.send("deploy maybe").exit_code == 2
+    assert driver.send("deploy true 1,x").exit_code == 2
+
+
+def test_unknown_parameter_completer():
+    cli = CLI()
+    with pytest.raises(Exception):
+        @cli.command(completers={"missing": ["a"]})
+        def cmd(name: str):
+            """<menu>Command.</menu>"""
+            pass
+
+
+def test_make_provider():
+    assert make_provider(["a", "b"])("a") == ["a"]
+    assert make_provider(Color)("") == ["red", "green"]
+    assert isinstance(make_provider(lambda: ["x"]), CachedProvider)
+    assert isinstance(make_provider(Choices(["x"])), Choices)
+    with pytest.raises(TypeError):
+        make_provider(42)
+
+
+def test_path_completer(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "notes.txt").write_text("")
+    provider = PathCompleter()
+    assert sorted(provider(f"{tmp_path}/")) == [f"{tmp_path}/data/", f"{tmp_path}/notes.txt"]
+    assert PathCompleter(only_directories=True)(f"{tmp_path}/") == [f"{tmp_path}/data/"]
+
+
+def test_cached_provider_does_not_block():
+    release = threading.Event()
+    calls = []
+
+    def slow_backend():
+        calls.append(1)
+        release.wait(5)
+        return ["alpha", "beta"]
+
+    provider = CachedProvider(slow_backend, ttl=0.05, first_wait=0)
+    start = time.monotonic()
+    # nothing cached yet and the backend is still working
+    assert provider("") == []
+    assert time.monotonic() - start < 0.5
+    release.set()
+    provider._loaded.wait(1)
+    assert provider("a") == ["alpha"]
+
+    # expired: the refresh starts but the last candidates are returned meanwhile
+    release.clear()
+    time.sleep(0.06)
+    assert provider("b") == ["beta"]
+    assert provider("b") == ["beta"]
+    release.set()
+    deadline = time.monotonic() + 1
+    while provider._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2
+
+
+def test_argument_candidates_after_alias():
+    cli = CLI()
+    paint = MenuGroup("paint", "Paint things")
+
+    @paint.command(alias="dr", completers={"shape": ["circle", "square"]})
+    def draw(shape: str, color: Color):
+        """<menu>Draw a shape.</menu>"""
+        pass
+
+    cli.add_group(paint)
+    assert cli._completion_candidates("paint dr ", "") == ["circle ", "square "]
+    assert cli._completion_candidates("paint dr circle ", "") == ["green ", "red "]
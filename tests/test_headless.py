@@ -0,0 +1,37 @@
+import os
+
+from mustiolo.output import OutputMode
+
+
+def test_send_captures_output(cli, monkeypatch):
+    def no_terminal():
+        raise AssertionError("terminal probed")
+
+    monkeypatch.setattr(os, "get_terminal_size", no_terminal)
+    driver = cli.headless(columns=40)
+    result = driver.send("math add 1 2")
+    assert result.ok
+    assert result.result == 3
+    assert result.output == "3\n"
+
+    result = driver.send("math div 1 0")
+    assert result.exit_code == 1
+    panel = result.output.splitlines()
+    assert "division by zero" in result.output
+    assert all(len(line) == 40 for line in panel)
+
+    assert driver.send("  ") is None
+
+
+def test_run_until_exit(cli, capsys):
+    driver = cli.headless()
+    results = driver.run(["math add 1 2", "", "math mul 1 2", "exit", "math add 2 2"])
+    assert [result.exit_code for result in results] == [0, 2, 0]
+    assert driver.closed
+    assert capsys.readouterr().out == ""
+
+
+def test_jsonl_mode(cli):
+    cli.set_output_mode(OutputMode.JSONL)
+    result = cli.headless().send("math add 1 2")
+    assert result.output.startswith('{"path":["math","add"]')
@@ -0,0 +1,115 @@
+import os
+import time
+
+from mustiolo.cli import CLI
+from mustiolo.history import History
+
+
+def test_in_memory_history():
+    history = History(max_entries=3)
+    for index in range(10):
+        history.append(f"math add {index} 1", ["math", "add"])
+    history.append("status")
+    assert history.lines() == ["math add 8 1", "math add 9 1", "status"]
+    assert history.lines(1) == ["status"]
+    assert history.most_used(1)[0][0] == "math add"
+
+
+def test_persistent_history(tmp_path):
+    path = tmp_path / "history"
+    history = History(str(path), flush_interval=0.01)
+    history.append("math add 1 2", ["math", "add"])
+    history.append("status", ["status"])
+    history.close()
+    assert path.read_text() == "math add\tmath add 1 2\nstatus\tstatus\n"
+
+    history = History(str(path))
+    history.append("math sub 2 1", ["math", "sub"])
+    assert history.lines() == ["math add 1 2", "status", "math sub 2 1"]
+    history.close()
+    assert path.read_text().count("\n") == 3
+
+
+def test_compaction(tmp_path):
+    path = tmp_path / "history"
+    history = History(str(path), max_entries=10, flush_interval=0.01)
+    for index in range(100):
+        history.append(f"cmd {index}")
+    history.close()
+    lines = path.read_text().splitlines()
+    assert len(lines) <= 15
+    assert lines[-1] == "cmd\tcmd 99"
+
+    # a file larger than the limits is compacted when loaded
+    path.write_text("".join(f"cmd\tcmd {index}\n" for index in range(1000)))
+    history = History(str(path), max_entries=10, max_bytes=100)
+    history.wait_loaded()
+    history.close()
+    lines = path.read_text().splitlines()
+    assert lines[-1] == "cmd\tcmd 999"
+    assert len(path.read_text()) <= 100
+
+
+def test_compaction_keeps_lines_of_other_sessions(tmp_path):
+    path = tmp_path / "history"
+    history = History(str(path), max_entries=10, flush_interval=0.01)
+    for index in range(14):
+        history.append(f"cmd {index}")
+    deadline = time.monotonic() + 5
+    while not path.exists() or path.read_text().count("\n") < 14:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    # another session appends to the same file
+    other = History(str(path), max_entries=10, flush_interval=0.01)
+    other.append("other 1")
+    other.append("other 2")
+    other.close()
+    # over the limits: the file is compacted
+    history.append("cmd 14")
+    history.append("cmd 15")
+    history.close()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 10
+    assert lines[-4:] == ["other\tother 1", "other\tother 2", "cmd\tcmd 14", "cmd\tcmd 15"]
+
+
+def test_failed_compaction_on_load_keeps_the_writer(tmp_path, monkeypatch):
+    path = tmp_path / "history"
+    path.write_text("".join(f"cmd\tcmd {index}\n" for index in range(100)))
+
+    def fail(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    history = History(str(path), max_entries=10, flush_interval=0.01)
+    history.wait_loaded()
+    monkeypatch.undo()
+    history.append("status")
+    history.close()
+    assert path.read_text().splitlines()[-1] == "status\tstatus"
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_search_uses_path_index():
+    history = History(max_entries=200000)
+    for index in range(100000):
+        history.append(f"db query table_{index}", ["db", "query"])
+        history.append(f"math add {index} 1", ["math", "add"])
+    start = time.perf_counter()
+    assert history.search("math ad", 3) == ["math add 99999 1", "math add 99998 1", "math add 99997 1"]
+    assert time.perf_counter() - start < 0.05
+    # not a command path: the lines are scanned
+    assert history.search("table_4", 1) == ["db query table_49999"]
+    assert history.most_used(2) == [("db query", 100000), ("math add", 100000)]
+
+
+def test_history_command(capsys):
+    cli = CLI()
+    for line in ("? ", "search exit", "search exit", "?"):
+        cli.history.append(line, line.split()[:1])
+    cli._history_cmd(["2"])
+    assert capsys.readouterr().out == "search exit\n?\n"
+    cli._history_cmd(["top", "1"])
+    assert capsys.readouterr().out.split() in (["2", "?"], ["2", "search"])
+    cli._history_cmd(["search", "sea"])
+    assert capsys.readouterr().out == "search exit\n"
@@ -0,0 +1,132 @@
+import importlib
+import os
+import sys
+import time
+
+from mustiolo.cli import CLI
+
+import pytest
+
+SOURCE = '''
+from mustiolo.cli import MenuGroup
+
+math = MenuGroup("math", "Math operations")
+
+
+@math.command(alias="a")
+def add(a: int, b: int):
+    """<menu>Add two numbers.</menu>"""
+    return a + b
+
+
+@math.command()
+def neg(a: int):
+    """<menu>Negate a number.</menu>"""
+    return -a
+'''
+
+
+def write(path, text):
+    path.write_text(text)
+    # the changes in the same second must be seen too
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def module(tmp_path, monkeypatch, request):
+    name = f"reload_commands_{request.node.name}"
+    path = tmp_path / f"{name}.py"
+    path.write_text(SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module(name)
+    yield module, path
+    sys.modules.pop(name, None)
+
+
+@pytest.fixture
+def cli(module):
+    cli = CLI()
+    cli.add_group(module[0].math)
+    return cli
+
+
+def test_reload_swaps_changed_commands(cli, module):
+    _, path = module
+    assert str(cli.reload()) == "Nothing to reload"
+
+    write(path, SOURCE.replace("return a + b", "return a * b").replace("Add two", "Multiply two"))
+    report = cli.reload()
+    assert report.modules == [module[0].__name__]
+    assert report.changed == ["math add"]
+    assert report.errors == {}
+
+    driver = cli.headless()
+    assert driver.send("math add 3 4").result == 12
+    assert driver.send("math a 3 4").result == 12
+    assert driver.send("math neg 3").result == -3
+    assert [hit.full_path for hit in cli.search("multiply")] == ["math add"]
+    assert cli.search("multiply")[0].command.menu == "Multiply two numbers."
+
+
+def test_reload_keeps_previous_code_on_errors(cli, module):
+    _, path = module
+    write(path, SOURCE + "\ndef broken(:\n")
+    report = cli.reload()
+    assert list(report.errors) == [module[0].__name__]
+    assert cli.headless().send("math add 3 4").result == 7
+    # the broken source is not imported again
+    assert str(cli.reload()) == "Nothing to reload"
+
+    write(path, SOURCE.replace("def neg(a: int)", "def negate(a: int)"))
+    report = cli.reload()
+    assert report.errors == {"math neg": f"'neg' not found in {module[0].__name__}"}
+    assert cli.headless().send("math neg 3").result == -3
+
+
+def test_reload_new_parameters(cli, module):
+    _, path = module
+    write(path, SOURCE.replace("def neg(a: int):", "def neg(a: int, b: int = 0):").replace("return -a", "return -a - b"))
+    assert cli.reload().changed == ["math neg"]
+    assert cli.headless().send("math neg 3 1").result == -4
+
+
+def test_watch_modules(cli, module):
+    _, path = module
+    cli.watch_modules(interval=0.01)
+    try:
+        write(path, SOURCE.replace("return -a", "return a"))
+        deadline = time.monotonic() + 5
+        while not cli.reloader.pending.is_set() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        result = cli.headless().send("math neg 3")
+        assert result.result == 3
+        assert "changed: math neg" in result.output
+    finally:
+        cli.reloader.stop()
+
+
+def test_reload_replaces_the_commands(cli, module):
+    _, path = module
+    calls = []
+
+    def trace(ctx, call_next):
+        calls.append(ctx.path)
+        return call_next()
+
+    cli.use(trace)
+    tree = cli.freeze()
+    before = cli._menu.get_command("math").get_command("add")
+    write(path, SOURCE.replace("return a + b", "return a * b"))
+    assert cli.reload().changed == ["math add"]
+
+    math = cli._menu.get_command("math")
+    after = math.get_command("add")
+    assert after is not before
+    assert math.get_command("a").command is after
+    # the previous command is untouched, the frozen tree keeps running it
+    assert before.f(3, 4) == 7
+    assert tree.execute(["math", "add", "3", "4"]).result == 7
+    assert cli.headless().send("math a 3 4").result == 12
+    assert cli.freeze().execute(["math", "add", "3", "4"]).result == 12
+    assert calls == [["math", "add"]] * 3
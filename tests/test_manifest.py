@@ -0,0 +1,75 @@
+import json
+
+from mustiolo import manifest
+from mustiolo.models.command import SubCommandGroup
+
+
+def add(a: int, b: bool):
+    """<menu>Add two numbers.</menu>"""
+    pass
+
+
+def greet(name: str = "World"):
+    """<menu>Greet a user by name.</menu>"""
+    pass
+
+
+def build_tree() -> SubCommandGroup:
+    root = SubCommandGroup("__root__")
+    math = SubCommandGroup("math", "Math operations")
+    math.register_command(add, alias="plus")
+    root.include_commands(math)
+    root.register_command(greet)
+    return root
+
+
+def test_build_manifest():
+    data = manifest.build_manifest(build_tree(), "mycli")
+    assert data["prog"] == "mycli"
+    assert data["groups"] == [{"path": ["math"]}]
+    assert data["commands"][0] == {
+        "path": ["math", "add"],
+        "alias": "plus",
+        "parameters": [
+            {"name": "a", "type": "INTEGER", "required": True},
+            {"name": "b", "type": "BOOLEAN", "required": True, "choices": ["true", "false"]},
+        ],
+    }
+    assert data["commands"][1]["path"] == ["greet"]
+
+
+def test_write_and_check_manifest(tmp_path):
+    root = build_tree()
+    path = tmp_path / "mycli.json"
+    manifest.write_manifest(manifest.build_manifest(root, "mycli"), str(path))
+    loaded = manifest.load_manifest(str(path))
+    assert loaded == json.loads(path.read_text())
+    assert manifest.check_manifest(loaded, root) == []
+
+    def sub(a: int, b: int):
+        """<menu>Subtract two numbers.</menu>"""
+        pass
+
+    root.get_command("math").register_command(sub)
+    assert manifest.check_manifest(loaded, root) == ["added: math sub"]
+
+
+def test_completion_scripts():
+    data = manifest.build_manifest(build_tree(), "mycli")
+    bash = manifest.generate_bash_completion(data)
+    zsh = manifest.generate_zsh_completion(data)
+    for script in (bash, zsh):
+        assert data["fingerprint"] in script
+        assert '"") candidates="greet math" ;;' in script
+        assert '"math") candidates="add plus" ;;' in script
+        assert '"math plus"|"math plus "*)' in script
+    assert bash.rstrip().endswith("complete -F _mycli_complete mycli")
+    assert zsh.startswith("#compdef mycli")
+
+
+def test_cli_manifest_leaves_out_the_interactive_builtins(cli, tmp_path):
+    data = cli.build_manifest("mycli")
+    assert sorted(" ".join(entry["path"]) for entry in data["commands"] if len(entry["path"]) == 1) == ["?"]
+    paths = cli.export_completion("mycli", str(tmp_path))
+    assert '"") candidates="? math" ;;' in (tmp_path / "mycli.bash").read_text()
+    assert cli.check_manifest(paths[0]) == []
@@ -0,0 +1,55 @@
+from mustiolo.message_box import BorderStyle, display_width, draw_message_box, wrap
+
+import pytest
+
+
+@pytest.mark.parametrize("text, width", [
+    ("hello", 5),
+    ("日本語", 6),
+    ("\u00e9", 1),
+    ("😀!", 3),
+    ("e\u0301", 1),
+    ("日本 😀 a", 9),
+    ("", 0),
+])
+def test_display_width(text, width):
+    assert display_width(text) == width
+
+
+def test_wrap_on_word_boundaries():
+    assert wrap("hello world foo bar baz", 8) == ["hello   ", "world   ", "foo bar ", "baz     "]
+
+
+def test_wrap_splits_long_words():
+    assert wrap("ab averyveryverylongword x", 8) == ["ab      ", "averyver", "yverylon", "gword x "]
+
+
+def test_wrap_keeps_indentation_and_empty_lines():
+    assert wrap("  a b", 8) == ["  a b   "]
+    assert wrap("", 4) == ["    "]
+    assert wrap("\tx", 8) == ["    x   "]
+
+
+def test_wrap_wide_characters():
+    chunks = wrap("日本語のテキストです 😀😀 end", 7)
+    assert all(display_width(chunk) == 7 for chunk in chunks)
+    assert [chunk.rstrip() for chunk in chunks] == ["日本語", "のテキ", "ストで", "す 😀😀", "end"]
+
+
+def test_draw_message_box_aligned_with_wide_characters():
+    box = draw_message_box("タイトル", "日本語のテキストです。 hello world", BorderStyle.SINGLE_RECTANGLE, 20)
+    lines = box.splitlines()
+    assert all(display_width(line) == 20 for line in lines)
+    assert lines[0] == "┌──── タイトル ────┐"
+    assert lines[1] == "│ 日本語のテキスト │"
+
+
+def test_draw_message_box():
+    assert draw_message_box("Title", "Content", BorderStyle.SINGLE_RECTANGLE, 30) == \
+        "┌────────── Title ───────────┐\n│ Content                    │\n└────────────────────────────┘"
+
+
+@pytest.mark.parametrize("title, columns", [("漢", 5), ("漢字漢字", 7), ("a漢字", 8), ("title", 6)])
+def test_draw_message_box_truncated_title(title, columns):
+    lines = draw_message_box(title, "x", columns=columns).splitlines()
+    assert {display_width(line) for line in lines} == {columns}
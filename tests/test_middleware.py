@@ -0,0 +1,119 @@
+from mustiolo.cli import CLI
+from mustiolo.middleware import compose
+
+import pytest
+
+
+def test_compose_without_middlewares_returns_command():
+    def command():
+        pass
+
+    assert compose(command, [], ["command"]) is command
+
+
+def test_compose_order_and_arguments():
+    calls = []
+
+    def outer(context, call_next):
+        calls.append(("outer", context.path))
+        return call_next() * 10
+
+    def inner(context, call_next):
+        calls.append(("inner", list(context.arguments)))
+        context.arguments[0] += 1
+        return call_next()
+
+    handler = compose(lambda a, b: a + b, [outer, inner], ["math", "add"])
+    assert handler(1, 2) == 40
+    assert calls == [("outer", ["math", "add"]), ("inner", [1, 2])]
+
+
+def ping():
+    """<menu>Ping.</menu>"""
+    return "pong"
+
+
+@pytest.fixture
+def math(cli):
+    """The math menu of the shared cli, which gets a 'ping' command at the root too."""
+    cli.command()(ping)
+    return cli._menu.get_command("math")
+
+
+def test_middlewares_are_inherited(cli, math):
+    seen = []
+    cli.use(lambda context, call_next: seen.append(("cli", context.path)) or call_next())
+    math.use(lambda context, call_next: seen.append(("math", context.path)) or call_next())
+
+    assert cli._execute(["math", "add", "1", "2"]).result == 3
+    assert cli._execute(["ping"]).result == "pong"
+    assert seen == [("cli", ["math", "add"]), ("math", ["math", "add"]), ("cli", ["ping"])]
+
+
+def test_middleware_can_block_a_command(cli, math):
+
+    def deny(context, call_next):
+        raise PermissionError(f"'{' '.join(context.path)}' is not allowed")
+
+    math.use(deny)
+    result = cli._execute(["math", "add", "1", "2"])
+    assert isinstance(result.error, PermissionError)
+    assert result.exit_code == 1
+    assert cli._execute(["ping"]).result == "pong"
+
+
+def test_chain_is_composed_when_registered(cli, math):
+    assert cli._chains == {}
+    cli.use(lambda context, call_next: call_next())
+    # composed by use(), not by the first call
+    handler = cli._chains[("ping",)][1]
+    cli._execute(["ping"])
+    assert cli._chains[("ping",)][1] is handler
+    # a new middleware composes the chains again
+    cli.use(lambda context, call_next: call_next())
+    assert cli._chains[("ping",)][1] is not handler
+
+    def sub(a: int, b: int):
+        """<menu>Subtract two numbers.</menu>"""
+        return a - b
+
+    math.register_command(sub)
+    assert ("math", "sub") in cli._chains
+
+
+def test_middlewares_do_not_affect_other_clis(cli):
+    other = CLI()
+
+    @other.command()
+    def ping():
+        """<menu>Ping.</menu>"""
+        return "pong"
+
+    cli.use(lambda context, call_next: call_next())
+    assert other._chains == {}
+    assert other._execute(["ping"]).result == "pong"
+
+
+def test_alias_runs_the_chain_of_the_command():
+    cli = CLI()
+    seen = []
+
+    @cli.command(alias="p")
+    def ping():
+        """<menu>Ping.</menu>"""
+        return "pong"
+
+    cli.use(lambda context, call_next: seen.append(context.path) or call_next())
+    assert cli._execute(["p"]).result == "pong"
+    assert seen == [["ping"]]
+
+
+def test_command_decorator_returns_the_function():
+    cli = CLI()
+
+    @cli.command()
+    def answer():
+        """<menu>Answer.</menu>"""
+        return 42
+
+    assert answer() == 42
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from mustiolo.cli import CLI
+from mustiolo import plugins
+
+import pytest
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A directory on sys.path with an installed distribution exposing a plugin."""
+    site = tmp_path / "site"
+    dist_info = site / "fakeplugin-1.2.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: fakeplugin\nVersion: 1.2\n")
+    (dist_info / "entry_points.txt").write_text("[mustiolo.test_plugins]\nfake = fakeplugin_module:menu\n")
+    (site / "fakeplugin_module.py").write_text(textwrap.dedent('''
+        from mustiolo.cli import MenuGroup
+
+        menu = MenuGroup("ignored", "Fake commands")
+
+        @menu.command()
+        def hello(name: str):
+            """<menu>Say hello.</menu>"""
+            print(f"hello {name}")
+    '''))
+    monkeypatch.syspath_prepend(str(site))
+    monkeypatch.delitem(sys.modules, "fakeplugin_module", raising=False)
+    return site
+
+
+def test_discover_uses_cache(site, tmp_path):
+    cache = str(tmp_path / "cache.json")
+    specs, cached = plugins.discover("mustiolo.test_plugins", cache)
+    assert not cached
+    assert [(s.name, s.value, s.distribution, s.version) for s in specs] == \
+        [("fake", "fakeplugin_module:menu", "fakeplugin", "1.2")]
+    specs, cached = plugins.discover("mustiolo.test_plugins", cache)
+    assert cached
+    assert specs[0].name == "fake"
+
+    # a new version invalidates the cache
+    (site / "fakeplugin-1.2.dist-info").rename(site / "fakeplugin-1.3.dist-info")
+    _, cached = plugins.discover("mustiolo.test_plugins", cache)
+    assert not cached
+
+
+def test_plugins_are_loaded_lazily(site, tmp_path, capsys):
+    cli = CLI()
+    cli.load_plugins("mustiolo.test_plugins", str(tmp_path / "cache.json"))
+    assert "fakeplugin_module" not in sys.modules
+    assert not cli.plugins[0].loaded
+
+    assert cli.main(["fake", "hello", "world"]) == 0
+    assert capsys.readouterr().out == "hello world\n"
+    assert cli.plugins[0].loaded
+    assert "fake\tfakeplugin 1.2\t" in cli.plugins_report()
+    # the commands of a loaded plugin are searchable
+    assert cli.search("hello")[0].full_path == "fake hello"
+
+
+def test_cache_hit_does_not_import_metadata(site, tmp_path):
+    cache = str(tmp_path / "cache.json")
+    plugins.discover("mustiolo.test_plugins", cache)
+    code = "\n".join([
+        "import sys",
+        "from mustiolo import plugins",
+        f"specs, cached = plugins.discover('mustiolo.test_plugins', {cache!r})",
+        "assert cached and specs",
+        "print('importlib.metadata' in sys.modules)",
+    ])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "False"
@@ -0,0 +1,74 @@
+import pstats
+
+from mustiolo.cli import CLI
+from mustiolo.profiling import ProfileOptions, parse_arguments, profile
+
+import pytest
+
+
+def test_parse_arguments():
+    assert parse_arguments(["db", "query"]) == (ProfileOptions(), ["db", "query"])
+    options, tokens = parse_arguments(["--mem", "--top", "5", "--dump", "out.pstats", "db", "--top"])
+    assert options == ProfileOptions(memory=True, top=5, dump="out.pstats")
+    # the options after the command path belong to the command
+    assert tokens == ["db", "--top"]
+    for arguments in ([], ["--mem"], ["--top"], ["--top", "x", "db"], ["--top", "0", "db"], ["--fast", "db"]):
+        with pytest.raises(ValueError):
+            parse_arguments(arguments)
+
+
+def allocate():
+    return [str(index) * 10 for index in range(20000)]
+
+
+def test_profile_report(tmp_path):
+    dump = tmp_path / "out.pstats"
+    value, report = profile(allocate, ProfileOptions(memory=True, top=5, dump=str(dump)))
+    assert len(value) == 20000
+    assert "allocate (test_profiling.py:" in report
+    assert "Memory" in report and "test_profiling.py:" in report.split("Memory")[1]
+    assert pstats.Stats(str(dump)).total_calls > 0
+
+
+def test_profile_command(capsys):
+    cli = CLI()
+    cli.columns = 100
+
+    @cli.command()
+    def slow(count: int):
+        """<menu>Slow command.</menu>"""
+        print(len(allocate()) * count)
+
+    cli._profile_cmd(["--mem", "slow", "2"])
+    out = capsys.readouterr().out
+    assert "40000" in out
+    assert "Profile: slow 2" in out
+    assert "allocate" in out
+
+    # errors of the profiled command are shown as in the command line
+    cli._profile_cmd(["slow", "x"])
+    out = capsys.readouterr().out
+    assert "An error occurred" in out and "Profile: slow x" in out
+    with pytest.raises(ValueError):
+        cli._profile_cmd(["profile", "slow", "1"])
+
+
+def test_profile_memory_is_relative_to_the_command():
+    import tracemalloc
+
+    def temporary():
+        data = allocate()
+        return len(data)
+
+    tracemalloc.start()
+    try:
+        held = allocate()  # allocated before the command
+        _, report = profile(temporary, ProfileOptions(memory=True))
+    finally:
+        tracemalloc.stop()
+    memory = report.split("Memory, peak ")[1]
+    assert float(memory.split(" KiB")[0]) > 500
+    # neither the memory held before nor the one freed by the command is listed
+    sizes = [float(line.split()[0]) for line in memory.splitlines()[2:]]
+    assert all(size < 10 for size in sizes)
+    assert len(held) == 20000
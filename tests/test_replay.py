@@ -0,0 +1,110 @@
+import json
+
+from mustiolo.replay import Record, load_log, percentile, replay
+
+import pytest
+
+
+def test_record_main(cli, tmp_path, capsys):
+    log = tmp_path / "session.log"
+    cli.record(str(log))
+    cli.main(["math", "add", "1", "2"])
+    cli.main(["math", "div", "1", "0"])
+    cli.record(None)
+
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [record["line"] for record in records] == ["math add 1 2", "math div 1 0"]
+    assert records[0]["path"] == ["math", "add"]
+    assert [record["exit_code"] for record in records] == [0, 1]
+    assert records[0]["ts"] <= records[1]["ts"]
+
+
+def test_load_log_skips_truncated_line(tmp_path):
+    log = tmp_path / "session.log"
+    log.write_text('{"ts":1.0,"line":"math add 1 2"}\n{"ts":2.0,"li')
+    assert list(load_log(str(log))) == [Record(ts=1.0, line="math add 1 2")]
+
+
+def test_replay_report(cli, tmp_path, capsys):
+    log = tmp_path / "session.log"
+    cli.record(str(log))
+    for _ in range(10):
+        cli.main(["math", "add", "1", "2"])
+    cli.main(["math", "div", "1", "0"])
+    cli.main(["math", "mul", "1", "0"])
+    cli.record(None)
+    capsys.readouterr()
+
+    report = cli.replay(str(log), speed=None, workers=4)
+    assert capsys.readouterr().out == ""
+    assert report.total == 12
+    assert report.errors == 2
+    assert report.commands["math add"].count == 10
+    assert report.commands["math div"].errors == 1
+    assert report.commands["math"].errors == 1
+    assert report.throughput > 0
+    assert "math add\t10\t0\t" in str(report)
+
+
+def test_replay_pace(cli):
+    records = [Record(ts=100.0, line="math add 1 2"), Record(ts=100.2, line="math add 1 2"),
+               Record(ts=100.3, line="exit")]
+    report = replay(iter(records), cli.freeze().execute, speed=2.0)
+    assert report.total == 1 + 1
+    assert report.elapsed >= 0.1
+    with pytest.raises(ValueError):
+        replay(iter(records), cli.freeze().execute, speed=0)
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) == 0.0
+
+
+def test_replay_does_not_silence_other_threads(cli, capsys):
+    import threading
+
+    records = [Record(ts=0.0, line="math add 1 2")] * 50
+    started, done = threading.Event(), threading.Event()
+
+    def other():
+        started.set()
+        while not done.is_set():
+            print("other", end="")
+            done.wait(0.001)
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    started.wait()
+    replay(iter(records), cli.freeze().execute, speed=None, workers=4)
+    done.set()
+    thread.join()
+    out = capsys.readouterr().out
+    assert "other" in out
+    assert "3" not in out
+
+
+def test_replay_not_quiet(cli, capsys):
+    records = [Record(ts=0.0, line="math add 1 2")] * 3
+    replay(iter(records), cli.freeze().execute, speed=None, workers=2, quiet=False)
+    assert capsys.readouterr().out == "3\n" * 3
+
+
+def test_replay_assignments_and_references(cli):
+    records = [Record(ts=0.0, line="$u = math add 1 2"), Record(ts=0.0, line="math add $u 10"),
+               Record(ts=0.0, line="math add $last $u")]
+    seen = []
+    tree = cli.freeze()
+
+    def execute(tokens, results):
+        result = tree.execute(tokens, results)
+        seen.append(result.result)
+        return result
+
+    report = replay(iter(records), execute, speed=None, workers=1)
+    assert report.errors == 0
+    assert list(report.commands) == ["math add"]
+    assert seen == [3, 13, 16]
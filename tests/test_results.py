@@ -0,0 +1,101 @@
+from typing import List
+
+from mustiolo.cli import CLI
+from mustiolo.exception import ResultNotFound
+from mustiolo.results import ResultStore, estimate_size, split_assignment
+
+import pytest
+
+
+@pytest.fixture
+def cli():
+    cli = CLI()
+
+    @cli.command()
+    def users():
+        """<menu>List the users.</menu>"""
+        return ["ada", "bob", "carl"]
+
+    @cli.command()
+    def first(items: List[str], count: int = 1):
+        """<menu>First items.</menu>"""
+        return items[:count]
+
+    @cli.command()
+    def echo(text: str):
+        """<menu>Echo.</menu>"""
+        return text
+
+    return cli
+
+
+def test_references_pass_objects(cli):
+    driver = cli.headless()
+    listed = driver.send("users")
+    assert listed.handle == 1
+
+    result = driver.send("first $1 2")
+    assert result.result == ["ada", "bob"]
+    # the very same object, not a copy
+    assert result.arguments[0] is listed.result
+    assert driver.send("first $last").result == ["ada"]
+
+
+def test_named_results(cli):
+    driver = cli.headless()
+    assert driver.send("$all = users").ok
+    driver.send("echo hello")
+    assert driver.send("first $all 3").result == ["ada", "bob", "carl"]
+    assert cli.results.get("all") is cli.results.get("1")
+
+
+def test_missing_reference_and_escape(cli):
+    driver = cli.headless()
+    result = driver.send("first $nothing")
+    assert result.exit_code == 2
+    assert isinstance(result.error, ResultNotFound)
+    assert driver.send("echo $$HOME").result == "$HOME"
+    assert driver.send("echo $5.00").result == "$5.00"
+
+
+def test_session_store(cli):
+    session = cli.freeze().session()
+    session.execute("$u = users")
+    assert session.execute("first $u 2").result == ["ada", "bob"]
+    # every session has its own store
+    assert cli.freeze().session().execute("first $u").exit_code == 2
+
+
+def test_split_assignment():
+    assert split_assignment(["$a", "=", "users"]) == ("a", ["users"])
+    assert split_assignment(["$1", "=", "users"]) == (None, ["$1", "=", "users"])
+    assert split_assignment(["echo", "=", "x"]) == (None, ["echo", "=", "x"])
+
+
+def test_lru_eviction_by_entries_and_memory():
+    store = ResultStore(max_entries=2)
+    store.put("a")
+    store.put("b")
+    store.get("1")
+    store.put("c")
+    # '2' was the least recently used
+    assert store.get("1") == "a"
+    with pytest.raises(ResultNotFound):
+        store.get("2")
+
+    store = ResultStore(max_bytes=estimate_size(b"x" * 1000) * 2)
+    store.put(b"x" * 1000)
+    store.put(b"y" * 1000)
+    store.put(b"z" * 1000)
+    assert len(store) == 2
+    assert store.nbytes <= store.max_bytes
+    # a result larger than the limit is kept until the next one
+    store.put(b"w" * 100000)
+    assert store.get("last") == b"w" * 100000
+    assert len(store) == 1
+
+
+def test_estimate_size_samples_large_containers():
+    values = [str(index) for index in range(100000)]
+    exact = sum(len(value) + 49 for value in values)
+    assert estimate_size(values) > exact * 0.8
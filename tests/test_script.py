@@ -0,0 +1,119 @@
+import threading
+import time
+
+from mustiolo.cli import CLI, MenuGroup
+from mustiolo.exception import ScriptError
+from mustiolo.models.result import CommandResult
+from mustiolo.script import StepStatus, parse_script, run_script
+
+import pytest
+
+
+def test_parse_script():
+    steps = parse_script("""
+# nightly
+users: db dump users
+orders: db dump orders
+report after users orders:
+    report build
+    report send
+tmp clean
+""")
+    assert [step.name for step in steps] == ["users", "orders", "report", "line 8"]
+    assert steps[2].after == ["users", "orders"]
+    assert steps[2].lines == ["report build", "report send"]
+    assert steps[3].lines == ["tmp clean"]
+    assert steps[3].after == []
+
+
+@pytest.mark.parametrize("text, lineno", [
+    ("report after users: report build", 1),
+    ("a: x\na: y", 2),
+    ("a:\nb: x", 1),
+    ("    x", 1),
+])
+def test_parse_script_errors(text, lineno):
+    with pytest.raises(ScriptError) as error:
+        parse_script(text)
+    assert error.value.lineno == lineno
+
+
+def fake_execute(durations, failing=(), calls=None):
+    lock = threading.Lock()
+
+    def execute(tokens, results=None):
+        with lock:
+            if calls is not None:
+                calls.append(" ".join(tokens))
+        time.sleep(durations.get(tokens[0], 0.0))
+        if tokens[0] in failing:
+            return CommandResult(path=tokens, error=RuntimeError("boom"), exit_code=1)
+        return CommandResult(path=tokens)
+    return execute
+
+
+def test_run_script_parallel_and_critical_path():
+    steps = parse_script("a: a\nb: b\nc after a: c\nd after b c: d\ne")
+    report = run_script(steps, fake_execute({"a": 0.05, "b": 0.2, "c": 0.05, "d": 0.01, "e": 0.0}), workers=4)
+    assert report.ok
+    # a and b start together
+    assert abs(report.steps["a"].start - report.steps["b"].start) < 0.05
+    assert report.steps["d"].start >= report.steps["b"].start + report.steps["b"].duration
+    assert report.elapsed < 0.4
+    path, duration = report.critical_path()
+    assert path == ["b", "d"]
+    assert duration == pytest.approx(report.steps["b"].duration + report.steps["d"].duration)
+    assert "critical path: b -> d" in str(report)
+
+
+def test_run_script_failure_skips_dependents_only():
+    calls = []
+    steps = parse_script("a: a\nb after a:\n    b1\n    b2\nc after b: c\nd: d\ne after d: e")
+    report = run_script(steps, fake_execute({}, failing=("b1",), calls=calls), workers=2)
+    assert not report.ok
+    statuses = {name: result.status for name, result in report.steps.items()}
+    assert statuses == {"a": StepStatus.OK, "b": StepStatus.FAILED, "c": StepStatus.SKIPPED,
+                        "d": StepStatus.OK, "e": StepStatus.OK}
+    # the block stops at its first failing line
+    assert "b2" not in calls
+    assert str(report.steps["b"].error) == "boom"
+
+
+def test_cli_run_script(tmp_path, capsys):
+    cli = CLI()
+    math = MenuGroup("math", "Math operations")
+
+    @math.command()
+    def add(a: int, b: int):
+        """<menu>Add two numbers.</menu>"""
+        return a + b
+
+    cli.add_group(math)
+    path = tmp_path / "nightly.mio"
+    path.write_text("one: math add 1 2\ntwo after one: math add two 2\nthree: math add 3 4\n"
+                    "four: $sum = math add 5 5\nfive after four: math add $sum $last\n")
+    report = cli.run_script(str(path), workers=2)
+    assert report.steps["one"].results[0].result == 3
+    assert report.steps["two"].status is StepStatus.FAILED
+    assert report.steps["two"].results[0].exit_code == 2
+    assert report.steps["three"].results[0].result == 7
+    assert report.steps["four"].results[0].handle is not None
+    assert report.steps["five"].status is StepStatus.OK
+
+
+@pytest.mark.parametrize("text, lineno", [
+    ("a: math add 1 2\nwatch -n 0.1 math add 1 2", 2),
+    ("a:\n    math add 1 2\n    exit", 3),
+    ("b: reload", 1),
+    ("$p = profile math add 1 2", 1),
+    ("history", 1),
+])
+def test_cli_builtins_are_refused(tmp_path, text, lineno):
+    cli = CLI()
+    path = tmp_path / "script.mio"
+    path.write_text(text)
+    with pytest.raises(ScriptError) as error:
+        cli.run_script(str(path))
+    assert error.value.lineno == lineno
+    assert "cannot be used in a script" in str(error.value)
+    assert not cli._exit
@@ -0,0 +1,103 @@
+from mustiolo.models.command import CommandGroup, SubCommandGroup
+from mustiolo.search import CommandIndex, tokenize
+
+
+def add(a: int, b: int):
+    """<menu>Sum two numbers.</menu>"""
+    pass
+
+
+def add_list(numbers: list[int]):
+    """
+    <menu>Add N numbers.</menu>
+    <usage>Makes the sum of N integers.</usage>
+    """
+    pass
+
+
+def greet(name: str):
+    """<menu>Greet a user by name.</menu>"""
+    pass
+
+
+def test_tokenize():
+    assert tokenize("add_list") == ["add", "list"]
+    assert tokenize("Sum two-numbers.") == ["sum", "two", "numbers"]
+
+
+def test_index_updated_on_registration():
+    root = SubCommandGroup("__root__")
+    index = CommandIndex()
+    root.subscribe(index)
+
+    math = SubCommandGroup("math", "Math operations")
+    math.register_command(add)
+    root.include_commands(math)
+    # registered after the group has been included
+    math.register_command(add_list, alias="alist")
+    root.register_command(greet)
+
+    assert len(index) == 3
+    results = index.search("sum")
+    assert [r.full_path for r in results] == ["math add", "math add_list"]
+    assert index.search("alist")[0].full_path == "math add_list"
+    assert index.search("math greet") == []
+
+
+def test_index_prefix_and_ranking():
+    group = CommandGroup()
+    index = CommandIndex()
+    group.register_command(greet)
+    group.register_command(add_list)
+    group.subscribe(index)
+
+    # prefix match
+    assert index.search("gre")[0].full_path == "greet"
+    # a match in the name ranks better than one in the usage
+    group.register_command(add)
+    assert sorted(r.full_path for r in index.search("add")) == ["add", "add_list"]
+    assert index.search("add list")[0].full_path == "add_list"
+    assert index.search("") == []
+
+
+def test_index_remove():
+    index = CommandIndex()
+    group = CommandGroup()
+    group.subscribe(index)
+    group.register_command(greet)
+    index.remove(("greet",))
+    assert index.search("greet") == []
+    assert len(index) == 0
+
+
+def test_index_is_built_at_registration():
+    index = CommandIndex()
+    group = CommandGroup()
+    group.subscribe(index)
+    group.register_commands([greet, add])
+    # the first search does not pay for the indexing
+    assert "greet" in index._doc_terms[0] and "sum" in index._doc_terms[1]
+    assert len(index) == 2
+    assert index.search("greet")[0].full_path == "greet"
+
+def test_search_stops_early_with_the_same_ranking():
+    import random
+    from mustiolo.models.command import CommandModel
+
+    words = ["list", "lint", "user", "use", "file", "show"]
+    rng = random.Random(1)
+    index = CommandIndex()
+    for number in range(2000):
+        name = f"{rng.choice(words)}_{number}"
+        menu = " ".join(rng.choices(words, k=3))
+        usage = " ".join(rng.choices(words, k=6))
+        path = ("group", name) if number % 2 else ("group", "sub", name)
+        index.add(path, CommandModel(name=name, menu=menu, usage=usage))
+    index.remove(("group", "sub", "list_0"))
+
+    for query in ["list", "li", "user file", "us fi show", "use", "nothing"]:
+        # every match scored and sorted, as the results must be ranked
+        everything = index.search(query, limit=len(index))
+        expected = sorted(everything, key=lambda r: (-r.score, len(r.path), index._doc_ids[r.path]))
+        assert everything == expected
+        assert index.search(query, limit=7) == expected[:7]
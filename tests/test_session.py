@@ -0,0 +1,112 @@
+import json
+import threading
+
+from mustiolo.exception import CommandNotFound
+from mustiolo.output import OutputMode
+
+import pytest
+
+
+def test_frozen_tree_is_immutable(cli):
+    tree = cli.freeze()
+    with pytest.raises(TypeError):
+        tree.root.commands["new"] = None
+    with pytest.raises(AttributeError):
+        tree.root.get_command("math").name = "other"
+
+    @cli.command()
+    def later():
+        """<menu>Registered after the freeze.</menu>"""
+
+    assert not tree.root.has_command("later")
+    with pytest.raises(CommandNotFound):
+        tree.root.get_command("later")
+
+
+def test_session_execute(cli):
+    session = cli.freeze().session(prompt="math>")
+    assert session.execute("math add 1 2").result == 3
+    assert session.execute("math a 2 2").result == 4
+    assert session.execute("math div 1 0").exit_code == 1
+    assert session.execute("math mul 1 2").exit_code == 2
+    assert session.execute("   ") is None
+    assert list(session.history) == ["math add 1 2", "math a 2 2", "math div 1 0", "math mul 1 2"]
+
+
+def test_exit_closes_only_the_session(cli):
+    tree = cli.freeze()
+    first, second = tree.session(), tree.session()
+    first.execute("exit")
+    assert first.closed
+    assert not second.closed
+    assert second.execute("math add 1 1").result == 2
+
+
+def test_help_uses_frozen_tree(cli, capsys):
+    session = cli.freeze().session()
+    result = session.execute("? math")
+    assert result.ok
+    assert "Add two numbers." in result.output
+    assert capsys.readouterr().out == ""
+
+
+def test_cli_builtins_are_not_frozen(cli):
+    root = cli.freeze().root
+    for name in ("exit", "history", "profile", "reload", "search", "watch"):
+        assert not root.has_command(name)
+    assert root.has_command("?")
+    session = cli.freeze().session()
+    assert session.execute("watch -n 0.1 math add 1 2").exit_code == 2
+    assert not cli._exit
+
+
+def test_middlewares_are_composed_at_freeze(cli):
+    calls = []
+
+    def audit(context, call_next):
+        calls.append(context.path)
+        return call_next()
+
+    cli.use(audit)
+    session = cli.freeze().session()
+    assert session.execute("math add 1 2").result == 3
+    assert calls == [["math", "add"]]
+
+
+def test_run_and_render(cli):
+    lines = iter(["math add 1 2", "math div 1 0", "exit"])
+    written = []
+    session = cli.freeze().session(output_mode=OutputMode.JSONL)
+    session.run(lambda prompt: next(lines), written.append)
+    assert session.closed
+    assert written[0].startswith('{"path":["math","add"]')
+    assert json.loads(written[0])["output"] == "3\n"
+    assert '"exit_code":1' in written[1]
+
+
+def test_output_goes_to_the_session_writer(cli, capsys):
+    lines = iter(["math add 1 2", "math div 1 0", "exit"])
+    written = []
+    cli.freeze().session().run(lambda prompt: next(lines), written.append)
+    assert written[0] == "3"
+    assert "division by zero" in written[1]
+    assert capsys.readouterr().out == ""
+
+
+def test_concurrent_sessions(cli):
+    tree = cli.freeze()
+    errors = []
+
+    def worker(index):
+        session = tree.session(prompt=f"{index}>")
+        for value in range(200):
+            result = session.execute(f"math add {index} {value}")
+            if result.result != index + value or result.output != f"{index + value}\n":
+                errors.append(index)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
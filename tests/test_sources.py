@@ -0,0 +1,91 @@
+import io
+import sys
+
+from mustiolo.bulk import IntArray
+from mustiolo.cli import CLI
+from mustiolo.exception import ParameterSourceError, ParameterWrongElement
+from mustiolo.models.parameters import ParameterModel
+from mustiolo import sources
+from mustiolo.sources import FileListSource, split_elements
+
+import pytest
+
+
+def test_split_elements_across_chunks():
+    chunks = [b"1,2", b"2,3\n", b"4\r\n,,5"]
+    assert list(split_elements(chunks)) == [b"1", b"22", b"3", b"4", b"5"]
+
+
+def test_list_from_file(tmp_path, monkeypatch):
+    # small chunks to cross the boundaries of the mapped file
+    monkeypatch.setattr(sources, "CHUNK_SIZE", 4)
+    path = tmp_path / "ids.txt"
+    path.write_text("10,20\n30\n\n40,50\n")
+    param = ParameterModel(name="ids", ptype=list[int], default=None)
+    values = param.convert_to_type(f"@{path}")
+    assert isinstance(values, FileListSource)
+    assert list(values) == [10, 20, 30, 40, 50]
+    # it can be iterated again
+    assert sum(values) == 150
+
+
+def test_list_wrong_element(tmp_path):
+    path = tmp_path / "ids.txt"
+    path.write_text("1\n2\nthree\n")
+    param = ParameterModel(name="ids", ptype=list[int], default=None)
+    values = param.convert_to_type(f"@{path}")
+    with pytest.raises(ParameterWrongElement) as e:
+        list(values)
+    assert e.value.index == 2
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    assert list(ParameterModel(name="names", ptype=list[str], default=None).convert_to_type(f"@{path}")) == []
+
+
+def test_scalar_and_array_from_file(tmp_path):
+    path = tmp_path / "value.txt"
+    path.write_text("42\n")
+    assert ParameterModel(name="n", ptype=int, default=None).convert_to_type(f"@{path}") == 42
+    values = ParameterModel(name="ids", ptype=IntArray, default=None).convert_to_type(f"@{path}")
+    assert isinstance(values, IntArray) and list(values) == [42]
+
+
+def test_stdin(monkeypatch):
+    stdin = io.TextIOWrapper(io.BytesIO(b"a\nb,c\n"))
+    monkeypatch.setattr(sys, "stdin", stdin)
+    assert list(ParameterModel(name="names", ptype=list[str], default=None).convert_to_type("@-")) == ["a", "b", "c"]
+
+
+def test_stdin_read_once(monkeypatch):
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(b"1\n2\n")))
+    values = ParameterModel(name="ids", ptype=list[int], default=None).convert_to_type("@-")
+    assert list(values) == [1, 2]
+    with pytest.raises(ParameterSourceError):
+        list(values)
+
+
+def test_wrong_element_exit_code(tmp_path, capsys):
+    cli = CLI()
+
+    @cli.command()
+    def total(ids: list[int]):
+        """<menu>Sum the ids.</menu>"""
+        return sum(ids)
+
+    path = tmp_path / "ids.txt"
+    path.write_text("1\n2\nthree\n")
+    # the element is converted while the command runs, it is still an argument error
+    assert cli.main(["total", f"@{path}"]) == 2
+    assert "three" in capsys.readouterr().err
+
+
+def test_escape_and_missing_file(tmp_path):
+    param = ParameterModel(name="name", ptype=str, default=None)
+    assert param.convert_to_type("@@user") == "@user"
+    with pytest.raises(ParameterSourceError):
+        param.convert_to_type(f"@{tmp_path / 'missing.txt'}")
+    with pytest.raises(ParameterSourceError):
+        ParameterModel(name="ids", ptype=list[int], default=None).convert_to_type(f"@{tmp_path / 'missing.txt'}")
@@ -0,0 +1,122 @@
+import json
+import time
+
+from mustiolo.cli import CLI
+from mustiolo.telemetry import PROMETHEUS, Span, SpanExporter
+
+import pytest
+
+
+@pytest.fixture
+def cli():
+    cli = CLI()
+
+    @cli.command(alias="in")
+    def login(user: str, password: str):
+        """<menu>Login.</menu>"""
+        if password != "secret":
+            raise PermissionError("wrong password")
+
+    return cli
+
+
+def test_otlp_export(cli, tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = SpanExporter(str(path), redact={"password"}, flush_interval=60)
+    cli.use(exporter)
+    cli._execute(["login", "alice", "secret"])
+    cli._execute(["in", "bob", "guess"])
+    exporter.close()
+
+    batch = json.loads(path.read_text().splitlines()[0])
+    spans = batch["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["login", "login"]
+    assert spans[0]["traceId"] != spans[1]["traceId"]
+    attributes = {a["key"]: a["value"]["stringValue"] for a in spans[1]["attributes"]}
+    assert attributes["command.argument.user"] == "'bob'"
+    assert attributes["command.argument.password"] == "***"
+    assert attributes["exception.type"] == "PermissionError"
+    assert spans[0]["status"] == {"code": 1}
+    assert spans[1]["status"]["code"] == 2
+    assert exporter.exported == 2
+
+
+def test_prometheus_export(cli, tmp_path):
+    path = tmp_path / "mustiolo.prom"
+    exporter = SpanExporter(str(path), format=PROMETHEUS, flush_interval=60)
+    cli.use(exporter)
+    cli._execute(["login", "alice", "secret"])
+    cli._execute(["in", "bob", "guess"])
+    exporter.close()
+
+    text = path.read_text()
+    assert 'path="in"' not in text
+    assert 'mustiolo_commands_total{path="login",outcome="ok"} 1' in text
+    assert 'mustiolo_commands_total{path="login",outcome="error"} 1' in text
+    assert 'mustiolo_command_errors_total{path="login",exception="PermissionError"} 1' in text
+    assert 'mustiolo_command_duration_seconds_count{path="login"} 2' in text
+    assert "mustiolo_exporter_dropped_spans_total 0" in text
+
+
+def test_queue_overflow_is_counted(tmp_path):
+    exporter = SpanExporter(str(tmp_path / "spans.jsonl"), max_queue=2, flush_interval=60)
+    for _ in range(5):
+        exporter.record(Span(path=("cmd",), arguments={}, start=0.0, duration=0.0))
+    assert exporter.dropped == 3
+    exporter.close()
+    assert exporter.exported == 2
+
+
+def test_rotation(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = SpanExporter(str(path), max_bytes=1, backup_count=2, flush_interval=60)
+    for _ in range(3):
+        exporter.record(Span(path=("cmd",), arguments={}, start=0.0, duration=0.0))
+        exporter.flush()
+    exporter.close()
+    assert path.exists()
+    assert (tmp_path / "spans.jsonl.1").exists()
+    assert (tmp_path / "spans.jsonl.2").exists()
+    assert not (tmp_path / "spans.jsonl.3").exists()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_failed_flush_keeps_exporting(tmp_path):
+    path = tmp_path / "missing" / "spans.jsonl"
+    exporter = SpanExporter(str(path), flush_interval=0.01)
+    exporter.record(Span(path=("cmd",), arguments={}, start=0.0, duration=0.0))
+    wait_for(lambda: exporter.failed == 1)
+
+    path.parent.mkdir()
+    exporter.record(Span(path=("cmd",), arguments={}, start=0.0, duration=0.0))
+    wait_for(lambda: exporter.exported == 1)
+    assert exporter._thread.is_alive()
+    exporter.close()
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_span_arguments_are_bounded_strings(tmp_path):
+    from mustiolo.bulk import IntArray
+
+    cli = CLI()
+
+    @cli.command()
+    def load(ids: IntArray, names: list[str], password: str):
+        """<menu>Load.</menu>"""
+        pass
+
+    exporter = SpanExporter(str(tmp_path / "spans.jsonl"), redact={"password"}, flush_interval=60)
+    cli.use(exporter)
+    ids = ",".join(str(i) for i in range(100_000))
+    cli._execute(["load", ids, "a,b", "secret"])
+    # the queued span holds the formatted arguments, not the array
+    arguments = exporter._queue[0].arguments
+    assert arguments == {"ids": "array('q', [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, ...])",
+                         "names": "['a', 'b']", "password": "***"}
+    exporter.close()
@@ -0,0 +1,118 @@
+import io
+
+from mustiolo.cli import CLI
+from mustiolo.exception import CommandNotFound
+from mustiolo.replay import Record, replay
+from mustiolo.watch import CLEAR_DOWN, CLEAR_LINE, diff_frame, fit_rows, parse_arguments, watch
+
+import pytest
+
+
+def test_parse_arguments():
+    assert parse_arguments(["db", "status"]) == (2.0, ["db", "status"])
+    assert parse_arguments(["-n", "0.5", "status"]) == (0.5, ["status"])
+    for arguments in (["-n"], ["-n", "x", "status"], ["-n", "0", "status"], ["-n", "1"], []):
+        with pytest.raises(ValueError):
+            parse_arguments(arguments)
+
+
+def test_diff_frame_redraws_changed_lines():
+    assert diff_frame([], ["a", "b"]) == "\ra\nb\n"
+    # only the second line is written, the others are skipped with cursor movements
+    assert diff_frame(["a", "b", "c"], ["a", "x", "c"]) == f"\033[3A\r\033[1B{CLEAR_LINE}x\n\033[1B"
+    assert diff_frame(["a", "b"], ["a", "b"]) == "\033[2A\r\033[2B"
+    # shorter frame: the stale lines are cleared and the cursor goes back
+    assert diff_frame(["a", "b", "c"], ["a"]) == f"\033[3A\r\033[1B{CLEAR_LINE}\n{CLEAR_LINE}\n\033[2A"
+    # longer frame: the new lines are appended
+    assert diff_frame(["a"], ["a", "b"]) == "\033[1A\r\033[1Bb\n"
+
+
+def test_diff_frame_counts_wrapped_rows():
+    wide = "x" * 15
+    # the unchanged wrapped line takes 2 rows
+    assert diff_frame(["a", wide], ["b", wide], columns=10) == f"\033[3A\r{CLEAR_LINE}b\n\033[2B"
+    # a changed line on the same rows clears all of them
+    assert diff_frame([wide], ["z" * 12], columns=10) == \
+        f"\033[2A\r{CLEAR_LINE}\033[1B{CLEAR_LINE}\033[1A{'z' * 12}\n"
+    # CJK characters take 2 columns
+    assert diff_frame(["漢" * 6], ["字" * 6], columns=10) == \
+        f"\033[2A\r{CLEAR_LINE}\033[1B{CLEAR_LINE}\033[1A{'字' * 6}\n"
+    # a line wrapping on more rows moves the others: the rest is written again
+    assert diff_frame(["a", "b"], [wide, "b"], columns=10) == f"\033[2A\r{CLEAR_DOWN}{wide}\nb\n"
+    # the stale rows of a wrapped line are cleared
+    assert diff_frame(["a", wide], ["a"], columns=10) == f"\033[3A\r\033[1B{(CLEAR_LINE + chr(10)) * 2}\033[2A"
+
+
+def test_watch_skips_ticks_on_overrun():
+    now = [0.0]
+    sleeps = []
+    durations = iter([0.1, 2.5, 0.1])
+
+    def run():
+        now[0] += next(durations)
+        return f"t={now[0]:.1f}"
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    stream = io.StringIO()
+    skipped = watch(run, 1.0, stream, "status", iterations=3, clock=lambda: now[0], sleep=sleep)
+    assert skipped == 2
+    # the second run ends at 3.5: the ticks at 2 and 3 are skipped
+    assert sleeps == [pytest.approx(0.9), pytest.approx(0.5)]
+    assert "(skipped 2)" in stream.getvalue()
+
+
+def test_watch_command(capsys):
+    cli = CLI()
+    calls = []
+
+    @cli.command()
+    def status():
+        """<menu>Status.</menu>"""
+        calls.append(1)
+        if len(calls) > 2:
+            raise KeyboardInterrupt
+        print(f"calls {len(calls)}")
+
+    cli._watch_cmd(["-n", "0.01", "status"])
+    out = capsys.readouterr().out
+    assert "Every 0.01s: status" in out
+    assert "calls 1" in out and "calls 2" in out
+
+    with pytest.raises(CommandNotFound):
+        cli._watch_cmd(["missing"])
+    with pytest.raises(ValueError):
+        cli._watch_cmd(["watch", "status"])
+
+
+def test_recorded_watch_is_not_replayed(capsys):
+    cli = CLI()
+
+    @cli.command()
+    def status():
+        """<menu>Status.</menu>"""
+        print("ok")
+
+    records = [Record(ts=0.0, line="watch -n 0.01 status"), Record(ts=0.0, line="status")]
+    report = replay(iter(records), cli.freeze().execute, speed=None)
+    assert report.total == 2
+    assert report.commands["status"].errors == 0
+    assert report.errors == 1
+    assert capsys.readouterr().out == ""
+
+
+def test_watch_cuts_a_frame_taller_than_the_terminal():
+    texts = iter(["\n".join(f"row {i}" for i in range(20)), "\n".join(f"row {i}!" for i in range(20))])
+    stream = io.StringIO()
+    watch(lambda: next(texts), 1.0, stream, "status", iterations=2, clock=lambda: 0.0, sleep=lambda _: None,
+          columns=40, lines=6)
+    out = stream.getvalue()
+    # header, blank line and 3 rows: the cursor goes up only over what has been written
+    assert "row 2\n" in out and "row 3" not in out
+    assert "\033[5A" in out and "\033[6A" not in out
+    assert "row 2!\n" in out
+    # the wrapped rows count too
+    assert fit_rows(["a", "x" * 25, "b"], 3, columns=10) == ["a"]
+    assert fit_rows(["a", "x" * 25, "b"], 5, columns=10) == ["a", "x" * 25, "b"]